@@ -0,0 +1,149 @@
+"""
+    Compares the bytes stored for, and the time to serialize and
+    deserialize, the unit test sample pages and images when cached as the
+    pickled responses of requests_cache and in the compact form of
+    dumps_response.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_cache_serialization.py [rounds]
+"""
+
+import os
+import sys
+import time
+import pickle
+import zipfile
+
+from datetime import datetime
+
+import requests
+
+from requests_cache.backends.base import BaseCache
+
+from mementoembed.cacheserialization import dumps_response, loads_response
+
+sampledir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "tests", "unit", "samples")
+
+def make_response(url, content, content_type):
+
+    request = requests.Request('GET', url, headers={
+        'User-Agent': 'MementoEmbed benchmark',
+        'Accept-Encoding': 'gzip, deflate'
+    }).prepare()
+
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.reason = 'OK'
+    response.request = request
+    response.headers['Content-Type'] = content_type
+    response.headers['Memento-Datetime'] = "Fri, 22 Jun 2018 21:16:36 GMT"
+    response.headers['Link'] = '<http://example.com/>; rel="original", ' \
+        '<http://myarchive.org/timemap/link/http://example.com/>; rel="timemap"'
+    response.headers['Connection'] = 'keep-alive'
+    response._content = content
+
+    return response
+
+def load_samples():
+
+    samples = []
+
+    for filename in [ "archive.is-1.html", "htmltext.html" ]:
+        with open(os.path.join(sampledir, filename), 'rb') as f:
+            samples.append( ("html", make_response(
+                "http://myarchive.org/memento/20180622211636/" + filename,
+                f.read(), "text/html; charset=utf-8")) )
+
+    content_types = { "html": "text/html; charset=utf-8", "gif": "image/gif",
+        "jpg": "image/jpeg", "png": "image/png" }
+
+    # the raw memento and its embedded images
+    with zipfile.ZipFile(os.path.join(sampledir, "archive.is-1.raw.zip")) as z:
+        for name in z.namelist():
+
+            extension = name.rsplit('.', 1)[1]
+
+            samples.append( ("html" if extension == "html" else "image", make_response(
+                "http://myarchive.org/memento/20180622211636id_/" + name,
+                z.read(name), content_types[extension])) )
+
+    imagedir = os.path.join(sampledir, "images")
+
+    for filename in sorted(os.listdir(imagedir)):
+
+        with open(os.path.join(imagedir, filename), 'rb') as f:
+            samples.append( ("image", make_response(
+                "http://myarchive.org/memento/20180622211636im_/" + filename,
+                f.read(), content_types[filename.rsplit('.', 1)[1]])) )
+
+    return samples
+
+def pickled_dumps(response, timestamp):
+    # what the SQLite and Redis backends of requests_cache store
+    return pickle.dumps((BaseCache().reduce_response(response), timestamp),
+        protocol=pickle.HIGHEST_PROTOCOL)
+
+def pickled_loads(value):
+    reduced, timestamp = pickle.loads(value)
+    return BaseCache().restore_response(reduced), timestamp
+
+def compact_dumps(response, timestamp):
+    return pickle.dumps(dumps_response(response, timestamp), protocol=pickle.HIGHEST_PROTOCOL)
+
+def compact_loads(value):
+    return loads_response(pickle.loads(value))
+
+def measure(dumps, loads, responses, rounds):
+
+    timestamp = datetime.utcnow()
+
+    start = time.perf_counter()
+
+    for i in range(rounds):
+        values = [ dumps(r, timestamp) for r in responses ]
+
+    dump_time = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+
+    for i in range(rounds):
+        restored = [ loads(v)[0] for v in values ]
+
+    load_time = (time.perf_counter() - start) / rounds
+
+    assert [ r.content for r in restored ] == [ r.content for r in responses ]
+
+    return sum( len(v) for v in values ), dump_time, load_time
+
+def main():
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    samples = load_samples()
+
+    print("{} responses, {} rounds".format(len(samples), rounds))
+    print("{:<7} {:<8} {:>10} {:>12} {:>12} {:>10}".format(
+        "kind", "format", "bytes", "dumps (ms)", "loads (ms)", "of pickle"))
+
+    for kind in [ "html", "image" ]:
+
+        responses = [ r for k, r in samples if k == kind ]
+
+        baseline = None
+
+        for name, dumps, loads in [
+            ("pickle", pickled_dumps, pickled_loads),
+            ("compact", compact_dumps, compact_loads) ]:
+
+            size, dump_time, load_time = measure(dumps, loads, responses, rounds)
+
+            if baseline is None:
+                baseline = size
+
+            print("{:<7} {:<8} {:>10} {:>12.2f} {:>12.2f} {:>9.1%}".format(
+                kind, name, size, dump_time * 1000, load_time * 1000, size / baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+    Measures the CPU time spent extracting the HTML-derived parts of a
+    social card (title, snippet, page metadata, favicon, images, frames)
+    from the unit test samples with each available HTML parser.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_html_parsers.py [rounds]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "tests", "unit"))
+
+from test_htmlparsers import load_corpus, available_parsers, extract_all
+
+def main():
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    corpus = load_corpus()
+    baseline = None
+
+    print("{} documents, {} rounds".format(len(corpus), rounds))
+    print("{:<14} {:>16} {:>10}".format("parser", "CPU ms per card", "speedup"))
+
+    for parser in available_parsers():
+
+        start = time.process_time()
+
+        for i in range(rounds):
+            for content in corpus.values():
+                extract_all(content, parser)
+
+        per_card = (time.process_time() - start) * 1000 / (rounds * len(corpus))
+
+        if baseline is None:
+            baseline = per_card
+
+        print("{:<14} {:>16.1f} {:>9.1f}x".format(parser, per_card, baseline / per_card))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+    Compares scoring the unit test sample images in the request thread
+    with scoring them in process pools of increasing size.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_image_scoring.py [rounds] [pool sizes...]
+"""
+
+import os
+import sys
+import time
+
+from concurrent.futures import wait
+
+from mementoembed.executors import ScoringExecutor
+from mementoembed.imageselection import scores_for_image
+
+imagedir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "tests", "unit", "samples", "images")
+
+def load_images():
+
+    images = []
+
+    for filename in sorted(os.listdir(imagedir)):
+        with open(os.path.join(imagedir, filename), 'rb') as f:
+            images.append(f.read())
+
+    return images
+
+def timed(executor, images, rounds):
+
+    start = time.perf_counter()
+
+    futures = [ executor.submit(scores_for_image, image, n, len(images))
+        for i in range(rounds) for n, image in enumerate(images) ]
+
+    wait(futures)
+
+    for future in futures:
+        future.result()
+
+    return time.perf_counter() - start
+
+def main():
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    sizes = [ int(i) for i in sys.argv[2:] ] or [ 2, 4, os.cpu_count() ]
+
+    images = load_images()
+
+    print("{} images, {} rounds, {} CPUs".format(len(images), rounds, os.cpu_count()))
+    print("{:>10} {:>10} {:>10}".format("processes", "seconds", "speedup"))
+
+    baseline = timed(ScoringExecutor(0), images, rounds)
+    print("{:>10} {:>10.3f} {:>9.1f}x".format("in thread", baseline, 1.0))
+
+    for size in sizes:
+
+        executor = ScoringExecutor(size)
+
+        # start the processes before timing
+        timed(executor, images[:1], size)
+
+        elapsed = timed(executor, images, rounds)
+        executor.shutdown()
+
+        print("{:>10} {:>10.3f} {:>9.1f}x".format(size, elapsed, baseline / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+    Compares building and encoding the frames of an imagereel from the unit
+    test sample images with Image.blend and 30 copies of each held image
+    against the NumPy crossfades and single held frames of reel_frames,
+    and checks that both GIFs show the same pictures for the same time.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_reel_frames.py [rounds] [width] [height]
+"""
+
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageSequence
+
+from mementoembed.reelframes import reel_frames, center_image, fade_alphas, hold_frames
+
+imagedir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "tests", "unit", "samples", "images")
+
+duration = 100
+
+def load_images(width, height):
+
+    images = []
+
+    for filename in sorted(os.listdir(imagedir))[:5]:
+
+        im = Image.open(os.path.join(imagedir, filename)).convert("RGBA")
+        im.thumbnail((width, height), resample=Image.BICUBIC)
+        images.append(im)
+
+    return images
+
+def blended_frames(background, ims, duration):
+
+    for im in ims:
+
+        newim = center_image(background, im)
+
+        yield background, duration
+
+        for alpha in fade_alphas:
+            yield Image.blend(background, newim, alpha), duration
+
+        for i in range(hold_frames):
+            yield newim, duration
+
+        for alpha in fade_alphas:
+            yield Image.blend(newim, background, alpha), duration
+
+def encode(frames, ims, width, height):
+
+    background = Image.new("RGBA", (width, height), "black")
+
+    outputims = []
+    durations = [ duration ]
+
+    for frame, frameduration in frames(background, ims, duration):
+        outputims.append(frame)
+        durations.append(frameduration)
+
+    outputfp = io.BytesIO()
+
+    background.save(
+        outputfp, save_all=True, format="GIF",
+        append_images=outputims, duration=durations, loop=0
+    )
+
+    return len(outputims), outputfp.getvalue()
+
+def timeline(data):
+    """
+        Returns the pictures of a GIF with how long each is shown, joining
+        consecutive identical frames.
+    """
+
+    pictures = []
+
+    for frame in ImageSequence.Iterator(Image.open(io.BytesIO(data))):
+
+        picture = frame.convert("RGBA").tobytes()
+
+        if pictures and pictures[-1][0] == picture:
+            pictures[-1][1] += frame.info['duration']
+        else:
+            pictures.append([ picture, frame.info['duration'] ])
+
+    return pictures
+
+def timed(frames, ims, width, height, rounds):
+
+    start = time.perf_counter()
+
+    for i in range(rounds):
+        count, data = encode(frames, ims, width, height)
+
+    elapsed = (time.perf_counter() - start) / rounds
+
+    return elapsed, count, data
+
+def main():
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 320
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 240
+
+    ims = load_images(width, height)
+
+    print("{} images, {}x{}, {} rounds".format(len(ims), width, height, rounds))
+    print("{:<14} {:>8} {:>10} {:>10}".format("frames", "count", "seconds", "speedup"))
+
+    baseline = None
+
+    for name, frames in [ ("Image.blend", blended_frames), ("reel_frames", reel_frames) ]:
+
+        elapsed, count, data = timed(frames, ims, width, height, rounds)
+
+        if baseline is None:
+            baseline = (elapsed, data)
+
+        print("{:<14} {:>8} {:>10.3f} {:>9.1f}x".format(
+            name, count, elapsed, baseline[0] / elapsed))
+
+    print("same pictures and timing: {}".format(timeline(baseline[1]) == timeline(data)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+    Compares the throughput of the cache under several worker processes,
+    each with several threads reading and writing responses, when kept in
+    SQLite as requests_cache's DbDict keeps it -- a new connection for
+    every operation, the default rollback journal, and a commit for every
+    write -- and in the WALDict of the SQLiteWAL cache engine.
+
+    Each process writes its own share of the keys and reads all of them,
+    so that most reads are of responses written by other processes and
+    must come from the database rather than the queue of pending writes.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_sqlite_backends.py [processes] [threads] [seconds]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+from mementoembed.sessions import PoolStatistics
+from mementoembed.walcache import WALDict
+
+keys = 500
+value_size = 20000
+write_fraction = 0.2
+
+class PerOperationDict:
+    """
+        The cache table as requests_cache's DbDict uses it.
+    """
+
+    def __init__(self, filename, table):
+        self.filename = filename
+        self.table = table
+
+        con = sqlite3.connect(self.filename)
+        con.execute("create table if not exists `{}` (key PRIMARY KEY, value)".format(self.table))
+        con.commit()
+        con.close()
+
+    def __getitem__(self, key):
+
+        con = sqlite3.connect(self.filename)
+
+        try:
+            row = con.execute("select value from `{}` where key=?".format(self.table), (key,)).fetchone()
+        finally:
+            con.close()
+
+        if row is None:
+            raise KeyError(key)
+
+        return row[0]
+
+    def __setitem__(self, key, value):
+
+        con = sqlite3.connect(self.filename)
+
+        try:
+            con.execute("insert or replace into `{}` (key,value) values (?,?)".format(self.table), (key, value))
+            con.commit()
+        finally:
+            con.close()
+
+    def flush(self):
+        pass
+
+def make_dict(name, filename, statistics=None):
+
+    if name == "DbDict":
+        return PerOperationDict(filename, 'responses')
+
+    return WALDict(filename, 'responses', statistics=statistics)
+
+def worker(name, filename, index, processes, threads, seconds, results):
+
+    statistics = PoolStatistics()
+    d = make_dict(name, filename, statistics)
+
+    counts = { 'reads': 0, 'writes': 0, 'locked': 0 }
+    latencies = []
+    lock = threading.Lock()
+
+    deadline = time.time() + seconds
+
+    def run():
+
+        value = os.urandom(value_size)
+        rng = random.Random()
+
+        while time.time() < deadline:
+
+            start = time.perf_counter()
+
+            try:
+                if rng.random() < write_fraction:
+                    d[str(rng.randrange(index, keys, processes))] = value
+                    operation = 'writes'
+                else:
+                    try:
+                        d[str(rng.randrange(keys))]
+                    except KeyError:
+                        pass
+                    operation = 'reads'
+
+            except sqlite3.OperationalError:
+                # "database is locked" after the busy timeout
+                operation = 'locked'
+
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                counts[operation] += 1
+                latencies.append(elapsed)
+
+    pool = [ threading.Thread(target=run) for i in range(threads) ]
+
+    for t in pool:
+        t.start()
+
+    for t in pool:
+        t.join()
+
+    d.flush()
+
+    # the transactions that wrote to the database, one per batch for WALDict
+    counts['commits'] = statistics.as_dict().get('sqlite batches', counts['writes'])
+
+    results.put( (counts, latencies) )
+
+def measure(name, processes, threads, seconds):
+
+    folder = tempfile.mkdtemp()
+    filename = os.path.join(folder, "cache.sqlite")
+
+    # create the table before the workers start
+    make_dict(name, filename).flush()
+
+    results = multiprocessing.Queue()
+
+    workers = [ multiprocessing.Process(target=worker,
+        args=(name, filename, i, processes, threads, seconds, results)) for i in range(processes) ]
+
+    for p in workers:
+        p.start()
+
+    totals = { 'reads': 0, 'writes': 0, 'locked': 0, 'commits': 0 }
+    latencies = []
+
+    for p in workers:
+        counts, worker_latencies = results.get()
+
+        for k in totals:
+            totals[k] += counts[k]
+
+        latencies.extend(worker_latencies)
+
+    for p in workers:
+        p.join()
+
+    for filename in os.listdir(folder):
+        os.unlink(os.path.join(folder, filename))
+
+    os.rmdir(folder)
+
+    latencies.sort()
+
+    return totals, latencies
+
+def main():
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print("{} processes x {} threads, {} seconds, {} keys of {} bytes, {:.0%} writes".format(
+        processes, threads, seconds, keys, value_size, write_fraction))
+    print("{:<9} {:>10} {:>10} {:>10} {:>8} {:>10} {:>10}".format(
+        "backend", "ops/s", "writes/s", "commits/s", "locked", "p50 (ms)", "p99 (ms)"))
+
+    for name in [ "DbDict", "WALDict" ]:
+
+        totals, latencies = measure(name, processes, threads, seconds)
+
+        operations = totals['reads'] + totals['writes']
+
+        print("{:<9} {:>10.0f} {:>10.0f} {:>10.0f} {:>8} {:>10.2f} {:>10.2f}".format(
+            name, operations / seconds, totals['writes'] / seconds,
+            totals['commits'] / seconds, totals['locked'],
+            latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+    Compares the time summa and mementoembed.textrank take to score the
+    sentences of documents of increasing length. The sentences are drawn
+    from the text of the unit test samples.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=. python benchmarks/bench_textrank.py [sentence counts...]
+"""
+
+import os
+import sys
+import time
+import random
+import zipfile
+
+from summa.summarizer import _clean_text_by_sentences, _build_graph, \
+    _set_graph_edge_weights, _remove_unreachable_nodes, _pagerank
+
+from mementoembed.textrank import textrank_scores
+from mementoembed.textprocessing import get_text_without_boilerplate
+
+sampledir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "tests", "unit", "samples")
+
+def summa_scores(tokens):
+
+    graph = _build_graph(tokens)
+    _set_graph_edge_weights(graph)
+    _remove_unreachable_nodes(graph)
+
+    if len(graph.nodes()) == 0:
+        return {}
+
+    return _pagerank(graph)
+
+def load_tokens():
+
+    texts = []
+
+    for filename in [ "htmltext.html", "archive.is-1.html" ]:
+        with open(os.path.join(sampledir, filename)) as f:
+            texts.append(get_text_without_boilerplate(f.read()))
+
+    with zipfile.ZipFile(os.path.join(sampledir, "archive.is-1.raw.zip")) as z:
+        texts.append(get_text_without_boilerplate(z.read("index.html").decode('utf8')))
+
+    tokens = []
+
+    for text in texts:
+        tokens.extend( sentence.token for sentence in _clean_text_by_sentences(text, "english", None) )
+
+    return [ token for token in tokens if len(token.split()) > 1 ]
+
+def timed(function, tokens):
+
+    start = time.perf_counter()
+    function(tokens)
+    return time.perf_counter() - start
+
+def main():
+
+    counts = [ int(i) for i in sys.argv[1:] ] or [ 25, 50, 100, 200, 400 ]
+
+    words = " ".join(load_tokens()).split()
+    random.seed(0)
+
+    print("{:>10} {:>12} {:>12} {:>10}".format("sentences", "summa s", "vectorized s", "speedup"))
+
+    for count in counts:
+
+        # distinct synthetic sentences of 5 to 20 words from the samples
+        tokens = [ " ".join(random.sample(words, random.randint(5, 20))) + " {}".format(i)
+            for i in range(count) ]
+
+        summa_time = timed(summa_scores, tokens)
+        vectorized_time = timed(textrank_scores, tokens)
+
+        print("{:>10} {:>12.4f} {:>12.4f} {:>9.1f}x".format(
+            count, summa_time, vectorized_time, summa_time / vectorized_time))
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,25 @@
 CACHEENGINE = 'SQLite'
 CACHEDBFILE = 'mementoembed'
 URICACHE_EXPIRATION = 604800
+MEMENTO_CACHE_EXPIRATION = 0
+LIVEWEB_CACHE_EXPIRATION = 3600
+ARCHIVE_HOSTS = "archive.org,archive-it.org,archive.today,archive.ph,archive.is,arquivo.pt,webarchive.org.uk,webarchive.nationalarchives.gov.uk,webarchive.loc.gov,perma.cc,vefsafn.is,swap.stanford.edu"
+URICACHE_MEMORY_ENTRIES = 256
+URICACHE_MEMORY_BYTES = 67108864
+URICACHE_MEMORY_TTL = 30
+NEGATIVE_CACHE_EXPIRATION = 300
+CACHE_DBMAXCONNECTIONS = 50
+HTTP_POOL_CONNECTIONS = 20
+HTTP_POOL_MAXSIZE = 20
+COALESCE_REQUESTS = "Yes"
 APPLICATION_LOGLEVEL = "DEBUG"
 REQUEST_TIMEOUT = 15
+HTML_PARSER = "html5lib"
 APPLICATION_LOGFILE = './mementoembed-application.log'
 ACCESS_LOGFILE = "/tmp/mementoembed/mementoembed-access.log"
+JOB_WORKERS = 2
+JOB_QUEUE_LENGTH = 32
+JOB_TIMEOUT = 900
 ENABLE_THUMBNAILS = "Yes"
 THUMBNAIL_SCRIPT_PATH = "mementoembed/static/js/create_screenshot.js"
 THUMBNAIL_WORKING_FOLDER = "/tmp/mementoembed/thumbnails"
@@ -14,18 +29,35 @@ THUMBNAIL_TIMEOUT = "300"
 THUMBNAIL_WIDTH = "208"
 THUMBNAIL_HEIGHT = "156"
 THUMBNAIL_REMOVE_BANNERS = "No"
+THUMBNAIL_FOLDER_MAX_BYTES = 1073741824
+THUMBNAIL_FOLDER_MAX_FILES = 10000
+THUMBNAIL_BROWSERS = "2"
+THUMBNAIL_BROWSER_RECYCLE_PAGES = "50"
 DEFAULT_IMAGE_PATH = "mementoembed/static/images/96px-Sphere_wireframe.svg.png"
+SURROGATE_ASSEMBLY_THREADS = 16
+SURROGATE_ASSEMBLY_DEADLINE = 60
+IMAGE_SCORING_PROCESSES = 0
+IMAGE_FEATURES_EXPIRATION = 2592000
+IMAGE_PROBES_EXPIRATION = 604800
+WORDCLOUD_LAYOUT_EXPIRATION = 604800
 ENABLE_IMAGEREEL = "Yes"
 IMAGEREEL_WORKING_FOLDER = "/tmp/mementoembed/imagereels"
+IMAGEREEL_FOLDER_MAX_BYTES = 1073741824
+IMAGEREEL_FOLDER_MAX_FILES = 10000
 IMAGEREEL_DURATION = 100
 IMAGEREEL_COUNT = 5
 IMAGEREEL_WIDTH = 320
 IMAGEREEL_HEIGHT = 240
+IMAGEREEL_FORMAT = "gif"
 ENABLE_DOCREEL = "Yes"
 DOCREEL_WORKING_FOLDER = "/tmp/mementoembed/docreels"
+DOCREEL_FOLDER_MAX_BYTES = 1073741824
+DOCREEL_FOLDER_MAX_FILES = 10000
+WORKING_FOLDER_CHECK_INTERVAL = 300
 DOCREEL_DEFAULT_FONT_PATH = "mementoembed/static/fonts/OpenSans-Regular.ttf"
 DOCREEL_DURATION = 100
 DOCREEL_IMAGE_COUNT = 5
 DOCREEL_SENTENCE_COUNT = 5
 DOCREEL_WIDTH = 640
 DOCREEL_HEIGHT = 480
+DOCREEL_FORMAT = "gif"
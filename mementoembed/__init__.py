@@ -10,11 +10,17 @@ import requests_cache
 
 from time import strftime
 
-from redis import RedisError, StrictRedis
+from redis import RedisError
 from flask import Flask, request, render_template, make_response, current_app
 
 from .version import __useragent__
-from .sessions import ManagedSession
+from .sessions import SessionManager
+from .htmldocument import set_html_parser
+from .executors import set_scoring_processes, set_assembly_threads
+from .stores import set_store_factory, get_store
+from .jobqueue import set_job_queue
+from .diskbudget import set_disk_budget, start_disk_budget_monitor
+from .browserpool import set_thumbnail_browsers
 
 application_logger = logging.getLogger(__name__)
 access_logger = logging.getLogger('mementoembed_access')
@@ -49,49 +55,101 @@ def test_file_access(filename):
     except Exception as e:
         raise e
 
-def getURICache(urim):
+def cache_expiration(config, name):
     """
-    Returns an object compliant with requests.Session that provides caching
-    based on the application's configuration.
+    Returns the number of seconds in the cache expiration setting `name`,
+    or None if it is 0, meaning that those responses never expire.
     """
 
-    if current_app.config['CACHEENGINE'] == 'Redis':
+    seconds = int(config[name])
 
-        conn = StrictRedis(
-            host=current_app.config["CACHE_DBHOST"],
-            port=current_app.config["CACHE_DBPORT"],
-            password=current_app.config["CACHE_DBPASSWORD"],
-            db=current_app.config["CACHE_DBNUMBER"]
-        )
+    if seconds <= 0:
+        return None
 
-        return ManagedSession(
+    return seconds
+
+def create_session_manager(config):
+    """
+    Creates the process-wide SessionManager from the application's
+    configuration. It holds the HTTP connection pools, the Redis connection
+    pool, and the cache backend that every request shares.
+    """
+
+    if config['CACHEENGINE'] == 'Redis':
+
+        return SessionManager(
+            cache_engine='Redis',
             cache_name="uricache",
-            backend="redis",
-            expire_after=int(current_app.config['URICACHE_EXPIRATION']),
+            expire_after=cache_expiration(config, 'URICACHE_EXPIRATION'),
+            memento_expire_after=cache_expiration(config, 'MEMENTO_CACHE_EXPIRATION'),
+            live_expire_after=cache_expiration(config, 'LIVEWEB_CACHE_EXPIRATION'),
+            archive_hosts=config['ARCHIVE_HOSTS'].split(','),
+            l1_max_entries=int(config['URICACHE_MEMORY_ENTRIES']),
+            l1_max_bytes=int(config['URICACHE_MEMORY_BYTES']),
+            l1_max_age=float(config['URICACHE_MEMORY_TTL']),
             old_data_on_error=True,
-            connection=conn,
-            timeout=current_app.config['REQUEST_TIMEOUT'],
-            user_agent=__useragent__,
-            starting_uri=urim
+            redis_host=config["CACHE_DBHOST"],
+            redis_port=config["CACHE_DBPORT"],
+            redis_password=config["CACHE_DBPASSWORD"],
+            redis_db=config["CACHE_DBNUMBER"],
+            redis_max_connections=int(config['CACHE_DBMAXCONNECTIONS']),
+            pool_connections=int(config['HTTP_POOL_CONNECTIONS']),
+            pool_maxsize=int(config['HTTP_POOL_MAXSIZE']),
+            coalesce_requests=config['COALESCE_REQUESTS'].lower() == 'yes',
+            timeout=config['REQUEST_TIMEOUT'],
+            user_agent=__useragent__
         )
 
     else:
-        # SQLite as default
+        # SQLite as default, SQLiteWAL for many worker processes
+
+        if config['CACHEENGINE'] == 'SQLiteWAL':
+            cache_engine = 'SQLiteWAL'
+        else:
+            cache_engine = 'SQLite'
 
-        if '.' in current_app.config['CACHEDBFILE']:
-            cachename, ext = current_app.config['CACHEDBFILE'].rsplit('.', 1)
+        if '.' in config['CACHEDBFILE']:
+            cachename, ext = config['CACHEDBFILE'].rsplit('.', 1)
+            ext = '.{}'.format(ext)
         else:
-            cachename = current_app.config['CACHEDBFILE']
+            cachename = config['CACHEDBFILE']
             ext = '.sqlite'
 
-        return ManagedSession(
+        return SessionManager(
+            cache_engine=cache_engine,
             cache_name=cachename,
-            extension=ext,
-            timeout=current_app.config['REQUEST_TIMEOUT'],
-            user_agent=__useragent__,
-            starting_uri=urim
+            cache_extension=ext,
+            expire_after=cache_expiration(config, 'URICACHE_EXPIRATION'),
+            memento_expire_after=cache_expiration(config, 'MEMENTO_CACHE_EXPIRATION'),
+            live_expire_after=cache_expiration(config, 'LIVEWEB_CACHE_EXPIRATION'),
+            archive_hosts=config['ARCHIVE_HOSTS'].split(','),
+            l1_max_entries=int(config['URICACHE_MEMORY_ENTRIES']),
+            l1_max_bytes=int(config['URICACHE_MEMORY_BYTES']),
+            l1_max_age=float(config['URICACHE_MEMORY_TTL']),
+            pool_connections=int(config['HTTP_POOL_CONNECTIONS']),
+            pool_maxsize=int(config['HTTP_POOL_MAXSIZE']),
+            coalesce_requests=config['COALESCE_REQUESTS'].lower() == 'yes',
+            timeout=config['REQUEST_TIMEOUT'],
+            user_agent=__useragent__
         )
 
+def get_session_manager():
+    """
+    Returns the SessionManager created for this application by create_app.
+    """
+    return current_app.extensions['mementoembed_sessions']
+
+def getURICache(urim):
+    """
+    Returns an object compliant with requests.Session that provides caching
+    based on the application's configuration.
+
+    The session is cheap to create; its connection pools and cache backend
+    are shared by the whole process through the SessionManager.
+    """
+
+    return get_session_manager().get_session(urim)
+
 def get_requests_timeout(config):
 
     if 'REQUEST_TIMEOUT' in config:
@@ -107,6 +165,16 @@ def get_requests_timeout(config):
 
     return timeout
 
+def setup_html_parser(config):
+
+    try:
+        set_html_parser(config['HTML_PARSER'])
+    except Exception as e:
+        application_logger.exception("HTML_PARSER value is invalid")
+        application_logger.critical("HTML_PARSER value '{}' is invalid, "
+            "application cannot continue".format(config['HTML_PARSER']))
+        raise e
+
 def setup_logging_config(config):
 
     logfile = None
@@ -206,6 +274,10 @@ def create_app():
 
     application_logger.info("Requests timeout is set to {}".format(app.config['REQUEST_TIMEOUT_FLOAT']))
 
+    setup_html_parser(app.config)
+
+    application_logger.info("HTML parser is set to {}".format(app.config['HTML_PARSER']))
+
     if 'DEFAULT_IMAGE_URI' in app.config:
         application_logger.info("using default image URI of {}".format(app.config['DEFAULT_IMAGE_URI']))
 
@@ -222,11 +294,44 @@ def create_app():
         # application_logger.debug("Default image path now set to {}".format(app.config['DEFAULT_IMAGE_URI']))
 
     application_logger.info("All Configuration successfully loaded for MementoEmbed")
+
+    app.extensions['mementoembed_sessions'] = create_session_manager(app.config)
+
+    set_store_factory(app.extensions['mementoembed_sessions'].get_store)
+
+    set_job_queue(get_store('jobs'),
+        int(app.config['JOB_WORKERS']),
+        int(app.config['JOB_QUEUE_LENGTH']),
+        int(app.config['JOB_TIMEOUT'])
+    )
+
+    application_logger.info("Product jobs will be run by {} workers".format(app.config['JOB_WORKERS']))
+
+    application_logger.info("Shared HTTP session and cache connection pools have been created")
+
+    set_scoring_processes(int(app.config['IMAGE_SCORING_PROCESSES']))
+
+    application_logger.info("Image scoring will use {} processes".format(app.config['IMAGE_SCORING_PROCESSES']))
+
+    # imported here, like the services, as they load the image libraries
+    from .imageselection import set_image_features_expiration, set_image_probes_expiration
+
+    set_image_features_expiration(int(app.config['IMAGE_FEATURES_EXPIRATION']))
+    set_image_probes_expiration(int(app.config['IMAGE_PROBES_EXPIRATION']))
+
+    from .mementowordcloud import set_wordcloud_layout_expiration
+
+    set_wordcloud_layout_expiration(int(app.config['WORDCLOUD_LAYOUT_EXPIRATION']))
+
+    set_assembly_threads(int(app.config['SURROGATE_ASSEMBLY_THREADS']))
+
+    application_logger.info("Surrogate assembly will use {} threads".format(app.config['SURROGATE_ASSEMBLY_THREADS']))
     
-    from .services import oembed, memento, product
+    from .services import oembed, memento, product, stats
     app.register_blueprint(oembed.bp)
     app.register_blueprint(memento.bp)
     app.register_blueprint(product.bp)
+    app.register_blueprint(stats.bp)
 
     from .ui import bp
     app.register_blueprint(bp)
@@ -245,6 +350,18 @@ def create_app():
             except FileExistsError:
                 pass # TODO: a race condition exists in Flask sometimes
 
+        set_thumbnail_browsers(
+            ["node", app.config['THUMBNAIL_SCRIPT_PATH']],
+            int(app.config['THUMBNAIL_BROWSERS']),
+            int(app.config['THUMBNAIL_BROWSER_RECYCLE_PAGES'])
+        )
+
+        application_logger.info("Thumbnails will be captured by {} browsers".format(app.config['THUMBNAIL_BROWSERS']))
+
+        set_disk_budget(app.config['THUMBNAIL_WORKING_FOLDER'],
+            int(app.config['THUMBNAIL_FOLDER_MAX_BYTES']),
+            int(app.config['THUMBNAIL_FOLDER_MAX_FILES']))
+
     if app.config['ENABLE_IMAGEREEL'].lower() == "yes":
         if not os.path.exists( app.config['IMAGEREEL_WORKING_FOLDER'] ):
             application_logger.info("creating imagereel folder at {}".format(app.config['IMAGEREEL_WORKING_FOLDER']))
@@ -254,6 +371,10 @@ def create_app():
             except FileExistsError:
                 pass # TODO: a race condition exists in Flask sometimes
 
+        set_disk_budget(app.config['IMAGEREEL_WORKING_FOLDER'],
+            int(app.config['IMAGEREEL_FOLDER_MAX_BYTES']),
+            int(app.config['IMAGEREEL_FOLDER_MAX_FILES']))
+
     if app.config['ENABLE_DOCREEL'].lower() == "yes":
         if not os.path.exists( app.config['DOCREEL_WORKING_FOLDER'] ):
             application_logger.info("creating imagereel folder at {}".format(app.config['DOCREEL_WORKING_FOLDER']))
@@ -263,6 +384,12 @@ def create_app():
             except FileExistsError:
                 pass # TODO: a race condition exists in Flask sometimes
 
+        set_disk_budget(app.config['DOCREEL_WORKING_FOLDER'],
+            int(app.config['DOCREEL_FOLDER_MAX_BYTES']),
+            int(app.config['DOCREEL_FOLDER_MAX_FILES']))
+
+    start_disk_budget_monitor(int(app.config['WORKING_FOLDER_CHECK_INTERVAL']))
+
     application_logger.info("MementoEmbed is now initialized and ready to receive requests")
 
     #pylint: disable=unused-variable
@@ -5,13 +5,13 @@ import logging
 import requests
 import tldextract
 import aiu
-from bs4 import BeautifulSoup
 
 from urllib.parse import urlparse, urljoin
 
 from .favicon import get_favicon_from_google_service, \
     get_favicon_from_html, find_conventional_favicon_on_live_web, \
     favicon_resource_test
+from .htmldocument import create_soup
 
 module_logger = logging.getLogger('mementoembed.archiveresource')
 
@@ -198,7 +198,7 @@ class ArchiveResource:
                         r = self.httpcache.get(self.collection_uri)
 
                         if r.status_code == 200:
-                            soup = BeautifulSoup(r.content, 'html5lib')
+                            soup = create_soup(r.content)
                             divs = soup.find_all("div", { "class": "capstone-column"} )
 
                             self.archive_collection_name = divs[0].find_all('h3')[0].get_text()
@@ -0,0 +1,356 @@
+import os
+import shutil
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+
+module_logger = logging.getLogger('mementoembed.bodystore')
+
+def body_digest(content):
+    """
+        Returns the SHA-256 digest of `content`, under which its body is
+        kept in a BodyStore.
+    """
+
+    return hashlib.sha256(content).digest()
+
+class BodyStore:
+    """
+        Keeps the bodies of cached responses once each, under the digest of
+        their content, with a count of the cache entries that refer to them.
+
+        A body is kept for as long as at least one cache entry refers to
+        it, so that the same image on every page of an archive, or the
+        same memento behind different URI-Ms, is stored once.
+    """
+
+    def __init__(self, statistics=None):
+        self.statistics = statistics
+
+    def _increment(self, name):
+
+        if self.statistics is not None:
+            self.statistics.increment(name)
+
+    def add(self, digest, blob):
+        """
+            Adds a reference to the body `blob` with `digest`, storing
+            `blob` if no other entry refers to it.
+        """
+
+        if self._add(digest, blob):
+            self._increment('bodies stored')
+        else:
+            self._increment('bodies deduplicated')
+
+    def get(self, digest):
+        """
+            Returns the body with `digest`, or None.
+        """
+
+        return self._get(digest)
+
+    def release(self, digest):
+        """
+            Removes a reference to the body with `digest`, deleting the body
+            once no entry refers to it.
+        """
+
+        if self._release(digest):
+            self._increment('bodies deleted')
+
+    def clear(self):
+        """
+            Deletes every body and reference, for when the cache entries
+            that refer to them are cleared.
+        """
+
+        self._clear()
+
+    def _add(self, digest, blob):
+        raise NotImplementedError
+
+    def _get(self, digest):
+        raise NotImplementedError
+
+    def _release(self, digest):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+
+class MemoryBodyStore(BodyStore):
+    """
+        A BodyStore kept in the memory of this process.
+    """
+
+    def __init__(self, statistics=None):
+        super(MemoryBodyStore, self).__init__(statistics)
+
+        self._lock = threading.Lock()
+        self._bodies = {}
+
+    def _add(self, digest, blob):
+
+        with self._lock:
+
+            if digest in self._bodies:
+                self._bodies[digest][1] += 1
+                return False
+
+            self._bodies[digest] = [ blob, 1 ]
+            return True
+
+    def _get(self, digest):
+
+        with self._lock:
+            entry = self._bodies.get(digest)
+
+        if entry is None:
+            return None
+
+        return entry[0]
+
+    def _release(self, digest):
+
+        with self._lock:
+
+            entry = self._bodies.get(digest)
+
+            if entry is None:
+                return False
+
+            entry[1] -= 1
+
+            if entry[1] <= 0:
+                del self._bodies[digest]
+                return True
+
+            return False
+
+    def _clear(self):
+
+        with self._lock:
+            self._bodies.clear()
+
+
+class FileBodyStore(BodyStore):
+    """
+        A BodyStore that keeps each body in its own file under `folder`
+        and the reference counts in a table of the SQLite cache database
+        `filename`, which serializes changes across worker processes.
+
+        A new body is written to a temporary file before the write lock
+        is taken, so that other workers wait only for it to be renamed
+        into place.
+    """
+
+    def __init__(self, folder, filename, timeout=30, statistics=None):
+        super(FileBodyStore, self).__init__(statistics)
+
+        self.folder = folder
+        self.filename = filename
+        self.timeout = timeout
+
+        self._local = threading.local()
+
+        os.makedirs(self.folder, exist_ok=True)
+
+        self._connection().execute("create table if not exists `bodies` "
+            "(digest BLOB PRIMARY KEY, refs INTEGER)")
+
+    def _connection(self):
+
+        con = getattr(self._local, 'connection', None)
+
+        if con is None:
+            # transactions are begun explicitly so that they hold the write lock
+            con = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None)
+            self._local.connection = con
+
+        return con
+
+    def _path(self, digest):
+
+        name = digest.hex()
+
+        return os.path.join(self.folder, name[0:2], name)
+
+    def _refs(self, con, digest):
+
+        row = con.execute("select refs from `bodies` where digest=?", (digest,)).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0]
+
+    def _write_temporary(self, path, blob):
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.partial')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+
+        except Exception:
+            os.unlink(tmppath)
+            raise
+
+        return tmppath
+
+    def _add(self, digest, blob):
+
+        con = self._connection()
+        path = self._path(digest)
+        tmppath = None
+
+        try:
+            while True:
+
+                if tmppath is None and self._refs(con, digest) is None:
+                    tmppath = self._write_temporary(path, blob)
+
+                con.execute("begin immediate")
+
+                try:
+                    refs = self._refs(con, digest)
+
+                    if refs is not None:
+                        con.execute("update `bodies` set refs=refs+1 where digest=?", (digest,))
+                        stored = False
+
+                    elif tmppath is not None:
+                        os.replace(tmppath, path)
+                        tmppath = None
+                        con.execute("insert into `bodies` (digest, refs) values (?,1)", (digest,))
+                        stored = True
+
+                    else:
+                        # released by another worker since it was checked
+                        stored = None
+
+                    con.execute("commit")
+
+                except Exception:
+                    con.execute("rollback")
+                    raise
+
+                if stored is not None:
+                    return stored
+
+        finally:
+            if tmppath is not None:
+                os.unlink(tmppath)
+
+    def _get(self, digest):
+
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _release(self, digest):
+
+        con = self._connection()
+
+        con.execute("begin immediate")
+
+        try:
+            con.execute("update `bodies` set refs=refs-1 where digest=?", (digest,))
+
+            refs = self._refs(con, digest)
+
+            deleted = refs is not None and refs <= 0
+
+            if deleted:
+                con.execute("delete from `bodies` where digest=?", (digest,))
+
+                try:
+                    os.unlink(self._path(digest))
+                except FileNotFoundError:
+                    pass
+
+            con.execute("commit")
+
+        except Exception:
+            con.execute("rollback")
+            raise
+
+        return deleted
+
+    def _clear(self):
+
+        con = self._connection()
+
+        con.execute("begin immediate")
+
+        try:
+            con.execute("delete from `bodies`")
+
+            for name in os.listdir(self.folder):
+                shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
+
+            con.execute("commit")
+
+        except Exception:
+            con.execute("rollback")
+            raise
+
+
+class RedisBodyStore(BodyStore):
+    """
+        A BodyStore kept in Redis under keys prefixed with `namespace`,
+        with scripts that change a body and its reference count together.
+    """
+
+    add_script = """
+        local refs = redis.call('incr', KEYS[2])
+        if refs == 1 then
+            redis.call('set', KEYS[1], ARGV[1])
+        end
+        return refs
+    """
+
+    release_script = """
+        local refs = redis.call('decr', KEYS[2])
+        if refs <= 0 then
+            redis.call('del', KEYS[1], KEYS[2])
+        end
+        return refs
+    """
+
+    def __init__(self, connection, namespace='mementoembed', statistics=None):
+        super(RedisBodyStore, self).__init__(statistics)
+
+        self.connection = connection
+        self.prefix = "{}:body:".format(namespace)
+
+        self._add_script = self.connection.register_script(self.add_script)
+        self._release_script = self.connection.register_script(self.release_script)
+
+    def _keys(self, digest):
+
+        name = digest.hex()
+
+        return [ self.prefix + name, self.prefix + name + ":refs" ]
+
+    def _add(self, digest, blob):
+        return self._add_script(keys=self._keys(digest), args=[blob]) == 1
+
+    def _get(self, digest):
+        return self.connection.get(self._keys(digest)[0])
+
+    def _release(self, digest):
+        return self._release_script(keys=self._keys(digest)) <= 0
+
+    def _clear(self):
+
+        for key in self.connection.scan_iter(match=self.prefix + '*'):
+            self.connection.delete(key)
@@ -0,0 +1,308 @@
+import json
+import time
+import queue
+import logging
+import threading
+import itertools
+import subprocess
+
+from .sessions import PoolStatistics
+
+module_logger = logging.getLogger('mementoembed.browserpool')
+
+class BrowserPoolError(Exception):
+
+    def __init__(self, message, original_exception=None):
+        self.message = message
+        self.original_exception = original_exception
+
+    def __str__(self):
+        return self.message
+
+class BrowserPoolTimeout(BrowserPoolError):
+    pass
+
+class BrowserCrashed(BrowserPoolError):
+    pass
+
+def capture_job(job_id, urim, output_file, viewport_width, viewport_height, user_agent):
+    """
+        Returns the capture job sent to a screenshot process, holding every
+        parameter of the capture so that concurrent captures share nothing.
+    """
+
+    return {
+        'id': job_id,
+        'urim': urim,
+        'output_file': output_file,
+        'viewport_width': viewport_width,
+        'viewport_height': viewport_height,
+        'user_agent': user_agent
+    }
+
+class BrowserProcess:
+    """
+        A long-lived screenshot process, started with `command`, that keeps
+        a headless browser open and takes capture jobs as lines of JSON on
+        its standard input, answering each with a line of JSON on its
+        standard output.
+    """
+
+    def __init__(self, command):
+
+        self.command = command
+        self.pages = 0
+
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True, bufsize=1)
+
+        self._replies = queue.Queue()
+
+        threading.Thread(target=self._read_replies, daemon=True).start()
+        threading.Thread(target=self._log_errors, daemon=True).start()
+
+        module_logger.info("started browser process {}".format(self.process.pid))
+
+    def _read_replies(self):
+
+        for line in self.process.stdout:
+            self._replies.put(line)
+
+        # end of output, the process has exited
+        self._replies.put(None)
+
+    def _log_errors(self):
+
+        for line in self.process.stderr:
+            module_logger.debug("browser process {}: {}".format(self.process.pid, line.rstrip()))
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def capture(self, job, timeout):
+        """
+            Sends `job` to the browser and waits up to `timeout` seconds for
+            its reply. Raises BrowserPoolTimeout or BrowserCrashed if the
+            browser can no longer be used, or BrowserPoolError if only this
+            capture failed.
+        """
+
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise BrowserCrashed("browser process {} is not accepting jobs".format(
+                self.process.pid), original_exception=e)
+
+        try:
+            line = self._replies.get(timeout=max(timeout, 0))
+        except queue.Empty as e:
+            raise BrowserPoolTimeout("browser failed to capture {} after {} seconds".format(
+                job['urim'], timeout), original_exception=e)
+
+        if line is None:
+            raise BrowserCrashed("browser process {} exited while capturing {}".format(
+                self.process.pid, job['urim']))
+
+        self.pages += 1
+
+        try:
+            reply = json.loads(line)
+        except ValueError as e:
+            # the browser wrote something other than its reply to stdout
+            raise BrowserCrashed("browser process {} sent a garbled reply while capturing {}".format(
+                self.process.pid, job['urim']), original_exception=e)
+
+        if not isinstance(reply, dict):
+            raise BrowserCrashed("browser process {} sent a garbled reply while capturing {}".format(
+                self.process.pid, job['urim']))
+
+        if reply.get('id') != job['id']:
+            raise BrowserCrashed("browser process {} answered job {} instead of {}".format(
+                self.process.pid, reply.get('id'), job['id']))
+
+        if reply.get('status') != 'ok':
+            raise BrowserPoolError("browser failed to capture {}: {}".format(
+                job['urim'], reply.get('message')))
+
+    def close(self):
+
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+
+        self.process.kill()
+
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            module_logger.error("browser process {} did not exit after being killed".format(self.process.pid))
+
+class BrowserPool:
+    """
+        A fixed number of browser processes shared by every thumbnail
+        request of a worker, so that each capture only opens a page instead
+        of starting a browser, and concurrent requests never run more than
+        `size` browsers.
+
+        Browsers are started when first needed, replaced after capturing
+        `recycle_after` pages to bound their memory use, and replaced if
+        they crash or stop responding.
+    """
+
+    def __init__(self, command, size=2, recycle_after=50):
+
+        self.command = command
+        self.size = int(size)
+        self.recycle_after = int(recycle_after)
+        self.statistics = PoolStatistics()
+
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._browsers = set()
+
+        # each slot holds a running browser, or None if one must be started
+        self._idle = queue.LifoQueue()
+
+        for i in range(self.size):
+            self._idle.put(None)
+
+    def _start(self):
+
+        browser = BrowserProcess(self.command)
+
+        with self._lock:
+            self._browsers.add(browser)
+
+        self.statistics.increment('browser starts')
+
+        return browser
+
+    def _discard(self, browser, kill=False):
+
+        with self._lock:
+            self._browsers.discard(browser)
+
+        if kill:
+            browser.kill()
+        else:
+            browser.close()
+
+    def capture(self, urim, output_file, viewport_width, viewport_height, user_agent, timeout):
+        """
+            Writes a screenshot of `urim` to `output_file`, waiting at most
+            `timeout` seconds for a browser and the capture.
+        """
+
+        job = capture_job(next(self._job_ids), urim, output_file,
+            viewport_width, viewport_height, user_agent)
+
+        deadline = time.monotonic() + timeout
+
+        try:
+            browser = self._idle.get(timeout=timeout)
+        except queue.Empty as e:
+            self.statistics.increment('timed out waiting for browser')
+            raise BrowserPoolTimeout("no browser became available within {} seconds".format(timeout),
+                original_exception=e)
+
+        try:
+
+            if browser is not None and not browser.alive:
+                self.statistics.increment('crashed browsers')
+                self._discard(browser, kill=True)
+                browser = None
+
+            if browser is None:
+                browser = self._start()
+
+            try:
+                browser.capture(job, deadline - time.monotonic())
+            except BrowserPoolTimeout:
+                self.statistics.increment('timed out captures')
+                self._discard(browser, kill=True)
+                browser = None
+                raise
+            except BrowserCrashed:
+                self.statistics.increment('crashed browsers')
+                self._discard(browser, kill=True)
+                browser = None
+                raise
+
+            self.statistics.increment('captures')
+
+            if browser.pages >= self.recycle_after:
+                module_logger.info("recycling browser process after {} pages".format(browser.pages))
+                self.statistics.increment('recycled browsers')
+                self._discard(browser)
+                browser = None
+
+        finally:
+            self._idle.put(browser)
+
+    def stats(self):
+
+        stats = self.statistics.as_dict()
+        stats['browsers'] = self.size
+
+        with self._lock:
+            stats['running browsers'] = len(self._browsers)
+
+        return stats
+
+    def shutdown(self):
+
+        with self._lock:
+            browsers = list(self._browsers)
+            self._browsers.clear()
+
+        for browser in browsers:
+            browser.kill()
+
+
+def capture_once(command, urim, output_file, viewport_width, viewport_height, user_agent, timeout):
+    """
+        Writes a screenshot of `urim` to `output_file` with a browser
+        process started with `command` for this capture alone.
+    """
+
+    browser = BrowserProcess(command)
+
+    try:
+        browser.capture(capture_job(0, urim, output_file,
+            viewport_width, viewport_height, user_agent), timeout)
+    except Exception:
+        browser.kill()
+        raise
+
+    browser.close()
+
+
+browser_pool = None
+
+def set_thumbnail_browsers(command, size, recycle_after):
+    """
+        Replaces the process-wide browser pool with one of `size` browsers
+        started with `command`, 0 to start a browser for every thumbnail.
+    """
+
+    global browser_pool
+
+    previous = browser_pool
+
+    if int(size) > 0:
+        browser_pool = BrowserPool(command, size, recycle_after)
+    else:
+        browser_pool = None
+
+    if previous is not None:
+        previous.shutdown()
+
+def get_browser_pool():
+    return browser_pool
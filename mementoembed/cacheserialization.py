@@ -0,0 +1,403 @@
+import json
+import struct
+import logging
+import functools
+
+from datetime import datetime, timedelta
+
+import brotli
+import requests
+
+from requests.structures import CaseInsensitiveDict
+from requests_cache.backends.base import BaseCache
+
+from .bodystore import body_digest
+
+module_logger = logging.getLogger('mementoembed.cacheserialization')
+
+# the first bytes of every response serialized by dumps_response
+serialization_magic = b'MEr1'
+
+body_raw = 0
+body_brotli = 1
+# the body is kept in a BodyStore under the digest that follows
+body_reference = 2
+
+# lower qualities compress archived HTML almost as well in a fraction of the time
+brotli_quality = 5
+
+# bodies shorter than this are not worth compressing or sharing
+min_compressed_size = 256
+
+# headers that only describe a single connection
+dropped_headers = [ 'connection', 'keep-alive', 'proxy-connection',
+    'transfer-encoding', 'set-cookie' ]
+
+# content types whose bodies are already compressed
+compressed_types = [ 'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'application/zip', 'application/gzip', 'video/', 'audio/' ]
+
+epoch = datetime(1970, 1, 1)
+
+class CacheSerializationError(Exception):
+    pass
+
+class MissingBodyError(CacheSerializationError):
+    pass
+
+def _headers(headers):
+
+    return [ [ name, value ] for name, value in headers.items()
+        if name.lower() not in dropped_headers ]
+
+def _request(request):
+
+    if request is None:
+        return None
+
+    return {
+        "method": request.method,
+        "url": request.url,
+        "headers": _headers(request.headers)
+    }
+
+def _is_compressed(response):
+
+    content_type = response.headers.get('content-type', '').lower()
+
+    return any( content_type.startswith(t) for t in compressed_types )
+
+def dumps_response(response, timestamp, body_store=None):
+    """
+        Returns the status, headers, URL, request, and redirect history of
+        `response`, cached at `timestamp`, followed by its body in a compact
+        binary form. Bodies that are not already compressed (e.g., HTML) are
+        compressed with Brotli.
+
+        If `body_store` is given, the body is added to it and the returned
+        record refers to the body by its digest instead of containing it.
+    """
+
+    content = response.content or b''
+
+    body = content
+    codec = body_raw
+
+    if len(body) >= min_compressed_size and not _is_compressed(response):
+
+        compressed = brotli.compress(body, quality=brotli_quality)
+
+        if len(compressed) < len(body):
+            body = compressed
+            codec = body_brotli
+
+    if body_store is not None and len(content) >= min_compressed_size:
+
+        digest = body_digest(content)
+        body_store.add(digest, bytes([codec]) + body)
+
+        codec = body_reference
+        body = digest
+
+    metadata = json.dumps({
+        "url": response.url,
+        "status": response.status_code,
+        "reason": response.reason,
+        "encoding": response.encoding,
+        "headers": _headers(response.headers),
+        "request": _request(response.request),
+        "history": [ {
+            "url": r.url,
+            "status": r.status_code,
+            "reason": r.reason,
+            "headers": _headers(r.headers),
+            "request": _request(r.request)
+        } for r in response.history ]
+    }, separators=(',', ':')).encode('utf8')
+
+    return b''.join([
+        serialization_magic,
+        struct.pack('>BdI', codec, (timestamp - epoch).total_seconds(), len(metadata)),
+        metadata,
+        body
+    ])
+
+def _restore_request(data):
+
+    if data is None:
+        return None
+
+    request = requests.PreparedRequest()
+    request.method = data["method"]
+    request.url = data["url"]
+    request.headers = CaseInsensitiveDict(data["headers"])
+    request.body = None
+    request.hooks = { 'response': [] }
+
+    return request
+
+def _restore(data, content):
+
+    response = requests.Response()
+    response.url = data["url"]
+    response.status_code = data["status"]
+    response.reason = data["reason"]
+    response.encoding = data.get("encoding")
+    response.headers = CaseInsensitiveDict(data["headers"])
+    response.request = _restore_request(data["request"])
+    response.elapsed = timedelta(0)
+    response._content = content
+    response._content_consumed = True
+
+    return response
+
+def loads_metadata(value):
+    """
+        Returns the body codec, timestamp, response metadata, and body of
+        the record `value` without decoding the body.
+    """
+
+    if value[:len(serialization_magic)] != serialization_magic:
+        raise CacheSerializationError("not a serialized response")
+
+    offset = len(serialization_magic)
+    codec, seconds, length = struct.unpack_from('>BdI', value, offset)
+    offset += struct.calcsize('>BdI')
+
+    data = json.loads(value[offset:offset + length].decode('utf8'))
+
+    return codec, epoch + timedelta(seconds=seconds), data, value[offset + length:]
+
+def body_reference_of(value):
+    """
+        Returns the digest of the body that the record `value` refers to,
+        or None if the record contains its body.
+    """
+
+    if not isinstance(value, bytes):
+        return None
+
+    codec, timestamp, data, body = loads_metadata(value)
+
+    if codec == body_reference:
+        return bytes(body)
+
+    return None
+
+def loads_response(value, body_store=None):
+    """
+        Returns the response and timestamp serialized in `value` by
+        dumps_response, reading its body from `body_store` if the record
+        refers to one.
+    """
+
+    codec, timestamp, data, body = loads_metadata(value)
+
+    if codec == body_reference:
+
+        blob = None if body_store is None else body_store.get(bytes(body))
+
+        if blob is None:
+            raise MissingBodyError("body {} is missing".format(bytes(body).hex()))
+
+        codec, body = blob[0], blob[1:]
+
+    if codec == body_brotli:
+        body = brotli.decompress(body)
+    elif codec != body_raw:
+        raise CacheSerializationError("unknown body codec {}".format(codec))
+
+    response = _restore(data, bytes(body))
+    response.history = [ _restore(r, b'') for r in data["history"] ]
+
+    return response, timestamp
+
+
+class CompactCache(BaseCache):
+    """
+        A cache backend that keeps the entries of `backend` -- SQLite or
+        Redis -- serialized with dumps_response rather than as pickled
+        Response objects.
+
+        If `body_store` is given, the backend becomes an index of the
+        metadata of each response and its bodies are kept, once each, in
+        `body_store`.
+
+        Entries pickled by earlier versions are still read and are
+        rewritten in the compact form when read, or all at once by
+        migrate.
+    """
+
+    def __init__(self, backend, statistics=None, body_store=None):
+
+        super(CompactCache, self).__init__()
+
+        self.backend = backend
+        self.statistics = statistics
+        self.body_store = body_store
+
+        # share the backend's storage so that keys_map and has_key work as before
+        self.responses = backend.responses
+        self.keys_map = backend.keys_map
+
+    def _increment(self, name):
+
+        if self.statistics is not None:
+            self.statistics.increment(name)
+
+    def create_key(self, request):
+        return self.backend.create_key(request)
+
+    def _release(self, value):
+
+        if self.body_store is None:
+            return
+
+        try:
+            digest = body_reference_of(value)
+        except Exception:
+            return
+
+        if digest is None:
+            return
+
+        # a backend that batches its writes releases the body once the
+        # change to the entry is committed, so that no other worker reads
+        # an entry whose body is gone
+        after_commit = getattr(self.responses, 'after_commit', None)
+
+        if after_commit is not None:
+            after_commit(functools.partial(self.body_store.release, digest))
+        else:
+            self.body_store.release(digest)
+
+    def _store(self, key, response, timestamp):
+
+        previous = self.responses.get(key)
+
+        self.responses[key] = dumps_response(response, timestamp, self.body_store)
+
+        # released after the new body is added in case it is the same body
+        self._release(previous)
+
+    def _load(self, key, value):
+
+        if isinstance(value, bytes):
+            return loads_response(value, self.body_store)
+
+        # an entry pickled by requests_cache
+        reduced, timestamp = value
+        response = self.backend.restore_response(reduced)
+
+        try:
+            self._store(key, response, timestamp)
+            self._increment('uricache entries migrated')
+        except Exception:
+            module_logger.exception("failed to migrate cache entry {}".format(key))
+
+        return response, timestamp
+
+    def save_response(self, key, response):
+
+        self._store(key, response, datetime.utcnow())
+
+    def get_response_and_time(self, key, default=(None, None)):
+
+        try:
+            if key not in self.responses:
+                key = self.keys_map[key]
+            value = self.responses[key]
+        except KeyError:
+            return default
+
+        try:
+            return self._load(key, value)
+        except MissingBodyError:
+            # the entry is replaced when the response is fetched again;
+            # deleting it here could delete a newer entry from another
+            # worker, and release a body that entry refers to
+            module_logger.warning("the body of cache entry {} is missing".format(key))
+            self._increment('uricache missing bodies')
+            return default
+        except Exception:
+            # treat an entry that cannot be read as missing so it is fetched again
+            module_logger.exception("failed to read cache entry {}, discarding it".format(key))
+            self.delete(key)
+            return default
+
+    def delete(self, key):
+
+        try:
+            if key in self.responses:
+                value = self.responses[key]
+                del self.responses[key]
+
+                self._release(value)
+            else:
+                # a redirect to an entry, which keeps its body
+                value = self.responses[self.keys_map[key]]
+                del self.keys_map[key]
+        except KeyError:
+            return
+
+        try:
+            if isinstance(value, bytes):
+                history = [ _restore(r, b'') for r in loads_metadata(value)[2]["history"] ]
+            else:
+                history = self.backend.restore_response(value[0]).history
+        except Exception:
+            return
+
+        for r in history:
+            if r.request is not None:
+                self.keys_map.pop(self.create_key(r.request), None)
+
+    def clear(self):
+
+        super(CompactCache, self).clear()
+
+        # no entry refers to any body now
+        if self.body_store is not None:
+            self.body_store.clear()
+
+    def remove_old_entries(self, created_before):
+
+        for key in list(self.responses):
+
+            try:
+                response, created_at = self.get_response_and_time(key)
+            except KeyError:
+                continue
+
+            if created_at is not None and created_at < created_before:
+                self.delete(key)
+
+    def migrate(self):
+        """
+            Rewrites every pickled entry of the backend in the compact
+            form, and moves the bodies of entries that contain them into
+            the body store, returning the number of entries rewritten.
+        """
+
+        migrated = 0
+
+        for key in list(self.responses):
+
+            try:
+                value = self.responses[key]
+            except KeyError:
+                continue
+
+            if not isinstance(value, bytes):
+                self._load(key, value)
+                migrated += 1
+
+            elif self.body_store is not None and body_reference_of(value) is None:
+
+                response, timestamp = loads_response(value)
+
+                if len(response.content) >= min_compressed_size:
+                    self._store(key, response, timestamp)
+                    migrated += 1
+
+        return migrated
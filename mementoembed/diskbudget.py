@@ -0,0 +1,308 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+import contextlib
+
+from .sessions import PoolStatistics
+
+module_logger = logging.getLogger('mementoembed.diskbudget')
+
+def is_temporary(filename):
+    # screenshots being captured and artifacts being written are never evicted
+    return filename.startswith("capture-") or filename.endswith(".partial")
+
+class DiskBudget:
+    """
+        Keeps the artifacts in a working folder (thumbnails, imagereels,
+        docreels) within `max_bytes` and `max_files`, removing the least
+        recently used artifacts first. A limit of 0 is no limit.
+
+        Artifacts are used in the order of their modification times, which
+        are updated whenever an artifact is served from the folder, so that
+        every worker sharing the folder sees the same order. Temporary
+        files untouched for `stale_after` seconds were left by a worker
+        that stopped while writing them, and are removed.
+    """
+
+    def __init__(self, folder, max_bytes=0, max_files=0, stale_after=3600):
+
+        self.folder = folder
+        self.max_bytes = int(max_bytes)
+        self.max_files = int(max_files)
+        self.stale_after = stale_after
+        self.statistics = PoolStatistics()
+
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._files = 0
+
+        self.scan()
+
+    def _entries(self):
+
+        artifacts = []
+        temporary = []
+
+        try:
+            entries = os.scandir(self.folder)
+        except FileNotFoundError:
+            return artifacts, temporary
+
+        with entries:
+
+            for entry in entries:
+
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                    else:
+                        continue
+                except FileNotFoundError:
+                    # removed by another worker
+                    continue
+
+                if is_temporary(entry.name):
+                    temporary.append( (stat.st_mtime, stat.st_size, entry.path) )
+                else:
+                    artifacts.append( (stat.st_mtime, stat.st_size, entry.path) )
+
+        return artifacts, temporary
+
+    def _measure(self):
+
+        artifacts, temporary = self._entries()
+        artifacts.sort()
+
+        with self._lock:
+            self._bytes = sum( size for mtime, size, path in artifacts )
+            self._files = len(artifacts)
+
+        self.statistics.increment('scans')
+
+        return artifacts, temporary
+
+    def scan(self):
+        """
+            Measures the folder, returning its artifacts from least to most
+            recently used.
+        """
+
+        return self._measure()[0]
+
+    def over_budget(self, total_bytes, total_files):
+
+        return (self.max_bytes > 0 and total_bytes > self.max_bytes) or \
+            (self.max_files > 0 and total_files > self.max_files)
+
+    def remove_stale(self, temporary):
+
+        stale_before = time.time() - self.stale_after
+
+        for mtime, size, path in temporary:
+
+            if mtime >= stale_before:
+                continue
+
+            try:
+                os.unlink(path)
+                self.statistics.increment('stale files removed')
+            except FileNotFoundError:
+                pass
+
+    def enforce(self):
+        """
+            Measures the folder again, so that files written or removed by
+            other workers are counted, removes stale temporary files, and
+            removes the least recently used artifacts until the folder is
+            within its budget. Returns the number of artifacts removed.
+        """
+
+        artifacts, temporary = self._measure()
+
+        self.remove_stale(temporary)
+
+        total_bytes = sum( size for mtime, size, path in artifacts )
+        total_files = len(artifacts)
+
+        evicted = 0
+
+        for mtime, size, path in artifacts:
+
+            if not self.over_budget(total_bytes, total_files):
+                break
+
+            try:
+                os.unlink(path)
+                evicted += 1
+                self.statistics.increment('evicted files')
+                self.statistics.increment('evicted bytes', size)
+            except FileNotFoundError:
+                # removed by another worker
+                pass
+
+            total_bytes -= size
+            total_files -= 1
+
+        with self._lock:
+            self._bytes = total_bytes
+            self._files = total_files
+
+        return evicted
+
+    def written(self, path):
+        """
+            Records that an artifact was written to `path`, adding it to the
+            running totals. The folder is only measured again, and the
+            budget enforced, once the totals exceed the budget: they count
+            a replaced artifact twice and miss what other workers write and
+            evict until the folder is measured.
+        """
+
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            # evicted by another worker
+            return
+
+        with self._lock:
+            self._bytes += size
+            self._files += 1
+
+            over_budget = self.over_budget(self._bytes, self._files)
+
+        if over_budget and self.enforce() > 0:
+            self.statistics.increment('evictions on write')
+
+    def accessed(self, path):
+        """
+            Records that the artifact at `path` was used.
+        """
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+
+        stats = self.statistics.as_dict()
+
+        with self._lock:
+            stats['bytes'] = self._bytes
+            stats['files'] = self._files
+
+        stats['max bytes'] = self.max_bytes
+        stats['max files'] = self.max_files
+
+        return stats
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+_monitor = None
+
+def set_disk_budget(folder, max_bytes, max_files):
+    """
+        Limits the working folder `folder` to `max_bytes` and `max_files`.
+    """
+
+    budget = DiskBudget(folder, max_bytes, max_files)
+
+    with _budgets_lock:
+        _budgets[os.path.realpath(folder)] = budget
+
+    return budget
+
+def get_disk_budget(folder):
+
+    with _budgets_lock:
+        return _budgets.get(os.path.realpath(folder))
+
+def artifact_written(path):
+    """
+        Records that an artifact was written to `path` in a working folder.
+    """
+
+    budget = get_disk_budget(os.path.dirname(path))
+
+    if budget is not None:
+        budget.written(path)
+
+def artifact_accessed(path):
+    """
+        Records that the artifact at `path` in a working folder was used.
+    """
+
+    budget = get_disk_budget(os.path.dirname(path))
+
+    if budget is not None:
+        budget.accessed(path)
+
+@contextlib.contextmanager
+def write_artifact(path):
+    """
+        Opens a temporary file for writing, and reading back, the artifact
+        at `path` and moves it into place once it is complete, so that
+        concurrent requests never read or overwrite a partial artifact.
+    """
+
+    fd, partialfile = tempfile.mkstemp(
+        prefix="{}.".format(os.path.basename(path)), suffix=".partial",
+        dir=os.path.dirname(path))
+
+    try:
+        with os.fdopen(fd, 'w+b') as f:
+            yield f
+
+        os.replace(partialfile, path)
+
+    except BaseException:
+
+        try:
+            os.unlink(partialfile)
+        except FileNotFoundError:
+            pass
+
+        raise
+
+    artifact_written(path)
+
+def disk_budget_stats():
+
+    with _budgets_lock:
+        return dict( (budget.folder, budget.stats()) for budget in _budgets.values() )
+
+def enforce_disk_budgets():
+
+    with _budgets_lock:
+        budgets = list(_budgets.values())
+
+    for budget in budgets:
+
+        try:
+            budget.enforce()
+        except Exception:
+            module_logger.exception("failed to enforce the disk budget of {}".format(budget.folder))
+
+def start_disk_budget_monitor(interval):
+    """
+        Enforces every disk budget every `interval` seconds in a background
+        thread, so that folders shared with other workers stay within their
+        budgets even when this worker writes nothing.
+    """
+
+    global _monitor
+
+    if _monitor is not None or interval <= 0:
+        return
+
+    def monitor():
+
+        while True:
+            time.sleep(interval)
+            enforce_disk_budgets()
+
+    _monitor = threading.Thread(target=monitor, name='disk-budget-monitor', daemon=True)
+    _monitor.start()
@@ -0,0 +1,179 @@
+import logging
+import threading
+import multiprocessing
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .sessions import PoolStatistics
+
+module_logger = logging.getLogger('mementoembed.executors')
+
+def run_in_thread(function, *args):
+    """
+        Runs `function` in the calling thread, returning a completed Future
+        so that callers can treat the result like one from a pool.
+    """
+
+    future = Future()
+
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+
+    return future
+
+class ScoringExecutor:
+    """
+        Runs CPU-bound work, such as decoding and hashing images, in a pool
+        of processes shared by the worker so that it uses every core and
+        does not hold the GIL while downloads continue.
+
+        With a size of 0 the work runs in the calling thread. If the pool
+        breaks (e.g., a process is killed), the work falls back to the
+        calling thread and a new pool is started for later work.
+    """
+
+    def __init__(self, max_workers=0):
+
+        self.max_workers = int(max_workers)
+        self.statistics = PoolStatistics()
+
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+
+        with self._lock:
+
+            if self._pool is None:
+                module_logger.info("starting scoring process pool with {} processes".format(self.max_workers))
+
+                # spawn, because forking a threaded web worker can deadlock
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+            return self._pool
+
+    def _discard_pool(self, pool):
+
+        with self._lock:
+
+            if self._pool is pool:
+                module_logger.warning("scoring process pool is broken, discarding it")
+                self._pool = None
+                self.statistics.increment('broken pools')
+
+        pool.shutdown(wait=False)
+
+    def submit(self, function, *args):
+        """
+            Returns a Future for the result of `function(*args)`; the
+            function and its arguments must be picklable.
+        """
+
+        if self.max_workers <= 0:
+            self.statistics.increment('run in thread')
+            return run_in_thread(function, *args)
+
+        pool = self._get_pool()
+
+        try:
+            pool_future = pool.submit(function, *args)
+        except (BrokenProcessPool, RuntimeError):
+            self._discard_pool(pool)
+            self.statistics.increment('run in thread after failure')
+            return run_in_thread(function, *args)
+
+        self.statistics.increment('run in pool')
+
+        future = Future()
+
+        def transfer(pool_future):
+
+            exception = pool_future.exception()
+
+            if isinstance(exception, BrokenProcessPool):
+                self._discard_pool(pool)
+                self.statistics.increment('run in thread after failure')
+                fallback = run_in_thread(function, *args)
+                exception = fallback.exception()
+
+                if exception is None:
+                    future.set_result(fallback.result())
+                    return
+
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(pool_future.result())
+
+        pool_future.add_done_callback(transfer)
+
+        return future
+
+    def stats(self):
+
+        stats = self.statistics.as_dict()
+        stats['processes'] = self.max_workers
+
+        return stats
+
+    def shutdown(self):
+
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+
+        if pool is not None:
+            pool.shutdown()
+
+
+scoring_executor = ScoringExecutor(0)
+
+def set_scoring_processes(max_workers):
+    """
+        Replaces the process-wide scoring executor with one of `max_workers`
+        processes, 0 to score in the calling thread.
+    """
+
+    global scoring_executor
+
+    previous = scoring_executor
+    scoring_executor = ScoringExecutor(max_workers)
+    previous.shutdown()
+
+def get_scoring_executor():
+    return scoring_executor
+
+
+assembly_executor = None
+
+def set_assembly_threads(max_workers):
+    """
+        Replaces the process-wide executor that gathers the parts of
+        surrogates and the images of reels concurrently with one of
+        `max_workers` threads, 0 to gather them one after another in the
+        request thread.
+    """
+
+    global assembly_executor
+
+    previous = assembly_executor
+
+    if int(max_workers) > 0:
+        assembly_executor = ThreadPoolExecutor(
+            max_workers=int(max_workers),
+            thread_name_prefix='surrogate-assembly'
+        )
+    else:
+        assembly_executor = None
+
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+def get_assembly_executor():
+    return assembly_executor
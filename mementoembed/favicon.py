@@ -4,9 +4,10 @@ import tldextract
 
 from datetime import datetime
 
-from bs4 import BeautifulSoup
 from requests.exceptions import RequestException
 
+from .htmldocument import parse_html
+
 module_logger = logging.getLogger('mementoembed.favicon')
 
 def favicon_resource_test(response):
@@ -39,13 +40,13 @@ def get_favicon_from_html(content):
     favicon_uri = None
 
     try:
-        soup = BeautifulSoup(content, 'html5lib')
+        document = parse_html(content)
     except Exception:
         module_logger.exception("failed to open document using BeautifulSoup")
         return favicon_uri
 
     try:
-        links = soup.find_all("link")
+        links = document.links
     except Exception:
         module_logger.exception("failed to find link tags in document using BeautifulSoup")
         return favicon_uri
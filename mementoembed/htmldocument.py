@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+
+from bs4 import BeautifulSoup
+
+module_logger = logging.getLogger('mementoembed.htmldocument')
+
+_document_cache = OrderedDict()
+_document_cache_lock = threading.Lock()
+_document_cache_bytes = 0
+
+# the number of recently parsed documents kept by parse_html
+document_cache_size = 16
+
+# the total size of the markup of the documents kept by parse_html; their
+# trees take several times as much memory, so larger documents are parsed
+# for each caller rather than kept
+document_cache_max_bytes = 4 * 1024 * 1024
+
+# BeautifulSoup tree builders, plus html5-parser, a C implementation of the
+# html5lib algorithm that builds BeautifulSoup trees
+supported_html_parsers = [ 'html5lib', 'lxml', 'html.parser', 'html5-parser' ]
+
+html_parser = 'html5lib'
+
+class HTMLParserConfigurationError(Exception):
+
+    def __init__(self, message, original_exception=None):
+        self.message = message
+        self.original_exception = original_exception
+
+def set_html_parser(parser):
+    """
+        Selects the parser used for all HTML extraction, one of
+        supported_html_parsers. Raises HTMLParserConfigurationError if the
+        parser is unknown or its library is not installed.
+    """
+
+    global html_parser, _document_cache_bytes
+
+    if parser not in supported_html_parsers:
+        raise HTMLParserConfigurationError(
+            "unsupported HTML parser '{}', expected one of {}".format(
+                parser, ", ".join(supported_html_parsers)))
+
+    try:
+        create_soup("<html><head><title>test</title></head></html>", parser)
+    except Exception as e:
+        raise HTMLParserConfigurationError(
+            "HTML parser '{}' is not available".format(parser),
+            original_exception=e)
+
+    with _document_cache_lock:
+        _document_cache.clear()
+        _document_cache_bytes = 0
+        html_parser = parser
+
+    module_logger.info("using HTML parser {}".format(parser))
+
+def create_soup(content, parser=None):
+    """
+        Parses `content` into a BeautifulSoup tree with the given parser, or
+        the configured parser if none is given.
+    """
+
+    if parser is None:
+        parser = html_parser
+
+    if parser == 'html5-parser':
+        # imported here because html5-parser is an optional dependency
+        from html5_parser import parse
+        return parse(content, treebuilder='soup', return_root=False)
+
+    return BeautifulSoup(content, parser)
+
+class HTMLDocument:
+    """
+        A parsed HTML document whose elements are discovered once and shared
+        by every extractor (title, snippet, images, favicon, metadata) that
+        examines the same memento content.
+
+        The elements are memoized and must be treated as read-only by
+        callers.
+    """
+
+    def __init__(self, content, parser=None):
+
+        if content is None:
+            content = ""
+
+        self.content = content
+        self.parser = parser
+
+        self._soup = None
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    @property
+    def soup(self):
+
+        if self._soup is None:
+
+            with self._lock:
+
+                if self._soup is None:
+                    module_logger.debug("parsing document of size {}".format(len(self.content)))
+                    self._soup = create_soup(self.content, self.parser)
+
+        return self._soup
+
+    def _memoize(self, name, function):
+
+        try:
+            return self._memo[name]
+        except KeyError:
+            value = function()
+            self._memo[name] = value
+            return value
+
+    @property
+    def title(self):
+        """
+            Returns the text of the title element, or None if the document
+            has no title.
+        """
+
+        def find_title():
+            if self.soup.title is None:
+                return None
+            return self.soup.title.text
+
+        return self._memoize('title', find_title)
+
+    @property
+    def metatags(self):
+        return self._memoize('metatags', lambda: self.soup.find_all('meta'))
+
+    @property
+    def metadata(self):
+        return self._memoize('metadata', lambda: [ tag.attrs for tag in self.metatags ])
+
+    @property
+    def images(self):
+        return self._memoize('images', lambda: self.soup.find_all('img'))
+
+    @property
+    def frames(self):
+        return self._memoize('frames', lambda: self.soup.find_all('frame'))
+
+    @property
+    def links(self):
+        return self._memoize('links', lambda: self.soup.find_all('link'))
+
+    def find(self, *args, **kwargs):
+        return self.soup.find(*args, **kwargs)
+
+    def find_all(self, *args, **kwargs):
+        return self.soup.find_all(*args, **kwargs)
+
+
+def parse_html(content):
+    """
+        Returns an HTMLDocument for `content`, which may be a string, bytes,
+        or an HTMLDocument already. Recently parsed content is recognized by
+        its digest, so extractors given the same memento content by
+        different callers share a single parse. At most document_cache_size
+        documents, and document_cache_max_bytes of markup, are kept.
+    """
+
+    global _document_cache_bytes
+
+    if isinstance(content, HTMLDocument):
+        return content
+
+    if content is None:
+        content = ""
+
+    if isinstance(content, bytes):
+        key = hashlib.sha256(content).hexdigest()
+    else:
+        key = hashlib.sha256(content.encode('utf8', errors='surrogatepass')).hexdigest()
+
+    size = len(content)
+
+    with _document_cache_lock:
+
+        document = _document_cache.get(key)
+
+        if document is not None:
+            _document_cache.move_to_end(key)
+            return document
+
+        document = HTMLDocument(content)
+
+        if size <= document_cache_max_bytes:
+            _document_cache[key] = document
+            _document_cache_bytes += size
+
+            while len(_document_cache) > document_cache_size or \
+                _document_cache_bytes > document_cache_max_bytes:
+                _document_cache_bytes -= len(_document_cache.popitem(last=False)[1].content)
+
+    # parse outside of the cache lock so that different documents are
+    # parsed concurrently, errors surface here rather than at first use
+    document.soup
+
+    return document
+
+def html_content(content):
+    """
+        Returns the markup for `content`, which may be a string or an
+        HTMLDocument.
+    """
+
+    if isinstance(content, HTMLDocument):
+        return content.content
+
+    return content
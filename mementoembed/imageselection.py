@@ -3,19 +3,20 @@ import base64
 import traceback
 import io
 import sys
-import random
 import datetime
 import imghdr
+import json
+import hashlib
 
 import cairosvg
 import magic
 import imagehash
 
 from base64 import binascii
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 from urllib.parse import urljoin, urlparse
 from copy import deepcopy
 
-from bs4 import BeautifulSoup
 from PIL import ImageFile, Image
 from requests.exceptions import RequestException
 from requests import Session
@@ -25,6 +26,9 @@ from datauri import DataURI
 
 from .mementoresource import MementoParsingError, MementoResourceError
 from .sessions import ManagedSession
+from .htmldocument import parse_html
+from .executors import get_scoring_executor, run_in_thread
+from .stores import get_store
 
 module_logger = logging.getLogger('mementoembed.imageselection')
 
@@ -95,7 +99,12 @@ def score_image(imagecontent, n, N):
     
     return score
 
-def scores_for_image(imagecontent, n, N):
+def image_features(imagecontent):
+    """
+        Returns the measurements of an image that do not depend on the page
+        it appears in: its format, dimensions, histogram, color count, and
+        perceptual hashes.
+    """
 
     imagedata = {}
 
@@ -140,6 +149,21 @@ def scores_for_image(imagecontent, n, N):
     imagedata['dHash_vertical'] = str(imagehash.dhash_vertical(img))
     imagedata['wHash'] = str(imagehash.whash(img))
 
+    return imagedata
+
+def score_image_features(features, n, N):
+    """
+        Returns a copy of `features` from image_features with the score of
+        the image at position `n` of the `N` images in a page.
+    """
+
+    imagedata = dict(features)
+
+    s = imagedata['size in pixels']
+    h = imagedata['blank columns in histogram']
+    r = imagedata['ratio width/height']
+    c = imagedata['colorcount']
+
     k1 = 0.1 
     k2 = 0.4
     k3 = 10
@@ -160,6 +184,206 @@ def scores_for_image(imagecontent, n, N):
 
     return imagedata
 
+def scores_for_image(imagecontent, n, N):
+
+    return score_image_features(image_features(imagecontent), n, N)
+
+# the name of the store holding image_features results by content digest
+image_features_store = 'image_features'
+
+# the number of seconds image features are kept in the store, None for ever
+image_features_expiration = 2592000
+
+def set_image_features_expiration(seconds):
+    """
+        Sets the number of seconds that image features are kept in the
+        image features store, 0 to keep them until the store is cleared.
+    """
+
+    global image_features_expiration
+
+    image_features_expiration = int(seconds) if int(seconds) > 0 else None
+
+def image_features_key(imagecontent):
+    return hashlib.sha256(imagecontent).hexdigest()
+
+def cached_image_features(imagecontent, scoring_executor=None):
+    """
+        Returns a Future for the image_features of `imagecontent`. Features
+        are kept in the image features store by the digest of the image's
+        bytes, so the same image is decoded and hashed once no matter how
+        many pages or reels it appears in.
+    """
+
+    store = get_store(image_features_store)
+
+    if scoring_executor is None:
+        scoring_executor = get_scoring_executor()
+
+    if store is None:
+        return scoring_executor.submit(image_features, imagecontent)
+
+    key = image_features_key(imagecontent)
+
+    try:
+        cached = store.get(key)
+    except Exception:
+        module_logger.exception("failed to read image features from store")
+        cached = None
+
+    if cached is not None:
+        future = Future()
+        future.set_result(json.loads(cached.decode('utf8')))
+        return future
+
+    future = scoring_executor.submit(image_features, imagecontent)
+
+    def save(future):
+
+        if future.exception() is None:
+
+            try:
+                store.set(key, json.dumps(future.result()).encode('utf8'),
+                    expire_after=image_features_expiration)
+            except Exception:
+                module_logger.exception("failed to save image features to store")
+
+    future.add_done_callback(save)
+
+    return future
+
+# the number of bytes fetched to read an image's format and dimensions
+probe_size = 16384
+
+# images at or below this many pixels are likely tracking pixels or spacers
+probe_tracking_pixels = 4
+
+# images below this many pixels are too small to be a striking image
+probe_min_pixels = 1024
+
+# images wider or taller than this ratio are likely banners or rules
+probe_max_ratio = 8
+
+def probe_prune_reason(width, height):
+
+    s = width * height
+
+    if s <= probe_tracking_pixels:
+        return "tracking pixel"
+
+    if s < probe_min_pixels:
+        return "tiny"
+
+    if max(width / height, height / width) > probe_max_ratio:
+        return "extreme ratio"
+
+    return None
+
+# the name of the store holding probe_image results by image URI
+image_probes_store = 'image_probes'
+
+# the number of seconds image probes are kept in the store, None for ever
+image_probes_expiration = 604800
+
+def set_image_probes_expiration(seconds):
+    """
+        Sets the number of seconds that image probes are kept in the image
+        probes store, 0 to keep them until the store is cleared.
+    """
+
+    global image_probes_expiration
+
+    image_probes_expiration = int(seconds) if int(seconds) > 0 else None
+
+def image_probe_key(imageuri, size):
+    return hashlib.sha256("{} {}".format(size, imageuri).encode('utf8')).hexdigest()
+
+def probe_image(imageuri, http_cache, size=probe_size):
+    """
+        Fetches the first `size` bytes of the image at `imageuri` and reads
+        its format and dimensions from the header, returning a dict that
+        includes a reason for pruning the image before it is downloaded in
+        full, or None if it should be downloaded.
+
+        Successful probes are kept in the image probes store by URI, so an
+        image is probed once no matter how many requests include it.
+        Probe failures are recorded in the dict and never prune an image.
+    """
+
+    store = get_store(image_probes_store)
+
+    if store is None:
+        return fetch_image_probe(imageuri, http_cache, size)
+
+    key = image_probe_key(imageuri, size)
+
+    try:
+        cached = store.get(key)
+    except Exception:
+        module_logger.exception("failed to read image probe from store")
+        cached = None
+
+    if cached is not None:
+        return json.loads(cached.decode('utf8'))
+
+    probe = fetch_image_probe(imageuri, http_cache, size)
+
+    if 'error' not in probe and probe.get('status') in [200, 206]:
+
+        try:
+            store.set(key, json.dumps(probe).encode('utf8'),
+                expire_after=image_probes_expiration)
+        except Exception:
+            module_logger.exception("failed to save image probe to store")
+
+    return probe
+
+def fetch_image_probe(imageuri, http_cache, size=probe_size):
+
+    probe = {}
+    probe['pruned'] = None
+
+    try:
+        r, data = http_cache.probe(imageuri, size=size)
+    except Exception as e:
+        module_logger.warning("failed to probe image {}, it will be downloaded in full".format(imageuri))
+        probe['error'] = repr(e)
+        return probe
+
+    probe['status'] = r.status_code
+
+    if getattr(r, 'from_cache', False):
+        probe['method'] = 'cache'
+    else:
+        probe['method'] = 'range' if r.status_code == 206 else 'stream'
+
+    probe['bytes read'] = len(data)
+
+    if r.status_code not in [200, 206]:
+        # the full download reports the error
+        return probe
+
+    p = ImageFile.Parser()
+
+    try:
+        p.feed(data)
+    except Exception:
+        module_logger.debug("failed to decode the header of image {}".format(imageuri))
+
+    if p.image is None:
+        # e.g., SVG or a header larger than the probe
+        probe['format'] = None
+        return probe
+
+    width, height = p.image.size
+
+    probe['format'] = p.image.format
+    probe['width'] = width
+    probe['height'] = height
+    probe['pruned'] = probe_prune_reason(width, height)
+
+    return probe
+
 def get_image_with_timegate(base_uri, imageuri, http_cache):
 
     new_imageuri = None
@@ -250,7 +474,7 @@ def get_image_list(uri, http_cache, ignoreclasses=[], ignoreids=[], ignore_image
         module_logger.debug("content from URI-M: {}".format(r.text))
 
         try:
-            soup = BeautifulSoup(r.text, 'html5lib')
+            document = parse_html(r.text)
         except Exception as e:
             module_logger.error("failed to open document using BeautifulSoup")
             raise MementoParsingError(
@@ -258,7 +482,7 @@ def get_image_list(uri, http_cache, ignoreclasses=[], ignoreids=[], ignore_image
                 original_exception=e)
 
         try:
-            for imgtag in soup.find_all("img"):
+            for imgtag in document.images:
                 
                 try:
                     imageuri = urljoin(uri, imgtag.get("src"))
@@ -300,9 +524,7 @@ def get_image_list(uri, http_cache, ignoreclasses=[], ignoreids=[], ignore_image
     
     return image_list
 
-def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignoreclasses=[], ignoreids=[], ignore_images=[], datetime_negotiation=True):
-
-    # TODO: this function works, but it is a nightmare at this point - break it up somehow
+def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignoreclasses=[], ignoreids=[], ignore_images=[], datetime_negotiation=True, probe=True, contents=None):
 
     module_logger.debug("generating list of images and computing their scores")
 
@@ -313,6 +535,8 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
     module_logger.debug("found {} images in page".format(len(base_image_list)))
 
     futures = {}
+    probes = {}
+    probe_results = {}
     starttimes = {}
     image_position = {}
 
@@ -322,6 +546,13 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
 
     timeout = http_cache.timeout # in case we fall into a crawler trap (CNN?)
 
+    scoring_executor = get_scoring_executor()
+
+    # metadata_image_url, metadata_image_field = get_image_from_metadata(uri, http_cache)
+    metadata_images = get_image_from_metadata(baseuri, http_cache)
+
+    module_logger.info("discovered {} images in metadata".format(len(metadata_images)))
+
     working_image_list = []
 
     for imageuri in base_image_list:
@@ -330,16 +561,20 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
             working_image_list.append(imageuri)
 
             if imageuri[0:5] != 'data:':
-                module_logger.debug("adding futures request for {}".format(imageuri))
-                futures[imageuri] = futuressession.get(imageuri)
-                starttimes[imageuri] = datetime.datetime.now()
 
-            image_position[imageuri] = base_image_list.index(imageuri)
+                # images chosen by the page's metadata are never pruned, so
+                # only images from the body are probed before downloading
+                if probe and imageuri not in metadata_images:
+                    module_logger.debug("adding probe for {}".format(imageuri))
+                    probes[imageuri] = futuressession.executor.submit(
+                        probe_image, imageuri, http_cache)
+                else:
+                    module_logger.debug("adding futures request for {}".format(imageuri))
+                    futures[imageuri] = futuressession.get(imageuri)
 
-    # metadata_image_url, metadata_image_field = get_image_from_metadata(uri, http_cache)
-    metadata_images = get_image_from_metadata(baseuri, http_cache)
+                starttimes[imageuri] = datetime.datetime.now()
 
-    module_logger.info("discovered {} images in metadata".format(len(metadata_images)))
+            image_position[imageuri] = base_image_list.index(imageuri)
 
     if len(metadata_images) > 0:
 
@@ -352,11 +587,6 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
                     starttimes[imageuri] = datetime.datetime.now()
                     working_image_list.append(imageuri)
 
-    def imageuri_generator(imagelist):
-
-        while len(imagelist) > 0:
-            yield random.choice(imagelist)
-
     def find_image_source(imageuri, metadata_images, base_image_list):
 
         # if imageuri in metadata_images and imageuri in base_image_list:
@@ -369,7 +599,7 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
             module_logger.warning("could not image source: {}".format(imageuri))
             return "unknown"
 
-    for imageuri in imageuri_generator(working_image_list):
+    def start_record(imageuri):
 
         images_and_scores[imageuri] = {}
         image_source = find_image_source(imageuri, list(metadata_images.keys()), base_image_list)
@@ -389,185 +619,313 @@ def generate_images_and_scores(baseuri, http_cache, futuressession=None, ignorec
 
         module_logger.debug("looking at image in position {}, URI: {}".format(n, imageuri))
 
-        if imageuri[0:5] == 'data:':
+        return n, N
 
-            try:
-                datainput = DataURI(imageuri)
-                images_and_scores[imageuri]['content-type'] = datainput.mimetype
-                images_and_scores[imageuri]['magic type'] = magic.from_buffer(datainput.data)
-                images_and_scores[imageuri]['imghdr type'] = imghdr.what(None, datainput.data)
-                images_and_scores[imageuri].update(scores_for_image(datainput.data, n, N))
-
-                if 'metadata' in images_and_scores[imageuri]['source']:
-                    images_and_scores[imageuri]['source_field'] = metadata_images[imageuri]
-                
-                images_and_scores[imageuri].update(scores_for_image(datainput.data, n, N))
-                
-            except Exception as e:
-                module_logger.exception("cannot process data image URI {} discovered in base page at {}, skipping...".format(imageuri, baseuri))
-                images_and_scores[imageuri]['error'] = repr(e)
+    pending = {}
+    scoring_failure_messages = {}
+    scoring_positions = {}
+
+    def submit_scoring(imageuri, imagecontent, n, N, failure_message):
+
+        module_logger.debug("acquiring scores for image {}".format(imageuri))
+
+        scoring_failure_messages[imageuri] = failure_message
+        scoring_positions[imageuri] = (n, N)
+
+        # so callers can use the image without downloading it again
+        if contents is not None:
+            contents[imageuri] = imagecontent
+        pending[cached_image_features(imagecontent, scoring_executor)] = ('score', imageuri)
+
+    def score_data_image(imageuri):
+
+        n, N = start_record(imageuri)
+
+        failure_message = "cannot process data image URI {} discovered in base page at {}, skipping...".format(imageuri, baseuri)
+
+        try:
+            datainput = DataURI(imageuri)
+            images_and_scores[imageuri]['content-type'] = datainput.mimetype
+            images_and_scores[imageuri]['magic type'] = magic.from_buffer(datainput.data)
+            images_and_scores[imageuri]['imghdr type'] = imghdr.what(None, datainput.data)
+
+            if 'metadata' in images_and_scores[imageuri]['source']:
+                images_and_scores[imageuri]['source_field'] = metadata_images[imageuri]
+
+        except Exception as e:
+            module_logger.exception(failure_message)
+            images_and_scores[imageuri]['error'] = repr(e)
+            return
+
+        submit_scoring(imageuri, datainput.data, n, N, failure_message)
+
+    def score_downloaded_image(imageuri, future):
+
+        n, N = start_record(imageuri)
+
+        module_logger.debug("examining image {}".format(imageuri))
+
+        try:
+            r = future.result()
+        except Exception as e:
+            module_logger.exception(
+                "Failed to download image URI {}, skipping...".format(imageuri)
+            )
 
-            working_image_list.remove(imageuri)
+            images_and_scores[imageuri]['error'] = repr(e)
+            return imageuri
 
-        elif imageuri in futures:
+        module_logger.debug("image {} was successfully downloaded with status {}".format(imageuri, r.status_code))
 
-            if futures[imageuri].done():
+        if r.status_code != 200:
+            images_and_scores[imageuri]['error'] = "Image URI {} returned a status of {}, it could not be downloaded".format(imageuri, r.status_code)
+            return imageuri
+
+        module_logger.debug("extracting image content type information from {}".format(imageuri))
 
-                module_logger.debug("examining image {}".format(imageuri))
+        imagecontent = r.content
+
+        if 'memento-datetime' in r.headers:
+            images_and_scores[imageuri]['is-a-memento'] = True
+        else:
+            # not all image links get rewritten
+            new_imageuri = None
+
+            if datetime_negotiation == True:
+                module_logger.warning("image {} from {} is not a memento, attempting datetime negotiation to find a memento".format(imageuri, baseuri))
 
                 try:
-                    r = futures[imageuri].result()
-                except Exception as e:
-                    module_logger.exception(
-                        "Failed to download image URI {}, skipping...".format(imageuri)
-                    )
+                    new_imageuri = get_image_with_timegate(baseuri, imageuri, http_cache)
+                except Exception:
+                    module_logger.exception("attempt at datetime negotiation failed for image {}".format(imageuri))
 
-                    images_and_scores[imageuri]['error'] = repr(e)
-                    working_image_list.remove(imageuri)
-                    del futures[imageuri]
-                    continue
+            if new_imageuri is not None:
 
-                module_logger.debug("image {} was successfully downloaded with status {}".format(imageuri, r.status_code))
+                try:
 
-                if r.status_code == 200:
+                    r = http_cache.get(new_imageuri)
 
-                    module_logger.debug("extracting image content type information from {}".format(imageuri))
+                    if r.status_code == 200:
 
-                    imagecontent = r.content
+                        # create a new record for the memento
+                        images_and_scores[new_imageuri] = {}
+                        images_and_scores[new_imageuri]['is-a-memento'] = True
 
-                    if 'memento-datetime' in r.headers:
-                        images_and_scores[imageuri]['is-a-memento'] = True
-                    else:
-                        # not all image links get rewritten 
-                        new_imageuri = None
+                        image_source = images_and_scores[imageuri]['source']
+                        images_and_scores[new_imageuri]['source'] = image_source
+                        images_and_scores[new_imageuri]['origin'] = 'datetime-negotiation'
 
-                        if datetime_negotiation == True:
-                            module_logger.warning("image {} from {} is not a memento, attempting datetime negotiation to find a memento".format(imageuri, baseuri))
+                        if 'metadata' in images_and_scores[new_imageuri]['source']:
+                            images_and_scores[new_imageuri]['source_field'] = metadata_images[imageuri]
 
-                            try:
-                                new_imageuri = get_image_with_timegate(baseuri, imageuri, http_cache)
-                            except Exception:
-                                module_logger.exception("attempt at datetime negotiation failed for image {}".format(imageuri))
+                        # remove the old record
+                        del images_and_scores[imageuri]
 
-                        if new_imageuri is not None:
+                        imagecontent = r.content
+                        imageuri = new_imageuri
 
-                            try:
+                except Exception:
+                    module_logger.exception("Failed to fetch memento of image {}".format(new_imageuri))
 
-                                r = http_cache.get(new_imageuri)
+        try:
+            images_and_scores[imageuri]["content-type"] = r.headers['content-type']
+        except KeyError:
+            module_logger.warning(
+                "could not find a content-type for URI {}".format(imageuri)
+            )
+            images_and_scores[imageuri]['error'] = "No content type for image"
+
+        try:
+            images_and_scores[imageuri]["magic type"] = \
+                magic.from_buffer(imagecontent)
+        except Exception as e:
+            module_logger.exception("failed to determine magic type of {}".format(imageuri))
+            images_and_scores[imageuri]["magic type"] = "ERROR: {}".format(e)
+
+        images_and_scores[imageuri]["imghdr type"] = \
+            imghdr.what(None, r.content)
+
+        if 'image/' in images_and_scores[imageuri]["content-type"]:
 
-                                if r.status_code == 200:
+            submit_scoring(imageuri, imagecontent, n, N,
+                "failed to acquire scores for image with content type {}: {}".format(
+                    images_and_scores[imageuri]['content-type'], imageuri))
 
-                                    # create a new record for the memento
-                                    images_and_scores.setdefault(new_imageuri, {})
-                                    images_and_scores[new_imageuri] = {}
-                                    images_and_scores[new_imageuri]['is-a-memento'] = True
+        elif images_and_scores[imageuri]["imghdr type"] is not None:
 
-                                    # image_source = find_image_source(new_imageuri, list(metadata_images.keys()), base_image_list)
-                                    image_source = images_and_scores[imageuri]['source']
-                                    images_and_scores[new_imageuri]['source'] = image_source
-                                    images_and_scores[new_imageuri]['origin'] = 'datetime-negotiation'
-                                    
-                                    if 'metadata' in images_and_scores[new_imageuri]['source']:
-                                        images_and_scores[new_imageuri]['source_field'] = metadata_images[imageuri]
+            module_logger.debug("no content-type, so we fall back to imghdr to guess if this URI points to an image: {}".format(imageuri))
 
-                                    # so the rest of the existing code will flow smoothly
-                                    working_image_list.append(new_imageuri)
-                                    futures[new_imageuri] = None
+            submit_scoring(imageuri, imagecontent, n, N,
+                "failed to acquire scores for image with content type {}: {}".format(
+                    images_and_scores[imageuri]['imghdr type'], imageuri))
 
-                                    # remove the old record
-                                    del images_and_scores[imageuri]
-                                    del futures[imageuri]
-                                    working_image_list.remove(imageuri)
+        else:
+            images_and_scores[imageuri]['error'] = "Content is not an image"
+
+        return imageuri
 
-                                    imagecontent = r.content
-                                    imageuri = new_imageuri
-                                
-                            except Exception:
-                                module_logger.exception("Failed to fetch memento of image {}".format(new_imageuri))
+    def timed_out(imageuri, now):
+        return (now - starttimes[imageuri]).seconds > timeout
 
+    # data URIs need no download, so they are scored first
+    for imageuri in working_image_list:
+        if imageuri[0:5] == 'data:':
+            score_data_image(imageuri)
 
-                    try:
-                        images_and_scores[imageuri]["content-type"] = r.headers['content-type']
-                    except KeyError:
-                        module_logger.warning(
-                            "could not find a content-type for URI {}".format(imageuri)
-                        )
-                        # images_and_scores[imageuri]["content-type"] = "No content type for image"
-                        images_and_scores[imageuri]['error'] = "No content type for image"
+    for imageuri, future in probes.items():
+        pending[future] = ('probe', imageuri)
 
-                    try:
-                        images_and_scores[imageuri]["magic type"] = \
-                            magic.from_buffer(imagecontent)
-                    except Exception as e:
-                        module_logger.exception("failed to determine magic type of {}".format(imageuri))
-                        images_and_scores[imageuri]["magic type"] = "ERROR: {}".format(e)
+    for imageuri, future in futures.items():
+        pending[future] = ('download', imageuri)
 
-                    images_and_scores[imageuri]["imghdr type"] = \
-                        imghdr.what(None, r.content)
+    # score each image as soon as its download completes, sleeping until
+    # either another probe, download, or scoring completes or the oldest
+    # probe or download times out
+    while len(pending) > 0:
 
-                    if 'image/' in images_and_scores[imageuri]["content-type"]:
+        now = datetime.datetime.now()
 
-                        try:
-                            module_logger.debug("acquiring scores for image {}".format(imageuri))
-                            images_and_scores[imageuri].update(scores_for_image(imagecontent, n, N))
+        wait_seconds = None
 
-                        except Exception as e:
-                            module_logger.exception(
-                                "failed to acquire scores for image with content type {}: {}".format(
-                                    images_and_scores[imageuri]['content-type'], imageuri))
-                            images_and_scores[imageuri]['error'] = repr(e)
+        for stage, imageuri in pending.values():
 
-                        working_image_list.remove(imageuri)
-                        del futures[imageuri]
+            if stage != 'score':
 
-                    elif images_and_scores[imageuri]["imghdr type"] is not None:
+                remaining = timeout + 1 - (now - starttimes[imageuri]).total_seconds()
 
-                        module_logger.debug("no content-type, so we fall back to imghdr to guess if this URI points to an image: {}".format(imageuri))
+                if wait_seconds is None or remaining < wait_seconds:
+                    wait_seconds = max(remaining, 0)
 
-                        try:
-                            module_logger.debug("acquiring scores for image {}".format(imageuri))
+        done, not_done = wait(
+            list(pending.keys()), timeout=wait_seconds,
+            return_when=FIRST_COMPLETED
+        )
 
-                            images_and_scores[imageuri].update(scores_for_image(imagecontent, n, N))
+        for future in done:
 
-                        except Exception as e:
-                            # images_and_scores[imageuri] = None
-                            module_logger.exception(
-                                "failed to acquire scores for image with content type {}: {}".format(
-                                    images_and_scores[imageuri]['imghdr type'], imageuri))
-                            images_and_scores[imageuri]['error'] = repr(e)
+            stage, imageuri = pending.pop(future)
 
-                        working_image_list.remove(imageuri)
-                        del futures[imageuri]
+            if stage == 'probe':
 
-                    else:
-                        # images_and_scores[imageuri] = "Content is not an image"
-                        images_and_scores[imageuri]['error'] = "Content is not an image"
-                        working_image_list.remove(imageuri)
-                        del futures[imageuri]
+                probe_results[imageuri] = future.result()
 
+                if probe_results[imageuri].get('pruned') is not None:
+                    start_record(imageuri)
+                    images_and_scores[imageuri]['probe'] = probe_results[imageuri]
+                    module_logger.debug("pruned image {} after probe: {}".format(
+                        imageuri, probe_results[imageuri]['pruned']))
                 else:
-                    # images_and_scores[imageuri] = "Image URI {} returned a status of {}, it could not be downloaded".format(imageuri, r.status_code)
-                    images_and_scores[imageuri]['error'] = "Image URI {} returned a status of {}, it could not be downloaded".format(imageuri, r.status_code)
-                    working_image_list.remove(imageuri)
-                    del futures[imageuri]
-            
+                    module_logger.debug("adding futures request for {}".format(imageuri))
+                    pending[futuressession.get(imageuri)] = ('download', imageuri)
+
+            elif stage == 'score':
+
+                try:
+                    n, N = scoring_positions[imageuri]
+                    images_and_scores[imageuri].update(
+                        score_image_features(future.result(), n, N))
+                except Exception as e:
+                    module_logger.exception(scoring_failure_messages[imageuri])
+                    images_and_scores[imageuri]['error'] = repr(e)
+
             else:
+                final_imageuri = score_downloaded_image(imageuri, future)
 
-                module_logger.debug("checking on timeout of image at {}".format(imageuri))
+                if imageuri in probe_results:
+                    images_and_scores[final_imageuri]['probe'] = probe_results[imageuri]
 
-                if (datetime.datetime.now() - starttimes[imageuri]).seconds > timeout:
-                    module_logger.warn("could not download image {} within {} seconds, skipping...".format(imageuri, timeout))
-                    images_and_scores[imageuri]['error'] = "could not download image {} within {} seconds, skipping...".format(imageuri, timeout)
-                    futures[imageuri].cancel()
-                    del futures[imageuri]
-                    working_image_list.remove(imageuri)
+        now = datetime.datetime.now()
 
-        else:
-            module_logger.error("imageuri {} not found in futures, but yet not removed?".format(imageuri))
-            images_and_scores[imageuri]['error'] = "imageuri {} not found in futures, but yet not removed?".format(imageuri)
+        for future in not_done:
+
+            stage, imageuri = pending[future]
+
+            if stage == 'score':
+                continue
+
+            module_logger.debug("checking on timeout of image at {}".format(imageuri))
+
+            if timed_out(imageuri, now):
+                start_record(imageuri)
+                module_logger.warning("could not download image {} within {} seconds, skipping...".format(imageuri, timeout))
+                images_and_scores[imageuri]['error'] = "could not download image {} within {} seconds, skipping...".format(imageuri, timeout)
+
+                if imageuri in probe_results:
+                    images_and_scores[imageuri]['probe'] = probe_results[imageuri]
+
+                future.cancel()
+                del pending[future]
 
     return images_and_scores
 
+def fetch_image_content(imageuri, http_cache, use_referrer=True):
+
+    r = http_cache.get(imageuri, use_referrer=use_referrer)
+
+    if r.status_code != 200:
+        raise RequestException("Image URI {} returned a status of {}, it could not be downloaded".format(
+            imageuri, r.status_code))
+
+    return r.content
+
+def submit_image_download(imageuri, http_cache, executor=None, use_referrer=True):
+    """
+        Returns a Future for the content of `imageuri`, downloaded on
+        `executor`, or in the calling thread without one.
+    """
+
+    if executor is None:
+        return run_in_thread(fetch_image_content, imageuri, http_cache, use_referrer)
+
+    return executor.submit(fetch_image_content, imageuri, http_cache, use_referrer)
+
+def download_images(imageuris, http_cache, limit=None, contents={}, executor=None, timeout=None):
+    """
+        Returns (URI, content) pairs for the first `limit` of `imageuris`,
+        in their order, that download within `timeout` seconds. Images in
+        `contents`, such as those already downloaded by
+        generate_images_and_scores, are not downloaded again.
+
+        Downloads run concurrently on `executor`. An image that fails to
+        download is skipped and replaced by the next of `imageuris`.
+    """
+
+    downloaded = {}
+    remaining = list(imageuris)
+
+    while len(remaining) > 0 and (limit is None or len(downloaded) < limit):
+
+        if limit is None:
+            batch, remaining = remaining, []
+        else:
+            batch = remaining[0:limit - len(downloaded)]
+            remaining = remaining[len(batch):]
+
+        futures = {}
+
+        for imageuri in batch:
+
+            if imageuri in contents:
+                downloaded[imageuri] = contents[imageuri]
+            else:
+                futures[submit_image_download(imageuri, http_cache, executor)] = imageuri
+
+        done, not_done = wait(list(futures.keys()), timeout=timeout)
+
+        for future in done:
+
+            try:
+                downloaded[futures[future]] = future.result()
+            except Exception:
+                module_logger.exception("failed to download image at {}, skipping".format(futures[future]))
+
+        for future in not_done:
+            module_logger.warning("could not download image {} within {} seconds, skipping".format(
+                futures[future], timeout))
+            future.cancel()
+
+    return [ (imageuri, downloaded[imageuri]) for imageuri in imageuris if imageuri in downloaded ][0:limit]
+
 def get_image_from_metadata(uri, http_cache):
 
     metadata_images = {}
@@ -578,7 +936,7 @@ def get_image_from_metadata(uri, http_cache):
         r = http_cache.get(uri)
 
         try:
-            soup = BeautifulSoup(r.text, 'html5lib')
+            document = parse_html(r.text)
         except Exception as e:
             module_logger.error("failed to open document using BeautifulSoup")
             raise MementoParsingError(
@@ -590,8 +948,8 @@ def get_image_from_metadata(uri, http_cache):
             for attribute in [ "property", "name", "itemprop" ]:
 
                 try:
-                    module_logger.info("for url: {} --- bs4 discovered: {}".format(uri, soup.find_all('meta', { attribute: field } )))
-                    discovered_fields = soup.find_all('meta', { attribute: field } )
+                    discovered_fields = [ tag for tag in document.metatags if tag.get(attribute) == field ]
+                    module_logger.info("for url: {} --- bs4 discovered: {}".format(uri, discovered_fields))
 
                     #module_logger.debug("discovered {} fields with metadata".format(len(discovered_fields)))
                     #module_logger.debug("discovered fields with metadata: {}".format(discovered_fields[0]))
@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .sessions import PoolStatistics
+from .stores import MemoryStore
+
+module_logger = logging.getLogger('mementoembed.jobqueue')
+
+class JobQueueFull(Exception):
+
+    def __init__(self, message):
+        self.message = message
+
+class JobTimeout(Exception):
+
+    def __init__(self, message):
+        self.message = message
+
+def job_key(product, urim, prefs):
+    """
+        Returns the identifier of the job creating `product` for `urim` with
+        `prefs`, the same for every identical request so that they share a
+        single job.
+    """
+
+    return hashlib.sha256(
+        json.dumps([ product, urim, sorted( (str(k), str(v)) for k, v in prefs.items() ) ]).encode('utf8')
+    ).hexdigest()
+
+class JobQueue:
+    """
+        Runs long product jobs (thumbnails, imagereels, docreels) outside of
+        the web request. At most `max_workers` jobs run at once and at most
+        `max_queued` more wait; beyond that, submit raises JobQueueFull.
+
+        Each job saves its artifact to a file in a working folder and
+        records its status and the file in `store`, the configured Redis or
+        SQLite database, so any worker can report on it and serve the
+        artifact. An identical job that is already queued, running, or
+        complete is not started again.
+
+        Records of queued and running jobs are leased for `lease` seconds
+        and renewed while this worker lives, so they outlast any wait in
+        the queue, but a job whose worker stopped may be submitted again.
+
+        A job still running after `job_timeout` seconds is marked failed and
+        whatever it produces later is discarded. Python cannot stop its
+        thread, so the job keeps one of the `max_workers` places until it
+        actually ends.
+    """
+
+    def __init__(self, store=None, max_workers=2, max_queued=32, job_timeout=900,
+        expire_after=86400, lease=60):
+
+        if store is None:
+            store = MemoryStore('jobs')
+
+        self.store = store
+        self.max_workers = int(max_workers)
+        self.max_queued = int(max_queued)
+        self.job_timeout = job_timeout
+        self.expire_after = expire_after
+        self.lease = lease
+        self.statistics = PoolStatistics()
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._records = {}
+        self._abandoned = 0
+
+        # held by each job's thread until it ends, even after it times out
+        self._slots = threading.Semaphore(self.max_workers)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='product-jobs'
+        )
+
+        self._stopped = threading.Event()
+        self._renewer = None
+
+    def _save(self, record):
+
+        if record['status'] in ('queued', 'running'):
+            # renewed by _renew_leases while this worker lives
+            expire_after = self.lease
+        else:
+            expire_after = self.expire_after
+
+        record['updated'] = time.time()
+
+        self.store.set(record['id'], json.dumps(record).encode('utf8'), expire_after=expire_after)
+
+    def _update(self, record, **changes):
+
+        with self._lock:
+            record.update(changes)
+            self._save(record)
+
+    def _renew_leases(self):
+
+        while not self._stopped.wait(self.lease / 3):
+
+            with self._lock:
+
+                for record in self._records.values():
+
+                    try:
+                        self._save(record)
+                    except Exception:
+                        module_logger.exception("failed to renew the record of job {}".format(record['id']))
+
+    def _start_renewer(self):
+
+        if self._renewer is None:
+            self._renewer = threading.Thread(target=self._renew_leases,
+                name='product-job-leases', daemon=True)
+            self._renewer.start()
+
+    def status(self, job_id):
+        """
+            Returns the record of job `job_id`, or None if there is no such
+            job.
+        """
+
+        value = self.store.get(job_id)
+
+        if value is None:
+            return None
+
+        return json.loads(value.decode('utf8'))
+
+    def submit(self, job_id, product, urim, function, *args, force=False):
+        """
+            Queues `function(*args)`, which saves the artifact and returns
+            the name of its file and a dict of headers to send with it,
+            unless an identical job is queued or running, or, unless `force`
+            is set, complete. Returns the job's record.
+        """
+
+        with self._lock:
+
+            if job_id in self._inflight:
+                self.statistics.increment('deduplicated jobs')
+                return self.status(job_id) or dict(self._records[job_id])
+
+            record = self.status(job_id)
+
+            if record is not None:
+
+                if record['status'] in ('queued', 'running') or \
+                    (record['status'] == 'complete' and os.path.exists(record['artifact']) and not force):
+
+                    self.statistics.increment('deduplicated jobs')
+                    return record
+
+            if len(self._inflight) >= self.max_workers + self.max_queued:
+                self.statistics.increment('rejected jobs')
+                raise JobQueueFull("{} jobs are already queued or running".format(len(self._inflight)))
+
+            record = {
+                'id': job_id,
+                'product': product,
+                'urim': urim,
+                'status': 'queued',
+                'artifact': None,
+                'created': time.time()
+            }
+
+            self._save(record)
+
+            self._records[job_id] = record
+            self._inflight[job_id] = self._executor.submit(self._run, record, function, args)
+            self._start_renewer()
+
+            self.statistics.increment('queued jobs')
+
+            return dict(record)
+
+    def _run(self, record, function, args):
+
+        changes = {}
+
+        try:
+            if not self._slots.acquire(blocking=False):
+                module_logger.warning("{} job {} is waiting for jobs that timed out to end".format(
+                    record['product'], record['id']))
+                self._slots.acquire()
+
+            module_logger.info("running {} job {} for {}".format(record['product'], record['id'], record['urim']))
+
+            artifact, headers = self._call(record, function, args)
+
+            changes = { 'status': 'complete', 'artifact': artifact, 'headers': headers }
+            self.statistics.increment('completed jobs')
+
+        except Exception as e:
+            module_logger.exception("{} job {} for {} failed".format(record['product'], record['id'], record['urim']))
+
+            changes = {
+                'status': 'failed',
+                'error': str(e),
+                'error details': repr(traceback.format_exc())
+            }
+            self.statistics.increment('failed jobs')
+
+        finally:
+
+            with self._lock:
+
+                try:
+                    record.update(changes)
+                    self._save(record)
+                finally:
+                    del self._records[record['id']]
+                    del self._inflight[record['id']]
+
+    def _call(self, record, function, args):
+        """
+            Returns `function(*args)`, run in a thread of its own so that
+            this worker can give up on it after job_timeout seconds. The
+            thread holds the job slot that _run acquired until it ends.
+        """
+
+        outcome = {}
+
+        def call():
+            try:
+                outcome['result'] = function(*args)
+            except Exception as e:
+                outcome['error'] = e
+
+            finally:
+
+                with self._lock:
+                    outcome['done'] = True
+                    abandoned = 'abandoned' in outcome
+
+                    if abandoned:
+                        self._abandoned -= 1
+
+                self._slots.release()
+
+            if abandoned:
+                module_logger.warning("{} job {} for {} finished after it timed out, discarding its result".format(
+                    record['product'], record['id'], record['urim']))
+
+        try:
+            self._update(record, status='running')
+
+            thread = threading.Thread(target=call, daemon=True,
+                name="product-job-{}".format(record['id'][:12]))
+            thread.start()
+
+        except Exception:
+            self._slots.release()
+            raise
+
+        thread.join(self.job_timeout if self.job_timeout else None)
+
+        with self._lock:
+
+            if 'done' not in outcome:
+                outcome['abandoned'] = True
+                self._abandoned += 1
+
+        if 'abandoned' in outcome:
+            self.statistics.increment('timed out jobs')
+            raise JobTimeout("the {} job did not finish within {} seconds".format(
+                record['product'], self.job_timeout))
+
+        if 'error' in outcome:
+            raise outcome['error']
+
+        return outcome['result']
+
+    def stats(self):
+
+        stats = self.statistics.as_dict()
+
+        with self._lock:
+            stats['inflight jobs'] = len(self._inflight)
+            stats['timed out jobs still running'] = self._abandoned
+
+        stats['workers'] = self.max_workers
+        stats['queue length'] = self.max_queued
+
+        return stats
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
+        self._stopped.set()
+
+
+job_queue = None
+
+def set_job_queue(store, max_workers, max_queued, job_timeout):
+    """
+        Replaces the process-wide job queue with one that runs `max_workers`
+        jobs at once and records them in `store`, 0 to create every product
+        within its request.
+    """
+
+    global job_queue
+
+    previous = job_queue
+
+    if int(max_workers) > 0:
+        job_queue = JobQueue(store, max_workers, max_queued, job_timeout)
+    else:
+        job_queue = None
+
+    if previous is not None:
+        previous.shutdown()
+
+def get_job_queue():
+    return job_queue
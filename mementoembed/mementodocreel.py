@@ -8,11 +8,15 @@ import numpy as np
 
 from PIL import ImageFile, Image, ImageFont, ImageDraw
 
-from .imageselection import generate_images_and_scores
+from .imageselection import generate_images_and_scores, download_images, submit_image_download
+from .executors import get_assembly_executor
 from .mementoresource import memento_resource_factory
 from .textprocessing import extract_title, get_sentence_scores_by_readability_and_lede3
 from .originalresource import OriginalResource
 from .archiveresource import ArchiveResource
+from .diskbudget import write_artifact, artifact_accessed
+from .reelframes import reel_frames
+from .reelwriters import reel_writer, reel_formats
 
 module_logger = logging.getLogger('mementoembed.mementoimagereel')
 
@@ -30,22 +34,63 @@ class MementoDocreel:
         self.working_directory = working_directory
         self.httpcache = httpcache
 
+        # the file holding the last reel generated
+        self.artifact_file = None
+
         # TODO: image size (height, width) defaults
 
 
-    def generate_docreel(self, urim, duration, imgcountlimit, sentencecountlimit, requested_width, requested_height, fontfile):
+    def generate_docreel(self, urim, duration, imgcountlimit, sentencecountlimit, requested_width, requested_height, fontfile, regenerate=False, reelformat='gif'):
+
+        if reelformat not in reel_formats:
+            raise MementoDocReelGenerationError("unsupported reel format {}".format(reelformat))
 
         if os.path.isdir(self.working_directory):
 
+            # every parameter that changes the output is part of the key
+            m = hashlib.sha256()
+            m.update(
+                '/'.join(
+                    [   str(duration),
+                        str(imgcountlimit),
+                        str(sentencecountlimit),
+                        str(requested_width),
+                        str(requested_height),
+                        os.path.realpath(fontfile),
+                        reelformat,
+                        urim
+                    ]
+                    ).encode('utf8')
+                    )
+            reelfile = "{}/{}.{}".format(self.working_directory, m.hexdigest(), reelformat)
+            self.artifact_file = reelfile
+
+            if not regenerate:
+
+                try:
+                    with open(reelfile, 'rb') as f:
+                        data = f.read()
+
+                    artifact_accessed(reelfile)
+
+                    module_logger.info("Returning existing docreel from {}".format(reelfile))
+
+                    return data
+
+                except FileNotFoundError:
+                    pass
+
+            module_logger.info("generating animated {} of images, output should be in {}".format(reelformat, reelfile))
+
             memento = memento_resource_factory(urim, self.httpcache)
 
-            m = hashlib.sha256()
-            m.update(urim.encode('utf8'))
-            reelfile = "{}/{}.gif".format(self.working_directory, m.hexdigest())
+            # images downloaded for scoring are not downloaded again
+            contents = {}
 
             imagelist = generate_images_and_scores(
                 memento.im_urim,
-                self.httpcache
+                self.httpcache,
+                contents=contents
             )
 
             module_logger.debug("imagelist: {}".format(imagelist))
@@ -57,12 +102,13 @@ class MementoDocreel:
             if len(imagelist) == 0:
                 imagelist = generate_images_and_scores(
                     memento.urim,
-                    self.httpcache
+                    self.httpcache,
+                    contents=contents
                 )
 
             # TODO: what if imagelist is empty?
 
-            memtitle = extract_title(memento.raw_content)
+            memtitle = extract_title(memento.raw_document)
 
             # get domain name
             originalresource = OriginalResource(memento, self.httpcache)
@@ -83,26 +129,30 @@ class MementoDocreel:
                 if 'calculated score' in imagelist[imageuri]:
                     scorelist.append( (imagelist[imageuri]["calculated score"], imageuri) )
 
-            if not os.path.exists(reelfile):
-                module_logger.info("generating animated GIF of images, output should be in {}".format(reelfile))
-              
-            imageims = []
+            executor = get_assembly_executor()
 
-            imagecount = 1
+            # the favicons download while the images do
+            or_favicon_future = submit_image_download(
+                originalresource.favicon, self.httpcache, executor)
 
-            for imageuri in [ i[1] for i in sorted(scorelist, reverse=True) ]:
+            module_logger.debug("archive favicon for docreel is {}".format(archive.favicon))
 
-                r = self.httpcache.get(imageuri)
-                ifp = io.BytesIO(r.content)
+            archive_favicon_future = submit_image_download(
+                archive.favicon, self.httpcache, executor, use_referrer=False)
 
-                imageims.append(
-                    Image.open(ifp).convert("RGBA", palette=Image.ADAPTIVE)
-                )
+            imageims = []
 
-                imagecount += 1
+            for imageuri, imagecontent in download_images(
+                [ i[1] for i in sorted(scorelist, reverse=True) ],
+                self.httpcache, limit=imgcountlimit, contents=contents,
+                executor=executor, timeout=self.httpcache.timeout):
 
-                if imagecount > imgcountlimit:
-                    break
+                try:
+                    imageims.append(
+                        Image.open(io.BytesIO(imagecontent)).convert("RGBA", palette=Image.ADAPTIVE)
+                    )
+                except Exception:
+                    module_logger.exception("failed to open image at {}, skipping".format(imageuri))
 
             toptitlefnt = ImageFont.truetype(fontfile, 18)
             metadatafnt = ImageFont.truetype(fontfile, 14)
@@ -114,17 +164,17 @@ class MementoDocreel:
             d.text((30, requested_height - 60), "{}@{}".format(originalresource.domain, memento.memento_datetime), font=metadatafnt, fill=(255, 255, 255, 255))
             d.text((30, requested_height - 30), "Preserved by {}".format(archive.name), font=metadatafnt, fill=(255, 255, 255, 255))
 
-            or_favicon_uri = self.httpcache.get(originalresource.favicon)
-            ifp = io.BytesIO(or_favicon_uri.content)
-            or_favicon_im = Image.open(ifp).convert("RGBA", palette=Image.ADAPTIVE).resize((16, 16), resample=Image.BICUBIC)
-            imbase.paste(or_favicon_im, (3, requested_height - 60), )
+            for future, faviconuri, position in [
+                (or_favicon_future, originalresource.favicon, (3, requested_height - 60)),
+                (archive_favicon_future, archive.favicon, (3, requested_height - 30)) ]:
 
-            module_logger.debug("archive favicon for docreel is {}".format(archive.favicon))
-
-            archive_favicon_uri = self.httpcache.get(archive.favicon, use_referrer=False)
-            ifp = io.BytesIO(archive_favicon_uri.content)
-            ar_favicon_im = Image.open(ifp).convert("RGBA", palette=Image.ADAPTIVE).resize((16, 16), resample=Image.BICUBIC)
-            imbase.paste(ar_favicon_im, (3, requested_height - 30), )
+                try:
+                    ifp = io.BytesIO(future.result(timeout=self.httpcache.timeout))
+                    favicon_im = Image.open(ifp).convert("RGBA", palette=Image.ADAPTIVE).resize((16, 16), resample=Image.BICUBIC)
+                    imbase.paste(favicon_im, position)
+                except Exception:
+                    module_logger.exception("failed to add favicon {} to docreel, skipping".format(faviconuri))
+                    future.cancel()
 
             textims = []
             sentencecount = 1
@@ -191,56 +241,24 @@ class MementoDocreel:
 
                 working_ims.append(im)
 
-            outputims = []
-
-            durations = [ 1000 ]
-
-            module_logger.debug("building animated GIF")
-
-            # Thanks: https://stackoverflow.com/questions/2563822/how-do-you-composite-an-image-onto-another-image-with-pil-in-python
-            for im in working_ims:
-
-                # imconv = im.convert("RGBA")
+            module_logger.debug("writing animated {}".format(reelformat))
 
-                im_w, im_h = im.size
+            # frames are written as they are made, never all held at once
+            with write_artifact(reelfile) as f:
 
-                newim = imbase.copy()
-                bg_w, bg_h = newim.size
+                writer = reel_writer(reelformat, f, imbase, working_ims)
+                writer.add(imout, duration)
 
-                offset = ((bg_w - im_w) // 2, (bg_h - im_h) // 2)
+                for frame, frameduration in reel_frames(imbase, working_ims, duration):
+                    writer.add(frame, frameduration)
 
-                newim.paste(im, offset)
+                writer.close()
 
-                outputims.append(imbase)
-                durations.append(duration)
-                
-                for i in range(1, 99, 10):
-                    i = i / 100
-                    outputims.append( Image.blend(imbase, newim, i))
-                    durations.append(duration)
-
-                for i in range(0, 30):
-                    outputims.append(newim)
-                    durations.append(duration)
-
-                for i in range(1, 99, 10):
-                    i = i / 100
-                    outputims.append( Image.blend(newim, imbase, i) )
-                    durations.append(duration)
-
-            module_logger.debug("saving animated GIF")
-
-            with open(reelfile, 'wb') as outputfp:
-                imout.save(
-                    outputfp, save_all=True, format="GIF", 
-                    append_images=outputims, duration=duration, loop=0
-                )
-
-            module_logger.debug("durations: {}".format(durations))
-
-            with open(reelfile, 'rb') as f:
+                f.seek(0)
                 data = f.read()
 
+            module_logger.debug("wrote {} frames".format(writer.frames))
+
             module_logger.info("Docreel generation successful, returning video")
 
             # TODO: resize to 400x300
@@ -7,8 +7,12 @@ import numpy as np
 
 from PIL import ImageFile, Image
 
-from .imageselection import generate_images_and_scores
+from .imageselection import generate_images_and_scores, download_images
+from .executors import get_assembly_executor
 from .mementoresource import memento_resource_factory
+from .diskbudget import write_artifact, artifact_accessed
+from .reelframes import reel_frames
+from .reelwriters import reel_writer, reel_formats
 
 module_logger = logging.getLogger('mementoembed.mementoimagereel')
 
@@ -26,22 +30,61 @@ class MementoImageReel:
         self.working_directory = working_directory
         self.httpcache = httpcache
 
+        # the file holding the last reel generated
+        self.artifact_file = None
+
         # TODO: image size (height, width) defaults
 
 
-    def generate_imagereel(self, urim, duration, countlimit, requested_width, requested_height):
+    def generate_imagereel(self, urim, duration, countlimit, requested_width, requested_height, regenerate=False, reelformat='gif'):
+
+        if reelformat not in reel_formats:
+            raise MementoImageReelGenerationError("unsupported reel format {}".format(reelformat))
 
         if os.path.isdir(self.working_directory):
 
+            # every parameter that changes the output is part of the key
+            m = hashlib.sha256()
+            m.update(
+                '/'.join(
+                    [   str(duration),
+                        str(countlimit),
+                        str(requested_width),
+                        str(requested_height),
+                        reelformat,
+                        urim
+                    ]
+                    ).encode('utf8')
+                    )
+            reelfile = "{}/{}.{}".format(self.working_directory, m.hexdigest(), reelformat)
+            self.artifact_file = reelfile
+
+            if not regenerate:
+
+                try:
+                    with open(reelfile, 'rb') as f:
+                        data = f.read()
+
+                    artifact_accessed(reelfile)
+
+                    module_logger.info("Returning existing image reel from {}".format(reelfile))
+
+                    return data
+
+                except FileNotFoundError:
+                    pass
+
+            module_logger.info("generating animated {} of images, output should be in {}".format(reelformat, reelfile))
+
             memento = memento_resource_factory(urim, self.httpcache)
 
-            m = hashlib.sha256()
-            m.update(urim.encode('utf8'))
-            reelfile = "{}/{}.gif".format(self.working_directory, m.hexdigest())
+            # images downloaded for scoring are not downloaded again
+            contents = {}
 
             imagelist = generate_images_and_scores(
                 memento.im_urim, 
-                self.httpcache
+                self.httpcache,
+                contents=contents
             )
 
             # TODO: what if imagelist is empty?
@@ -54,35 +97,20 @@ class MementoImageReel:
                     if 'calculated score' in imagelist[imageuri]:
                         scorelist.append( (imagelist[imageuri]["calculated score"], imageuri) )
 
-            if not os.path.exists(reelfile):
-                module_logger.info("generating animated GIF of images, output should be in {}".format(reelfile))
-              
             baseims = []
 
-            imagecount = 1
-
-            for imageuri in [ i[1] for i in sorted(scorelist, reverse=True) ]:
+            for imageuri, imagecontent in download_images(
+                [ i[1] for i in sorted(scorelist, reverse=True) ],
+                self.httpcache, limit=countlimit, contents=contents,
+                executor=get_assembly_executor(), timeout=self.httpcache.timeout):
 
                 try:
-
-                    r = self.httpcache.get(imageuri)
-
+                    baseims.append(
+                        Image.open(io.BytesIO(imagecontent)).convert("RGBA", palette=Image.ADAPTIVE)
+                    )
                 except Exception:
+                    module_logger.exception("failed to open image at {}, skipping".format(imageuri))
 
-                    module_logger.exception("failed to download image at {}, skipping".format(imageuri))
-                    continue
-
-                ifp = io.BytesIO(r.content)
-
-                baseims.append( 
-                    Image.open(ifp).convert("RGBA", palette=Image.ADAPTIVE)
-                )
-
-                imagecount += 1
-
-                if imagecount > countlimit:
-                    break
-            
             imout = Image.new("RGBA", (requested_width, requested_height), "black")
             imbase = Image.new("RGBA", (requested_width, requested_height), "black")
 
@@ -115,46 +143,20 @@ class MementoImageReel:
 
                 working_ims.append(im)
 
-            outputims = []
-
-            module_logger.debug("building animated GIF")
-
-            # Thanks: https://stackoverflow.com/questions/2563822/how-do-you-composite-an-image-onto-another-image-with-pil-in-python
-            for im in working_ims:
-
-                # imconv = im.convert("RGBA")
-
-                im_w, im_h = im.size
-
-                newim = imbase.copy()
-                bg_w, bg_h = newim.size
-
-                offset = ((bg_w - im_w) // 2, (bg_h - im_h) // 2)
-
-                newim.paste(im, offset)
-
-                outputims.append(imbase)
-                # TODO: loop this! also, maybe do increments of 0.01?
-                for i in range(1, 99, 10):
-                    i = i / 100
-                    outputims.append( Image.blend(imbase, newim, i))
+            module_logger.debug("writing animated {}".format(reelformat))
 
-                for i in range(0, 30):
-                    outputims.append(newim)
+            # frames are written as they are made, never all held at once
+            with write_artifact(reelfile) as f:
 
-                for i in range(1, 99, 10):
-                    i = i / 100
-                    outputims.append( Image.blend(newim, imbase, i) )
+                writer = reel_writer(reelformat, f, imbase, working_ims)
+                writer.add(imout, duration)
 
-            module_logger.debug("saving animated GIF")
+                for frame, frameduration in reel_frames(imbase, working_ims, duration):
+                    writer.add(frame, frameduration)
 
-            with open(reelfile, 'wb') as outputfp:
-                imout.save(
-                    outputfp, save_all=True, format="GIF", 
-                    append_images=outputims, duration=duration, loop=0
-                )
+                writer.close()
 
-            with open(reelfile, 'rb') as f:
+                f.seek(0)
                 data = f.read()
 
             module_logger.info("Image reel generation successful, returning video")
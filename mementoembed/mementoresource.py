@@ -9,13 +9,14 @@ import aiu
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
-from bs4 import BeautifulSoup
 from requests.exceptions import Timeout, TooManyRedirects, \
     ChunkedEncodingError, ContentDecodingError, StreamConsumedError, \
     URLRequired, MissingSchema, InvalidSchema, InvalidURL, \
     UnrewindableBodyError, ConnectionError, SSLError, ReadTimeout, \
     ConnectionError
 
+from .htmldocument import parse_html
+
 wayback_pattern = re.compile('(/[0-9]{14})/')
 
 module_logger = logging.getLogger('mementoembed.mementoresource')
@@ -68,6 +69,10 @@ class MementoTimeoutError(MementoConnectionError):
     user_facing_error = "The system timed out trying to reach the URI you provided."
     pass
 
+class MementoDeadlineError(MementoTimeoutError):
+    user_facing_error = "The system could not finish gathering the parts of this memento's surrogate in time, please try again shortly."
+    pass
+
 class MementoConnectionFailure(MementoConnectionError):
     user_facing_error = "The system had connection problems while retrieving the URI you provided"
     pass
@@ -165,14 +170,14 @@ def memento_resource_factory(urim, http_cache):
     content = response.text
 
     try:
-        soup = BeautifulSoup(content, "html5lib")
+        document = parse_html(content)
     except Exception as e:
         raise MementoParsingError(
             "failed to open document using BeautifulSoup",
             original_exception=e)
 
     try:
-        metatags = soup.find_all("meta")
+        metatags = document.metatags
     except Exception as e:
         raise MementoParsingError(
             "failed to parse document using BeautifulSoup",
@@ -218,18 +223,18 @@ def memento_resource_factory(urim, http_cache):
                                 module_logger.debug("for redirected URI-M {}, I got a response of {}".format(urim, resp))
 
                                 if resp.status_code == 200:
-                                    soup = BeautifulSoup(resp.text, "html5lib")
+                                    document = parse_html(resp.text)
 
             except Exception as e:
                 raise MementoMetaRedirectParsingError(
                     "failed to parse document using BeautifulSoup",
                     original_exception=e)
 
-    if soup.find("iframe", {"id": "theWebpage"}):
+    if document.find("iframe", {"id": "theWebpage"}):
         module_logger.info("memento is an IMF memento")
         return IMFMemento(http_cache, urim, given_uri=given_urim)
     
-    if soup.find("div", {'id': 'SOLID'}):
+    if document.find("div", {'id': 'SOLID'}):
         module_logger.info("memento is an Archive.is memento")
         return ArchiveIsMemento(http_cache, urim, given_uri=given_urim)
 
@@ -334,6 +339,9 @@ class MementoResource:
         self.framecontent = []
         self.framescontent = None
 
+        self._document = None
+        self._raw_document = None
+
     @property
     def memento_datetime(self):
         
@@ -358,12 +366,34 @@ class MementoResource:
 
         return self.urig
 
+    @property
+    def document(self):
+        """
+            The parsed HTML of the memento's content, shared by extractors.
+        """
+
+        if self._document is None:
+            self._document = parse_html(self.content)
+
+        return self._document
+
+    @property
+    def raw_document(self):
+        """
+            The parsed HTML of the memento's raw content, shared by extractors.
+        """
+
+        if self._raw_document is None:
+            self._raw_document = parse_html(self.raw_content)
+
+        return self._raw_document
+
     def get_content_from_frames(self):
 
         if self.framescontent is None:
 
             try:
-                soup = BeautifulSoup(self.response.text, 'html5lib')
+                document = parse_html(self.response.text)
             except Exception as e:
                 module_logger.exception("failed to open document using BeautifulSoup")
                 raise MementoFramesParsingError(
@@ -371,7 +401,7 @@ class MementoResource:
                     original_exception=e)
 
             try:
-                title = soup.title.text
+                title = document.soup.title.text
             except Exception as e:
                 module_logger.exception("failed to extract title using BeautifulSoup")
                 raise MementoFramesParsingError(
@@ -383,7 +413,7 @@ class MementoResource:
             # self.framecontent.append(self.response.text)
 
             try:
-                frames = soup.findAll("frame")
+                frames = document.frames
             except Exception as e:
                 module_logger.exception("failed to find frames using BeautifulSoup")
                 raise MementoFramesParsingError(
@@ -442,7 +472,7 @@ class MementoResource:
             for content in self.framecontent:
 
                 try:
-                    soup = BeautifulSoup(content, 'html5lib')
+                    document = parse_html(content)
                 except Exception as e:
                     module_logger.exception("failed to open document using BeautifulSoup")
                     raise MementoFramesParsingError(
@@ -452,7 +482,7 @@ class MementoResource:
                 framecontent = ""
 
                 try:
-                    for item in soup.findAll('body'):
+                    for item in document.find_all('body'):
                         for c in item.children:
                             # self.logger.debug("adding:\n{}".format(str(c)))
                             framecontent += str(c)
@@ -475,12 +505,10 @@ class MementoResource:
 
         content = self.response.text
 
-        soup = BeautifulSoup(content, 'html5lib')
-
         # TODO: BeautifulSoup does not seem to handle framesets inside a <body> tag
 
         try:
-            frames = soup.findAll("frame")
+            frames = parse_html(content).frames
         except Exception as e:
             module_logger.exception("failure while searching for frame tags in memento HTML")
             raise MementoFramesParsingError(
@@ -509,7 +537,7 @@ class ArchiveIsMemento(MementoResource):
         if wayback_pattern.search(self.urim):
             
             try:
-                soup = BeautifulSoup(self.content, "html5lib")
+                document = self.document
             except Exception as e:
                 module_logger.exception("failed to open document using BeautifulSoup")
                 raise MementoParsingError(
@@ -517,7 +545,7 @@ class ArchiveIsMemento(MementoResource):
                     original_exception=e)
 
             try:
-                anchors = soup.find_all('a')
+                anchors = document.find_all('a')
 
                 for a in anchors:
                     if a.text == 'download .zip':
@@ -553,8 +581,7 @@ class ArchiveIsMemento(MementoResource):
             #     original_exception=e)
 
             # for Archive.today's new behavior: no raw memento content
-            soup = BeautifulSoup(self.content, "html5lib")
-            content = "<html><body>{}</body></html>".format(soup.find(id='CONTENT').contents)
+            content = "<html><body>{}</body></html>".format(self.document.find(id='CONTENT').contents)
 
         return content
 
@@ -569,7 +596,7 @@ class IMFMemento(MementoResource):
         content = self.response.text
 
         try:
-            soup = BeautifulSoup(content, "html5lib")
+            document = parse_html(content)
         except Exception as e:
             module_logger.exception("failed to open document using BeautifulSoup")
             raise MementoParsingError(
@@ -577,7 +604,7 @@ class IMFMemento(MementoResource):
                 original_exception=e)
 
         try:
-            twp = soup.find("iframe", {"id": "theWebpage"})
+            twp = document.find("iframe", {"id": "theWebpage"})
         except Exception as e:
             module_logger.exception("failed to find iframe with id=theWebPage using BeautifulSoup")
             raise MementoParsingError(
@@ -610,7 +637,7 @@ class WaybackMemento(MementoResource):
     def raw_content(self):
 
         try:
-            soup = BeautifulSoup(self.response.text, 'html5lib')
+            document = parse_html(self.response.text)
         except Exception as e:
             module_logger.exception("failed to open document using BeautifulSoup")
             raise MementoParsingError(
@@ -618,7 +645,7 @@ class WaybackMemento(MementoResource):
                 original_exception=e)
 
         try:
-            frames = soup.findAll("frame")
+            frames = document.frames
         except Exception as e:
             module_logger.exception("failed to find frames using BeautifulSoup")
             raise MementoParsingError(
@@ -1,8 +1,11 @@
+import time
 import logging
+import functools
 
 from datetime import datetime
+from concurrent.futures import TimeoutError
 
-from .mementoresource import memento_resource_factory
+from .mementoresource import memento_resource_factory, MementoDeadlineError
 from .originalresource import OriginalResource
 from .imageselection import get_best_image
 from .archiveresource import ArchiveResource
@@ -10,6 +13,29 @@ from .textprocessing import extract_text_snippet, extract_title, TitleExtraction
 
 module_logger = logging.getLogger('mementoembed.mementosurrogate')
 
+# the parts of a surrogate that MementoSurrogate.assemble gathers concurrently
+assembled_parts = []
+
+def assembled(function):
+    """
+        Marks a MementoSurrogate property as an independent part that
+        assemble may start early, returning its result once it is ready.
+    """
+
+    assembled_parts.append(function.__name__)
+
+    @functools.wraps(function)
+    def part(self):
+
+        future = self.parts.get(function.__name__)
+
+        if future is None:
+            return function(self)
+
+        return self.part_result(function.__name__, future)
+
+    return part
+
 class MementoSurrogate:
     """
         Surrogate provides a single interface to
@@ -31,25 +57,64 @@ class MementoSurrogate:
 
         self.default_image_uri = default_image_uri
 
+        self.parts = {}
+        self.deadline = None
+
+    def assemble(self, executor, deadline=None):
+        """
+            Starts gathering every independent part of the surrogate (title,
+            snippet, striking image, favicons, collection name, link status)
+            on `executor` at once, so that each network-bound part waits only
+            on its own hosts. Reading a part then waits for its result.
+
+            If `deadline` is given, every part must be ready within that many
+            seconds of this call or reading it raises MementoDeadlineError.
+            Parts that are late keep running, so that what they fetch is
+            cached for the next request.
+        """
+
+        if deadline is not None:
+            self.deadline = time.monotonic() + float(deadline)
+
+        for name in assembled_parts:
+
+            if name not in self.parts:
+                self.parts[name] = executor.submit(
+                    getattr(MementoSurrogate, name).fget.__wrapped__, self)
+
+    def part_result(self, name, future):
+
+        if self.deadline is None:
+            return future.result()
+
+        try:
+            return future.result(timeout=max(self.deadline - time.monotonic(), 0))
+        except TimeoutError as e:
+            raise MementoDeadlineError(
+                "surrogate part {} for {} was not ready before the deadline".format(name, self.urim),
+                original_exception=e)
+
     @property
     def creation_time(self):
         return self.surrogate_creation_time
 
     @property
+    @assembled
     def text_snippet(self):
-        raw_content = self.memento.raw_content
+        raw_document = self.memento.raw_document
 
-        self.logger.debug("extracting text from raw content, currently size {}".format(len(raw_content)))
+        self.logger.debug("extracting text from raw content, currently size {}".format(len(raw_document.content)))
 
-        return extract_text_snippet(raw_content)
+        return extract_text_snippet(raw_document)
 
     @property
+    @assembled
     def title(self):
         try:
-            pagetitle = extract_title(self.memento.raw_content)
+            pagetitle = extract_title(self.memento.raw_document)
         except TitleExtractionError:
             self.logger.exception("failed to extract title from content for {}, attempting with non-raw content".format(self.urim))
-            pagetitle = extract_title(self.memento.content)
+            pagetitle = extract_title(self.memento.document)
 
         return pagetitle
 
@@ -58,6 +123,7 @@ class MementoSurrogate:
         return self.memento.memento_datetime
 
     @property
+    @assembled
     def striking_image(self):
         self.logger.info("looking for the best image in the memento")
         return get_best_image(self.memento.im_urim, self.httpcache, default_image_uri=self.default_image_uri)
@@ -71,10 +137,12 @@ class MementoSurrogate:
         return self.originalresource.domain
 
     @property
+    @assembled
     def original_link_status(self):
         return self.originalresource.link_status
 
     @property
+    @assembled
     def original_favicon(self):
         return self.originalresource.favicon
 
@@ -87,6 +155,7 @@ class MementoSurrogate:
         return self.archive.name
 
     @property
+    @assembled
     def archive_favicon(self):
         return self.archive.favicon
 
@@ -95,6 +164,7 @@ class MementoSurrogate:
         return self.archive.collection_id
 
     @property
+    @assembled
     def collection_name(self):
         return self.archive.collection_name
 
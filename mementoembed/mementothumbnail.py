@@ -1,12 +1,15 @@
+import io
 import os
 import hashlib
 import logging
-import subprocess
+import tempfile
 
 from PIL import Image
 
 from .mementoresource import memento_resource_factory, WaybackMemento, \
     ArchiveIsMemento, IMFMemento, wayback_pattern
+from .browserpool import BrowserPoolTimeout, capture_once
+from .diskbudget import write_artifact, artifact_accessed
 
 module_logger = logging.getLogger('mementoembed.mementothumbnail')
 
@@ -52,13 +55,20 @@ class MementoThumbnailFolderNotFound(MementoThumbnailGenerationError):
 
 class MementoThumbnail:
 
-    def __init__(self, user_agent, working_directory, thumbnail_script, httpcache):
+    def __init__(self, user_agent, working_directory, thumbnail_script, httpcache, browser_pool=None):
 
         self.user_agent = user_agent
         self.working_directory = working_directory
         self.thumbnail_script = thumbnail_script
         self.httpcache = httpcache
 
+        # if given, screenshots are captured by the browsers of this pool
+        # instead of a new browser for each thumbnail
+        self.browser_pool = browser_pool
+
+        # the file holding the last thumbnail generated
+        self.artifact_file = None
+
         # defaults
         self._viewport_width = 1024
         self._viewport_height = 768
@@ -174,6 +184,60 @@ class MementoThumbnail:
         elif self._timeout > 300:
             raise MementoThumbnailTimeoutInvalid("Attempting to set a value higher than 5 minutes for thumbnail generation")
 
+    def capture_screenshot(self, thumb_urim, screenshotfile):
+        """
+            Captures a screenshot of `thumb_urim` into `screenshotfile` with
+            the browser pool, or with a browser started for this capture if
+            there is no pool.
+        """
+
+        if self.browser_pool is not None:
+            module_logger.debug("sending capture to browser pool, output should be in {}".format(screenshotfile))
+
+            self.browser_pool.capture(thumb_urim, screenshotfile,
+                self.viewport_width, self.viewport_height,
+                self.user_agent, self.timeout)
+
+        else:
+            module_logger.debug("running script, output should be in {}".format(screenshotfile))
+
+            capture_once(["node", self.thumbnail_script], thumb_urim, screenshotfile,
+                self.viewport_width, self.viewport_height,
+                self.user_agent, self.timeout)
+
+    def create_thumbnail_file(self, thumb_urim, thumbfile):
+        """
+            Captures `thumb_urim` and writes the resized thumbnail to
+            `thumbfile`. Each capture uses its own temporary files and the
+            thumbnail is moved into place once complete, so concurrent
+            requests never see or overwrite a partial thumbnail.
+        """
+
+        fd, screenshotfile = tempfile.mkstemp(
+            prefix="capture-", suffix=".png", dir=self.working_directory)
+        os.close(fd)
+
+        try:
+            self.capture_screenshot(thumb_urim, screenshotfile)
+
+            im = Image.open(screenshotfile)
+
+            height = self.height
+
+            if self.height == "auto" or self.height < self.width:
+                ratio = self.viewport_height / self.viewport_width
+                height = ratio * self.width
+
+            im.thumbnail(
+                ( int(self.width), int(height) ),
+                 Image.LANCZOS)
+
+            with write_artifact(thumbfile) as f:
+                im.save(f, format='PNG')
+
+        finally:
+            os.unlink(screenshotfile)
+
     def generate_thumbnail(self, urim, remove_banner=True):
         
         if os.path.isdir(self.working_directory):
@@ -183,7 +247,6 @@ class MementoThumbnail:
             else:
                 thumb_urim = urim
 
-            os.environ['URIM'] = thumb_urim
             m = hashlib.sha256()
 
             m.update(
@@ -198,61 +261,40 @@ class MementoThumbnail:
                     ).encode('utf8')
                     )
 
-            # TODO: why m.hexdigest twice?
-            thumbfile = m.hexdigest()
             thumbfile = "{}/{}.png".format(self.working_directory, m.hexdigest())
+            self.artifact_file = thumbfile
 
             module_logger.debug("Thumbnail will be stored in {}".format(thumbfile))
 
-            os.environ['THUMBNAIL_OUTPUTFILE'] = thumbfile
-            os.environ['USER_AGENT'] = self.user_agent
-
-            os.environ['VIEWPORT_WIDTH'] = str(self.viewport_width)
-            os.environ['VIEWPORT_HEIGHT'] = str(self.viewport_height)
-
-            module_logger.debug("Starting thumbnail generation script with: "
+            module_logger.debug("Generating thumbnail with: "
                 "viewport_width={}, viewport_height={}, user_agent={}, "
                 "thumbnail_outputfile={}, thumbnail_width={}, thumbnail_height={}".format(
                     self.viewport_width, self.viewport_height, self.user_agent,
                     thumbfile, self.width, self.height))
 
-            if not os.path.exists(thumbfile):
-                module_logger.debug("running script, output should be in {}".format(thumbfile))
-                p = subprocess.Popen(["node", self.thumbnail_script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
             try:
 
                 # the beginning of some measure of caching
                 if not os.path.exists(thumbfile):
-                    p.wait(timeout=self.timeout)
-
-                im = Image.open(thumbfile)
+                    self.create_thumbnail_file(thumb_urim, thumbfile)
+                else:
+                    artifact_accessed(thumbfile)
 
-                height = self.height
-                
-                if self.height == "auto" or self.height < self.width:
-                    ratio = self.viewport_height / self.viewport_width
-                    height = ratio * self.width
+                with open(thumbfile, 'rb') as f:
+                    data = f.read()
 
-                im.thumbnail(
-                    ( int(self.width), int(height) ),
-                     Image.ANTIALIAS)
+                im = Image.open(io.BytesIO(data))
 
                 module_logger.debug("thumbnail images size is {}".format(im.size))
 
                 self.width = im.size[0]
                 self.height = im.size[1]
 
-                im.save(thumbfile)
-
-                with open(thumbfile, 'rb') as f:
-                    data = f.read()
-
                 module_logger.info("Thumbnail generation successful, returning image")
 
                 return data
 
-            except subprocess.TimeoutExpired:
+            except BrowserPoolTimeout:
 
                 module_logger.exception(
                     "Thumbnail script failed to return after {} seconds".format(self.timeout))
@@ -260,13 +302,9 @@ class MementoThumbnail:
                 raise MementoThumbnailGenerationError(
                     "Thumbnail script failed to return after {} seconds".format(self.timeout))
 
-            except Exception:
-
-                script_output_out = p.stdout.read()
-                script_output_err = p.stderr.read()
+            except Exception as e:
 
-                msg = "Unexpected exception when running thumbnail script, output was {}, error was {}".format(
-                    script_output_out, script_output_err)
+                msg = "Unexpected exception when running thumbnail script: {}".format(e)
 
                 module_logger.exception(msg)
 
@@ -1,10 +1,34 @@
 import logging
 import io
+import json
+import hashlib
 
 from wordcloud import WordCloud
 
 from .mementoresource import memento_resource_factory
 from .textprocessing import get_text_without_boilerplate
+from .stores import get_store
+
+module_logger = logging.getLogger('mementoembed.mementowordcloud')
+
+# the name of the store holding word cloud layouts by URI-M
+wordcloud_layout_store = 'wordcloud_layouts'
+
+# the number of seconds word cloud layouts are kept in the store, None for ever
+wordcloud_layout_expiration = 604800
+
+def set_wordcloud_layout_expiration(seconds):
+    """
+        Sets the number of seconds that word cloud layouts are kept in the
+        word cloud layout store, 0 to keep them until the store is cleared.
+    """
+
+    global wordcloud_layout_expiration
+
+    wordcloud_layout_expiration = int(seconds) if int(seconds) > 0 else None
+
+def wordcloud_layout_key(urim):
+    return hashlib.sha256(urim.encode('utf8')).hexdigest()
 
 class MementoWordCloudGenerationError(Exception):
     pass
@@ -16,16 +40,79 @@ class MementoWordCloud:
         self.user_agent = user_agent
         self.httpcache = httpcache
 
-    def generate_wordcloud(self, urim, colormap="inferno", background_color="white"):
+    def compute_layout(self, urim):
+        """
+            Returns the word frequencies of `urim` and the font size,
+            position, and orientation of each word in its word cloud,
+            which are the same whatever the colors of the word cloud.
+        """
 
         memento = memento_resource_factory(urim, self.httpcache)
 
         text = get_text_without_boilerplate(memento.raw_content)
 
-        wordcloud = WordCloud(background_color=background_color, colormap=colormap)
-        
+        wordcloud = WordCloud()
+
         wordcloud.generate(text)
 
+        return {
+            "words": wordcloud.words_,
+            "layout": [
+                [ word, frequency, int(font_size), [ int(position[0]), int(position[1]) ],
+                    None if orientation is None else int(orientation) ]
+                for (word, frequency), font_size, position, orientation, color in wordcloud.layout_
+            ]
+        }
+
+    def get_layout(self, urim):
+        """
+            Returns the layout of the word cloud of `urim`, computed once
+            and kept in the word cloud layout store so that every colormap,
+            background color, and the list of words come from the same
+            layout.
+        """
+
+        store = get_store(wordcloud_layout_store)
+
+        if store is None:
+            return self.compute_layout(urim)
+
+        key = wordcloud_layout_key(urim)
+
+        try:
+            cached = store.get(key)
+        except Exception:
+            module_logger.exception("failed to read word cloud layout from store")
+            cached = None
+
+        if cached is not None:
+            return json.loads(cached.decode('utf8'))
+
+        layout = self.compute_layout(urim)
+
+        try:
+            store.set(key, json.dumps(layout).encode('utf8'),
+                expire_after=wordcloud_layout_expiration)
+        except Exception:
+            module_logger.exception("failed to save word cloud layout to store")
+
+        return layout
+
+    def generate_wordcloud(self, urim, colormap="inferno", background_color="white"):
+
+        layout = self.get_layout(urim)
+
+        wordcloud = WordCloud(background_color=background_color, colormap=colormap)
+
+        wordcloud.words_ = layout["words"]
+        wordcloud.layout_ = [
+            ( (word, frequency), font_size, tuple(position), orientation, None )
+            for word, frequency, font_size, position, orientation in layout["layout"]
+        ]
+
+        # only the colors differ between word clouds of the same memento
+        wordcloud.recolor()
+
         im = wordcloud.to_image()
 
         output_bytes = io.BytesIO()
@@ -36,12 +123,4 @@ class MementoWordCloud:
 
     def generate_words_and_scores(self, urim):
 
-        memento = memento_resource_factory(urim, self.httpcache)
-
-        text = get_text_without_boilerplate(memento.raw_content)
-
-        wordcloud = WordCloud()
-
-        wordcloud.generate(text)
-
-        return wordcloud.words_
+        return self.get_layout(urim)["words"]
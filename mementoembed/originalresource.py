@@ -50,7 +50,7 @@ class OriginalResource:
 
             self.logger.debug("interrogating HTML of memento for favicon URI")
 
-            candidate_favicon = get_favicon_from_html(self.content)
+            candidate_favicon = get_favicon_from_html(self.memento.document)
 
             self.logger.debug("retrieved candidate favicon of {}".format(candidate_favicon))
 
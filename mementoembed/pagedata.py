@@ -1,15 +1,8 @@
-from bs4 import BeautifulSoup
+from .htmldocument import parse_html
 
 def parse_page_metadata(htmltext):
 
-    metadata_list = []
-
-    soup = BeautifulSoup(htmltext, 'html5lib')
-
-    for metatag in soup.find_all('meta'):
-        metadata_list.append( metatag.attrs )
-
-    return metadata_list
+    return list( parse_html(htmltext).metadata )
 
 def find_metaddata_value(metadata_list, attribute, attribute_key=None, attribute_value=None):
 
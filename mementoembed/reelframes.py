@@ -0,0 +1,73 @@
+import logging
+
+import numpy as np
+
+from PIL import Image
+
+module_logger = logging.getLogger('mementoembed.reelframes')
+
+# the opacities of the frames fading an image in, and out again
+fade_alphas = [ i / 100 for i in range(1, 99, 10) ]
+
+# the number of frame durations an image is shown between its fades
+hold_frames = 30
+
+def crossfade(start, end, alphas=fade_alphas):
+    """
+        Returns a frame for each opacity in `alphas`, fading from the RGBA
+        image `start` to the RGBA image `end`, the same as calling
+        Image.blend(start, end, alpha) for each of them, but converting
+        each image only once and writing every frame into one array.
+    """
+
+    startpixels = np.asarray(start, dtype=np.float32)
+    difference = np.asarray(end, dtype=np.float32) - startpixels
+
+    # the frames, and one frame of scratch space however many there are
+    frames = np.empty((len(alphas),) + startpixels.shape, dtype=np.uint8)
+    blended = np.empty_like(startpixels)
+
+    for frame, alpha in zip(frames, alphas):
+        np.multiply(difference, np.float32(alpha), out=blended)
+        blended += startpixels
+        # truncated, as Image.blend does
+        frame[...] = blended
+
+    return [ Image.fromarray(frame, "RGBA") for frame in frames ]
+
+def center_image(background, im):
+    """
+        Returns a copy of `background` with `im` pasted at its center.
+    """
+
+    newim = background.copy()
+
+    bg_w, bg_h = newim.size
+    im_w, im_h = im.size
+
+    newim.paste(im, ((bg_w - im_w) // 2, (bg_h - im_h) // 2))
+
+    return newim
+
+def reel_frames(background, ims, duration):
+    """
+        Yields the frames of a reel showing each of `ims` in turn on
+        `background`, as pairs of the frame and how many milliseconds it
+        is shown. Each image fades in over `background`, is shown for
+        `hold_frames` frame durations as a single frame, and fades out.
+    """
+
+    # Thanks: https://stackoverflow.com/questions/2563822/how-do-you-composite-an-image-onto-another-image-with-pil-in-python
+    for im in ims:
+
+        newim = center_image(background, im)
+
+        yield background, duration
+
+        for frame in crossfade(background, newim):
+            yield frame, duration
+
+        yield newim, duration * hold_frames
+
+        for frame in crossfade(newim, background):
+            yield frame, duration
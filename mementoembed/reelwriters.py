@@ -0,0 +1,349 @@
+import io
+import struct
+import logging
+
+import numpy as np
+
+from PIL import Image, GifImagePlugin
+
+from .reelframes import center_image
+
+module_logger = logging.getLogger('mementoembed.reelwriters')
+
+# the lossy quality of animated WebP frames, as for Image.save
+webp_quality = 80
+
+# the largest number of pixels of each sample used to choose a GIF palette
+palette_sample_pixels = 160 * 120
+
+class ReelWriterError(Exception):
+    pass
+
+def changed_box(previous, pixels, alignment=1):
+    """
+        Returns the smallest box containing every pixel that differs between
+        the arrays `previous` and `pixels`, with its left and top edges on
+        multiples of `alignment`.
+    """
+
+    changed = previous != pixels
+
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+
+    rows = np.flatnonzero(changed.any(axis=1))
+    cols = np.flatnonzero(changed.any(axis=0))
+
+    left = int(cols[0]) - int(cols[0]) % alignment
+    top = int(rows[0]) - int(rows[0]) % alignment
+
+    return (left, top, int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+class ReelWriter:
+    """
+        Writes an animation to the file `fp` one frame at a time, so that
+        only the frame being written and the one before it are ever held in
+        memory.
+
+        Frames are RGBA images of `size` pixels, shown over black. A frame
+        identical to the one before it lengthens that frame instead of
+        being written, and every other frame after the first is written as
+        only the box containing the pixels that changed.
+    """
+
+    content_type = None
+    alignment = 1
+
+    def __init__(self, fp, size):
+
+        self.fp = fp
+        self.size = size
+        self.frames = 0
+
+        self._matte = Image.new("RGBA", size, "black")
+        self._started = False
+        self._previous = None
+        self._pending = None
+
+    def prepare(self, frame):
+        """
+            Returns `frame` as the opaque image this format encodes.
+        """
+
+        if frame.mode != "RGBA":
+            frame = frame.convert("RGBA")
+
+        return Image.alpha_composite(self._matte, frame).convert("RGB")
+
+    def add(self, frame, duration):
+        """
+            Adds `frame`, shown for `duration` milliseconds.
+        """
+
+        if frame.size != self.size:
+            raise ReelWriterError("frame of size {} does not fit a reel of size {}".format(
+                frame.size, self.size))
+
+        frame = self.prepare(frame)
+        pixels = np.asarray(frame)
+
+        if self._pending is not None:
+
+            if np.array_equal(pixels, self._pending[0]):
+                self._pending[2] += duration
+                return
+
+            self._flush()
+
+        self._pending = [ pixels, frame, duration ]
+
+    def _flush(self):
+
+        pixels, frame, duration = self._pending
+        self._pending = None
+
+        if not self._started:
+            self.write_header()
+            self._started = True
+
+        if self._previous is None:
+            box = (0, 0) + self.size
+            previous = None
+        else:
+            box = changed_box(self._previous, pixels, self.alignment)
+            previous = self._previous[box[1]:box[3], box[0]:box[2]]
+
+        if box != (0, 0) + self.size:
+            frame = frame.crop(box)
+
+        self.write_frame(frame, box[0:2], duration, previous)
+        self.frames += 1
+
+        self._previous = pixels
+
+    def close(self):
+        """
+            Writes the last frame and finishes the file.
+        """
+
+        if self._pending is not None:
+            self._flush()
+
+        if not self._started:
+            self.write_header()
+            self._started = True
+
+        self.write_trailer()
+
+    def write_header(self):
+        raise NotImplementedError
+
+    def write_frame(self, frame, offset, duration, previous):
+        """
+            Writes `frame` at `offset` on the canvas, where `previous` holds
+            the pixels it replaces, or None for the first frame.
+        """
+        raise NotImplementedError
+
+    def write_trailer(self):
+        raise NotImplementedError
+
+class GIFReelWriter(ReelWriter):
+    """
+        Writes an animated GIF whose frames all share the global color
+        table of `palette`, an image in mode P of at most 255 colors, so
+        that no frame needs a palette of its own. Pixels that are the same
+        as in the frame before are written as the transparent color 255,
+        which compresses better than repeating them.
+    """
+
+    content_type = 'image/gif'
+    transparency = 255
+
+    def __init__(self, fp, size, palette):
+
+        super().__init__(fp, size)
+
+        self.palette = palette
+
+    def prepare(self, frame):
+        return super().prepare(frame).quantize(palette=self.palette, dither=Image.NONE)
+
+    def write_header(self):
+
+        # the header takes the size of the canvas from its image
+        canvas = Image.new("P", self.size)
+        canvas.putpalette(self.palette.getpalette())
+
+        header, used_palette_colors = GifImagePlugin.getheader(canvas, info={ 'loop': 0 })
+
+        for data in header:
+            self.fp.write(data)
+
+    def write_frame(self, frame, offset, duration, previous):
+
+        params = { 'duration': duration }
+
+        if previous is not None:
+
+            indices = np.array(frame)
+            unchanged = indices == previous
+
+            if unchanged.any():
+                indices[unchanged] = self.transparency
+                frame = Image.frombytes("P", frame.size, indices.tobytes())
+                params['transparency'] = self.transparency
+
+        for data in GifImagePlugin.getdata(frame, offset, **params):
+            self.fp.write(data)
+
+    def write_trailer(self):
+        self.fp.write(b";")
+
+def webp_chunks(data):
+    """
+        Yields the type and contents of each chunk of the WebP file `data`.
+    """
+
+    if data[0:4] != b'RIFF' or data[8:12] != b'WEBP':
+        raise ReelWriterError("not a WebP file")
+
+    position = 12
+
+    while position + 8 <= len(data):
+
+        chunktype = data[position:position + 4]
+        chunksize = struct.unpack('<I', data[position + 4:position + 8])[0]
+
+        yield chunktype, data[position + 8:position + 8 + chunksize]
+
+        # chunks are padded to an even size
+        position += 8 + chunksize + chunksize % 2
+
+def webp_chunk(chunktype, contents):
+
+    padding = b'\0' if len(contents) % 2 else b''
+
+    return chunktype + struct.pack('<I', len(contents)) + contents + padding
+
+def uint24(value):
+    return struct.pack('<I', value)[0:3]
+
+class WebPReelWriter(ReelWriter):
+    """
+        Writes an animated WebP, encoding each frame with Pillow as it is
+        added and placing it in the animation's RIFF container. The file
+        size is written into the RIFF header once the reel is closed, so
+        `fp` must be seekable.
+    """
+
+    content_type = 'image/webp'
+
+    # frames must start on even pixels
+    alignment = 2
+
+    def __init__(self, fp, size, quality=webp_quality):
+
+        super().__init__(fp, size)
+
+        self.quality = quality
+        self._start = None
+
+    def write_header(self):
+
+        width, height = self.size
+
+        self._start = self.fp.tell()
+
+        # the RIFF size is not known until the reel is closed
+        self.fp.write(b'RIFF' + struct.pack('<I', 0) + b'WEBP')
+
+        # animation flag, canvas size
+        self.fp.write(webp_chunk(b'VP8X',
+            struct.pack('<B', 0x02) + b'\0\0\0' + uint24(width - 1) + uint24(height - 1)))
+
+        # black background, loop forever
+        self.fp.write(webp_chunk(b'ANIM', struct.pack('<BBBBH', 0, 0, 0, 255, 0)))
+
+    def write_frame(self, frame, offset, duration, previous):
+
+        stillfp = io.BytesIO()
+        frame.save(stillfp, format="WEBP", quality=self.quality)
+
+        # the image data of the still, without its own header
+        framedata = b''.join(
+            webp_chunk(chunktype, contents)
+            for chunktype, contents in webp_chunks(stillfp.getvalue())
+            if chunktype in (b'ALPH', b'VP8 ', b'VP8L')
+        )
+
+        x, y = offset
+        width, height = frame.size
+
+        self.fp.write(webp_chunk(b'ANMF',
+            uint24(x // 2) + uint24(y // 2) + uint24(width - 1) + uint24(height - 1) +
+            # do not blend with the frame before, do not dispose
+            uint24(min(int(duration), 0xffffff)) + struct.pack('<B', 0x02) +
+            framedata))
+
+    def write_trailer(self):
+
+        end = self.fp.tell()
+
+        self.fp.seek(self._start + 4)
+        self.fp.write(struct.pack('<I', end - self._start - 8))
+        self.fp.seek(end)
+
+def reel_palette(background, ims):
+    """
+        Returns an image in mode P holding a palette of at most 255 colors
+        for a reel showing each of `ims` on `background`, chosen from
+        samples of each image at full strength and half faded.
+    """
+
+    samples = [ background ]
+
+    for im in ims:
+
+        newim = center_image(background, im)
+
+        samples.append(newim)
+        samples.append(Image.blend(background, newim, 0.5))
+
+    width, height = background.size
+    scale = min(1.0, (palette_sample_pixels / (width * height)) ** 0.5)
+    samplesize = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    montage = Image.new("RGB", (samplesize[0], samplesize[1] * len(samples)), "black")
+
+    for n, sample in enumerate(samples):
+
+        if sample.mode != "RGBA":
+            sample = sample.convert("RGBA")
+
+        sample = Image.alpha_composite(Image.new("RGBA", sample.size, "black"), sample)
+        montage.paste(sample.convert("RGB").resize(samplesize, resample=Image.BOX),
+            (0, samplesize[1] * n))
+
+    # leaving color 255 for transparency
+    return montage.quantize(GIFReelWriter.transparency, method=Image.FASTOCTREE)
+
+# the formats a reel can be written in, with their MIME-types
+reel_formats = {
+    'gif': GIFReelWriter.content_type,
+    'webp': WebPReelWriter.content_type
+}
+
+def reel_writer(reelformat, fp, background, ims):
+    """
+        Returns a writer for a reel in `reelformat`, one of reel_formats,
+        showing each of `ims` on `background`.
+    """
+
+    if reelformat == 'gif':
+        return GIFReelWriter(fp, background.size, reel_palette(background, ims))
+
+    elif reelformat == 'webp':
+        return WebPReelWriter(fp, background.size)
+
+    raise ReelWriterError("unsupported reel format {}".format(reelformat))
@@ -5,3 +5,13 @@ def extract_urim_from_request_path(fullpath, endpoint_stem):
     urim = urim[:-1] if urim[-1] == '?' else urim
 
     return urim
+
+def prefers_respond_async(headers):
+    """
+        Returns True if the request's Prefer header (RFC 7240) asks for
+        an asynchronous response.
+    """
+
+    preferences = headers.get('Prefer', '').split(',')
+
+    return 'respond-async' in [ pref.strip().lower() for pref in preferences ]
@@ -1,5 +1,6 @@
 import logging
 import json
+import hashlib
 import traceback
 
 import requests_cache
@@ -9,8 +10,9 @@ from redis import RedisError
 
 from mementoembed.mementoresource import NotAMementoError, MementoContentError, \
     MementoConnectionError, MementoTimeoutError, MementoInvalidURI, \
-    MementoURINotAtArchiveFailure
+    MementoURINotAtArchiveFailure, MementoDeadlineError
 from mementoembed.textprocessing import TextProcessingError
+from mementoembed.stores import get_store
 from .. import getURICache
 
 module_logger = logging.getLogger('mementoembed.services.errors')
@@ -22,8 +24,76 @@ def attempt_cache_deletion(urim):
     if urim not in baduris:
         getURICache(urim).cache.delete_url(urim)
 
+# the name of the store holding the error responses of URI-Ms that failed
+negative_cache_store = 'negative_responses'
+
+def negative_cache_key(urim):
+    return hashlib.sha256(urim.encode('utf8')).hexdigest()
+
+def get_negative_cache(urim):
+
+    if urim in ["", None] or int(current_app.config['NEGATIVE_CACHE_EXPIRATION']) <= 0:
+        return None
+
+    return get_store(negative_cache_store)
+
+def cached_error_response(urim):
+    """
+        Returns the error response, and its status, recorded for `urim` if
+        it failed recently, or None.
+    """
+
+    store = get_negative_cache(urim)
+
+    if store is None:
+        return None
+
+    try:
+        cached = store.get(negative_cache_key(urim))
+    except Exception:
+        module_logger.exception("failed to read error response from negative cache")
+        return None
+
+    if cached is None:
+        return None
+
+    record = json.loads(cached.decode('utf8'))
+
+    module_logger.info("returning error response for {} from negative cache".format(urim))
+
+    response = make_response(record['content'])
+    response.headers['Content-Type'] = 'application/json'
+
+    return response, record['status']
+
+def cache_error_response(urim, response, status):
+    """
+        Records the error response for `urim` so that requests for it are
+        answered without contacting the archive until
+        NEGATIVE_CACHE_EXPIRATION seconds have passed.
+    """
+
+    store = get_negative_cache(urim)
+
+    if store is not None:
+
+        try:
+            store.set(negative_cache_key(urim), json.dumps({
+                "status": status,
+                "content": response.get_data(as_text=True)
+            }).encode('utf8'), expire_after=int(current_app.config['NEGATIVE_CACHE_EXPIRATION']))
+        except Exception:
+            module_logger.exception("failed to save error response to negative cache")
+
+    return response, status
+
 def handle_errors(function_name, urim, preferences):
 
+    cached = cached_error_response(urim)
+
+    if cached is not None:
+        return cached
+
     try:
         return function_name(urim, preferences)
 
@@ -43,7 +113,7 @@ def handle_errors(function_name, urim, preferences):
                     traceback.format_exc())
                 }, indent=4))
         response.headers['Content-Type'] = 'application/json'
-        return response, 404
+        return cache_error_response(urim, response, 404)
 
     except MementoURINotAtArchiveFailure as e:
 
@@ -60,7 +130,20 @@ def handle_errors(function_name, urim, preferences):
                 "error details": repr(traceback.format_exc())
             }, indent=4))
         response.headers['Content-Type'] = 'application/json'
-        return response, 502
+        return cache_error_response(urim, response, 502)
+
+    except MementoDeadlineError as e:
+        # the archive has not failed, and the parts still being gathered
+        # are cached for the next request, so nothing is deleted or remembered
+        module_logger.warning("The surrogate for {} was not ready before the deadline".format(urim))
+        response = make_response(
+            json.dumps({
+                "urim": urim,
+                "content": e.user_facing_error,
+                "error details": repr(traceback.format_exc())
+            }, indent=4))
+        response.headers['Content-Type'] = 'application/json'
+        return response, 504
 
     except MementoTimeoutError as e:
         attempt_cache_deletion(urim)
@@ -72,7 +155,7 @@ def handle_errors(function_name, urim, preferences):
                 "error details": repr(traceback.format_exc())
             }, indent=4))
         response.headers['Content-Type'] = 'application/json'
-        return response, 504
+        return cache_error_response(urim, response, 504)
 
     except MementoInvalidURI as e:
         # no need to delete from cache, requests will throw an exception again
@@ -99,7 +182,7 @@ def handle_errors(function_name, urim, preferences):
                 "error details": repr(traceback.format_exc())
             }, indent=4))
         response.headers['Content-Type'] = 'application/json'
-        return response, 502
+        return cache_error_response(urim, response, 502)
 
     except (TextProcessingError, MementoContentError) as e:
         attempt_cache_deletion(urim)
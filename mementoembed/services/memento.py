@@ -38,7 +38,7 @@ def page_metadata(urim, preferences):
 
     output['urim'] = urim
     output['generation-time'] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-    output['page-metadata'] = parse_page_metadata(memento.raw_content)
+    output['page-metadata'] = parse_page_metadata(memento.raw_document)
 
     response = make_response(json.dumps(output, indent=4))
     response.headers['Content-Type'] = 'application/json'
@@ -104,20 +104,20 @@ def contentdata(urim, preferences):
     output['generation-time'] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
     try:
-        output['title'] = extract_title(memento.raw_content)
+        output['title'] = extract_title(memento.raw_document)
 
         if output['title'] == '':
             module_logger.warning("empty title detected for {}, attempting to extract title from non-raw content")
-            output['title'] = extract_title(memento.content)
+            output['title'] = extract_title(memento.document)
     except TitleExtractionError:
         module_logger.exception("failed to extract title from content for {}, attempting with non-raw content".format(urim))
-        output['title'] = extract_title(memento.content)
+        output['title'] = extract_title(memento.document)
 
     try:
-        output['snippet'] = extract_text_snippet(memento.raw_content)
+        output['snippet'] = extract_text_snippet(memento.raw_document)
     except SnippetGenerationError:
         module_logger.exception("failed to extract snippet from content for {}, attempting with non-raw content".format(urim))
-        output['snippet'] = extract_text_snippet(memento.content)
+        output['snippet'] = extract_text_snippet(memento.document)
 
     output['memento-datetime'] = memento.memento_datetime.strftime("%Y-%m-%dT%H:%M:%SZ")
     
@@ -10,14 +10,14 @@ from flask import render_template, request, make_response, Blueprint, current_ap
 from redis import RedisError
 
 from mementoembed.mementosurrogate import MementoSurrogate
-from mementoembed.sessions import ManagedSession
+from mementoembed.executors import get_assembly_executor
 from mementoembed.mementoresource import NotAMementoError, MementoContentError, \
     MementoConnectionError, MementoTimeoutError, MementoInvalidURI
 from mementoembed.textprocessing import TextProcessingError
-from mementoembed.version import __useragent__
 
 from .product import generate_social_card_html
 from .errors import handle_errors
+from .. import getURICache
 
 module_logger = logging.getLogger('mementoembed.services.oembed')
 
@@ -47,16 +47,16 @@ def generate_oembed_response(urim):
     
     module_logger.debug("output format will be: {}".format(responseformat))
     
-    httpcache = ManagedSession(
-        timeout=current_app.config['REQUEST_TIMEOUT_FLOAT'],
-        user_agent=__useragent__,
-        starting_uri=urim
-        )
+    httpcache = getURICache(urim)
     
     s = MementoSurrogate(
         urim,
         httpcache
     )
+
+    if get_assembly_executor() is not None:
+        s.assemble(get_assembly_executor(),
+            deadline=float(current_app.config['SURROGATE_ASSEMBLY_DEADLINE']))
     
     output = {}
     
@@ -11,12 +11,17 @@ from urllib.parse import urlparse
 from flask import render_template, request, Blueprint, current_app, make_response
 
 from mementoembed.mementosurrogate import MementoSurrogate
+from mementoembed.executors import get_assembly_executor
+from mementoembed.browserpool import get_browser_pool
+from mementoembed.jobqueue import get_job_queue, job_key, JobQueueFull
+from mementoembed.diskbudget import artifact_accessed
 from mementoembed.mementothumbnail import MementoThumbnail, \
     MementoThumbnailGenerationError, MementoThumbnailFolderNotFound, \
     MementoThumbnailSizeInvalid, MementoThumbnailViewportInvalid, \
     MementoThumbnailTimeoutInvalid
 from mementoembed.mementoimagereel import MementoImageReel
 from mementoembed.mementodocreel import MementoDocreel
+from mementoembed.reelwriters import reel_formats
 from mementoembed.mementoresource import MementoURINotAtArchiveFailure, memento_resource_factory
 from mementoembed.imageselection import convert_imageuri_to_pngdata_uri, generate_images_and_scores
 from mementoembed.mementowordcloud import MementoWordCloud
@@ -24,13 +29,16 @@ from mementoembed.sessions import ManagedSession
 from mementoembed.version import __useragent__
 
 from .errors import handle_errors
-from . import extract_urim_from_request_path
+from . import extract_urim_from_request_path, prefers_respond_async
 from .. import getURICache
 
 module_logger = logging.getLogger('mementoembed.services.product')
 
 bp = Blueprint('services__product', __name__)
 
+# the number of seconds clients are asked to wait before checking on a job
+job_retry_after = 5
+
 def generate_social_card_html_without_javascript(urim, surrogate, urlroot, 
     archive_favicon_uri, original_favicon_uri, striking_image_uri):
 
@@ -94,6 +102,10 @@ def generate_socialcard_response(urim, preferences):
         default_image_uri=current_app.config['DEFAULT_IMAGE_URI']
     )
 
+    if get_assembly_executor() is not None:
+        s.assemble(get_assembly_executor(),
+            deadline=float(current_app.config['SURROGATE_ASSEMBLY_DEADLINE']))
+
     urlroot = request.url_root
     urlroot = urlroot if urlroot[-1] != '/' else urlroot[0:-1]
 
@@ -162,7 +174,7 @@ def generate_socialcard_response(urim, preferences):
 
     return response, 200
 
-def generate_imagereel_response(urim, prefs):
+def create_imagereel(urim, prefs):
 
     httpcache = getURICache(urim)
 
@@ -177,25 +189,38 @@ def generate_imagereel_response(urim, prefs):
         int(prefs['duration']),
         int(prefs['imagecount']),
         int(prefs['width']),
-        int(prefs['height'])
+        int(prefs['height']),
+        regenerate=(prefs.get('regenerate', 'no') == 'yes'),
+        reelformat=prefs['format']
         )
 
-    response = make_response(data)
-
-    response.headers['Content-Type'] = 'image/gif'
-    response.headers['Preference-Applied'] = \
-        "duration={},imagecount={},width={},height={}".format(
+    headers = {}
+    headers['Content-Type'] = reel_formats[prefs['format']]
+    headers['Preference-Applied'] = \
+        "duration={},imagecount={},width={},height={},format={}".format(
             prefs['duration'],
             prefs['imagecount'],
             prefs['width'],
-            prefs['height']
+            prefs['height'],
+            prefs['format']
         )
 
     module_logger.info("Finished with image reel generation")
 
+    return data, headers, mir.artifact_file
+
+def generate_imagereel_response(urim, prefs):
+
+    data, headers, artifact_file = create_imagereel(urim, prefs)
+
+    response = make_response(data)
+
+    for key, value in headers.items():
+        response.headers[key] = value
+
     return response, 200
 
-def generate_docreel_response(urim, prefs):
+def create_docreel(urim, prefs):
 
     httpcache = getURICache(urim)
 
@@ -214,15 +239,27 @@ def generate_docreel_response(urim, prefs):
         int(prefs['sentencecount']),
         int(prefs['width']),
         int(prefs['height']),
-        current_app.config['DOCREEL_DEFAULT_FONT_PATH']
+        current_app.config['DOCREEL_DEFAULT_FONT_PATH'],
+        regenerate=(prefs.get('regenerate', 'no') == 'yes'),
+        reelformat=prefs['format']
         )
 
-    response = make_response(data)
-
-    response.headers['Content-Type'] = 'image/gif'
+    headers = {}
+    headers['Content-Type'] = reel_formats[prefs['format']]
 
     module_logger.info("Finished with image reel generation")
 
+    return data, headers, mv.artifact_file
+
+def generate_docreel_response(urim, prefs):
+
+    data, headers, artifact_file = create_docreel(urim, prefs)
+
+    response = make_response(data)
+
+    for key, value in headers.items():
+        response.headers[key] = value
+
     return response, 200
 
 def generate_wordcloud_response(urim, prefs):
@@ -260,6 +297,106 @@ def generate_wordcloud_response(urim, prefs):
 
     return response, 200
 
+def create_thumbnail(urim, prefs):
+
+    httpcache = getURICache(urim)
+
+    mt = MementoThumbnail(
+        __useragent__,
+        current_app.config['THUMBNAIL_WORKING_FOLDER'],
+        current_app.config['THUMBNAIL_SCRIPT_PATH'],
+        httpcache,
+        browser_pool=get_browser_pool()
+    )
+
+    mt.viewport_height = prefs['viewport_height']
+    mt.viewport_width = prefs['viewport_width']
+    mt.timeout = prefs['timeout']
+    mt.height = prefs['thumbnail_height']
+    mt.width = prefs['thumbnail_width']
+
+    if prefs['remove_banner'].lower() == 'yes':
+        remove_banner = True
+    else:
+        remove_banner = False
+
+    data = mt.generate_thumbnail(urim, remove_banner=remove_banner)
+
+    headers = {}
+    headers['Content-Type'] = 'image/png'
+    headers['Preference-Applied'] = \
+        "viewport_width={},viewport_height={}," \
+        "thumbnail_width={},thumbnail_height={}," \
+        "timeout={},remove_banner={}".format(
+            mt.viewport_width, mt.viewport_height,
+            mt.width, mt.height, mt.timeout,
+            prefs['remove_banner'])
+
+    module_logger.info("Finished with thumbnail generation")
+
+    return data, headers, mt.artifact_file
+
+def submit_product_job(product, urim, prefs, function):
+    """
+        Queues the job creating `product` with `function(urim, prefs)` and
+        responds with 202 Accepted and the URI of the job's status.
+    """
+
+    job_queue = get_job_queue()
+
+    # a request to regenerate shares the job of an identical request
+    regenerate = prefs.get('regenerate', 'no') == 'yes'
+    job_id = job_key(product, urim,
+        dict( (k, v) for k, v in prefs.items() if k != 'regenerate' ))
+
+    # jobs run outside of this request, but need the application
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            data, headers, artifact_file = function(urim, prefs)
+
+        # the job serves the file the product was saved to
+        return artifact_file, headers
+
+    try:
+        record = job_queue.submit(job_id, product, urim, run, force=regenerate)
+
+    except JobQueueFull as e:
+        module_logger.warning("rejecting {} job for {}: {}".format(product, urim, e.message))
+
+        response = make_response(json.dumps({
+            "urim": urim,
+            "error": "MementoEmbed is busy, please try again later"
+        }, indent=4))
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Retry-After'] = str(job_retry_after)
+
+        return response, 503
+
+    return job_status_response(record)
+
+def job_status_response(record):
+
+    urlroot = request.url_root
+    urlroot = urlroot if urlroot[-1] != '/' else urlroot[0:-1]
+
+    status_uri = "{}/services/product/jobs/{}".format(urlroot, record['id'])
+
+    response = make_response(json.dumps({
+        "urim": record['urim'],
+        "product": record['product'],
+        "status": record['status'],
+        "status-uri": status_uri
+    }, indent=4))
+
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Location'] = status_uri
+    response.headers['Retry-After'] = str(job_retry_after)
+    response.headers['Preference-Applied'] = 'respond-async'
+
+    return response, 202
+
 @bp.route('/services/product/socialcard/<path:subpath>')
 def socialcard_endpoint(subpath):
 
@@ -296,15 +433,27 @@ def docreel_endpoint(subpath):
     prefs['sentencecount'] = int(current_app.config['DOCREEL_SENTENCE_COUNT'])
     prefs['width'] = int(current_app.config['DOCREEL_WIDTH'])
     prefs['height'] = int(current_app.config['DOCREEL_HEIGHT'])
+    prefs['format'] = current_app.config['DOCREEL_FORMAT'].lower()
 
     if 'Prefer' in request.headers:
 
         preferences = request.headers['Prefer'].split(',')
 
         for pref in preferences:
+
+            if '=' not in pref:
+                continue
+
             key, value = pref.split('=')
             prefs[key] = value.lower()
 
+    # an unsupported format is not applied
+    if prefs['format'] not in reel_formats:
+        prefs['format'] = current_app.config['DOCREEL_FORMAT'].lower()
+
+    if get_job_queue() is not None and prefers_respond_async(request.headers):
+        return submit_product_job('docreel', urim, prefs, create_docreel)
+
     return handle_errors(generate_docreel_response, urim, prefs)
 
 @bp.route('/services/product/imagereel/<path:subpath>')
@@ -320,15 +469,27 @@ def imagereel_endpoint(subpath):
     prefs['imagecount'] = int(current_app.config['IMAGEREEL_COUNT'])
     prefs['width'] = int(current_app.config['IMAGEREEL_WIDTH'])
     prefs['height'] = int(current_app.config['IMAGEREEL_HEIGHT'])
+    prefs['format'] = current_app.config['IMAGEREEL_FORMAT'].lower()
 
     if 'Prefer' in request.headers:
 
         preferences = request.headers['Prefer'].split(',')
 
         for pref in preferences:
+
+            if '=' not in pref:
+                continue
+
             key, value = pref.split('=')
             prefs[key] = value.lower()
 
+    # an unsupported format is not applied
+    if prefs['format'] not in reel_formats:
+        prefs['format'] = current_app.config['IMAGEREEL_FORMAT'].lower()
+
+    if get_job_queue() is not None and prefers_respond_async(request.headers):
+        return submit_product_job('imagereel', urim, prefs, create_imagereel)
+
     return handle_errors(generate_imagereel_response, urim, prefs)
 
 @bp.route('/services/product/thumbnail/<path:subpath>')
@@ -355,6 +516,10 @@ def thumbnail_endpoint(subpath):
             preferences = request.headers['Prefer'].split(',')
 
             for pref in preferences:
+
+                if '=' not in pref:
+                    continue
+
                 key, value = pref.split('=')
 
                 if key in prefs:
@@ -373,41 +538,17 @@ def thumbnail_endpoint(subpath):
 
             module_logger.debug("The user hath preferences! ")
 
-        httpcache = getURICache(urim)
-
-        mt = MementoThumbnail(
-            __useragent__,
-            current_app.config['THUMBNAIL_WORKING_FOLDER'],
-            current_app.config['THUMBNAIL_SCRIPT_PATH'],
-            httpcache
-        )
+        if get_job_queue() is not None and prefers_respond_async(request.headers):
+            return submit_product_job('thumbnail', urim, prefs, create_thumbnail)
 
         try:
 
-            mt.viewport_height = prefs['viewport_height']
-            mt.viewport_width = prefs['viewport_width']
-            mt.timeout = prefs['timeout']
-            mt.height = prefs['thumbnail_height']
-            mt.width = prefs['thumbnail_width']
-
-            if prefs['remove_banner'].lower() == 'yes':
-                remove_banner = True
-            else:
-                remove_banner = False
-
-            data = mt.generate_thumbnail(urim, remove_banner=remove_banner)
+            data, headers, artifact_file = create_thumbnail(urim, prefs)
 
             response = make_response(data)
-            response.headers['Content-Type'] = 'image/png'
-            response.headers['Preference-Applied'] = \
-                "viewport_width={},viewport_height={}," \
-                "thumbnail_width={},thumbnail_height={}," \
-                "timeout={},remove_banner={}".format(
-                    mt.viewport_width, mt.viewport_height,
-                    mt.width, mt.height, mt.timeout,
-                    prefs['remove_banner'])
 
-            module_logger.info("Finished with thumbnail generation")
+            for key, value in headers.items():
+                response.headers[key] = value
 
             return response, 200
 
@@ -479,7 +620,7 @@ def thumbnail_endpoint(subpath):
 
             output = {
                 "urim": urim,
-                "error": "a thumbnail failed to generated in {} seconds".format(mt.timeout),
+                "error": "a thumbnail failed to generated in {} seconds".format(prefs['timeout']),
                 "error details": repr(traceback.format_exc())
             }
 
@@ -521,3 +662,55 @@ def wordcloud_endpoint(subpath):
             prefs[key] = value.lower()
 
     return handle_errors(generate_wordcloud_response, urim, prefs)
+
+@bp.route('/services/product/jobs/<job_id>')
+def job_endpoint(job_id):
+
+    record = None
+
+    if get_job_queue() is not None:
+        record = get_job_queue().status(job_id)
+
+    if record is None:
+        response = make_response(json.dumps({
+            "job": job_id,
+            "error": "no such job, it may have expired"
+        }, indent=4))
+        response.headers['Content-Type'] = 'application/json'
+        return response, 404
+
+    if record['status'] == 'failed':
+        response = make_response(json.dumps({
+            "urim": record['urim'],
+            "product": record['product'],
+            "status": record['status'],
+            "error": record['error'],
+            "error details": record['error details']
+        }, indent=4))
+        response.headers['Content-Type'] = 'application/json'
+        return response, 500
+
+    if record['status'] != 'complete':
+        return job_status_response(record)
+
+    try:
+        with open(record['artifact'], 'rb') as f:
+            data = f.read()
+
+        artifact_accessed(record['artifact'])
+
+    except FileNotFoundError:
+        response = make_response(json.dumps({
+            "urim": record['urim'],
+            "product": record['product'],
+            "error": "the result of this job is no longer available, please request it again"
+        }, indent=4))
+        response.headers['Content-Type'] = 'application/json'
+        return response, 404
+
+    response = make_response(data)
+
+    for key, value in record['headers'].items():
+        response.headers[key] = value
+
+    return response, 200
@@ -0,0 +1,39 @@
+import logging
+import json
+
+from datetime import datetime
+
+from flask import Blueprint, make_response
+
+from .. import get_session_manager
+from ..executors import get_scoring_executor
+from ..stores import stores_stats
+from ..browserpool import get_browser_pool
+from ..jobqueue import get_job_queue
+from ..diskbudget import disk_budget_stats
+
+module_logger = logging.getLogger('mementoembed.services.stats')
+
+bp = Blueprint('services__stats', __name__)
+
+@bp.route('/services/stats/')
+def stats_endpoint():
+
+    output = {}
+
+    output['generation-time'] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    output['http-sessions'] = get_session_manager().stats()
+    output['image-scoring'] = get_scoring_executor().stats()
+    output['stores'] = stores_stats()
+    output['working-folders'] = disk_budget_stats()
+
+    if get_browser_pool() is not None:
+        output['thumbnail-browsers'] = get_browser_pool().stats()
+
+    if get_job_queue() is not None:
+        output['product-jobs'] = get_job_queue().stats()
+
+    response = make_response(json.dumps(output, indent=4))
+    response.headers['Content-Type'] = 'application/json'
+
+    return response, 200
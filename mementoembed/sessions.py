@@ -1,11 +1,33 @@
+import re
+import time
+import copy
+import sqlite3
+import hashlib
 import logging
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 import requests
 import brotli
 
+from requests.adapters import HTTPAdapter
+from requests.exceptions import TooManyRedirects
+from redis import ConnectionPool, StrictRedis
+from redis.exceptions import LockError
 from requests_cache import CachedSession
+from requests_cache.core import dispatch_hook
+from requests_cache.backends import create_backend
+from requests_cache.backends.base import BaseCache
+
+from urllib.parse import urlparse, urljoin
 
 from .version import __useragent__
+from .cacheserialization import CompactCache
+from .bodystore import FileBodyStore, RedisBodyStore
+from .walcache import WALCache
 
 module_logger = logging.getLogger('mementoembed.sessions')   
 
@@ -54,6 +76,553 @@ class BrotliResponse:
         return content
 
 
+class PoolStatistics:
+    """
+        Thread-safe counters shared by everything the SessionManager hands out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def increment(self, name, amount=1):
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def as_dict(self):
+
+        with self._lock:
+            return dict(self._counters)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+        An HTTPAdapter that is shared by all ManagedSessions in this process,
+        keeping one keep-alive connection pool per archive host.
+
+        It records a pool hit when a request goes to a host that already
+        has a connection pool and a pool miss when a new one must be built.
+    """
+
+    def __init__(self, statistics, **kwargs):
+        self.statistics = statistics
+        super(PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def _has_host_pool(self, url):
+
+        o = urlparse(url)
+        scheme = o.scheme.lower()
+        host = (o.hostname or '').lower()
+        port = o.port
+
+        if port is None:
+            port = 443 if scheme == 'https' else 80
+
+        for key in self.poolmanager.pools.keys():
+
+            if key.key_scheme == scheme and key.key_host == host and key.key_port == port:
+                return True
+
+        return False
+
+    def send(self, request, **kwargs):
+
+        if self._has_host_pool(request.url):
+            self.statistics.increment('http pool hits')
+        else:
+            self.statistics.increment('http pool misses')
+
+        return super(PooledHTTPAdapter, self).send(request, **kwargs)
+
+
+# these headers vary between callers but do not change the response
+singleflight_ignored_headers = [ 'referer', 'user-agent' ]
+
+def singleflight_key(method, uri, headers=None):
+    """
+        Builds the key under which identical outbound requests are coalesced
+        from the method, the normalized URI, and the request headers that
+        can change the response (e.g., Accept-Datetime).
+    """
+
+    o = urlparse(uri)
+    o = o._replace(scheme=o.scheme.lower(), netloc=o.netloc.lower(), fragment='')
+
+    m = hashlib.sha256()
+    m.update(method.upper().encode('utf8'))
+    m.update(o.geturl().encode('utf8'))
+
+    if headers:
+        for name, value in sorted( (k.lower(), str(v)) for k, v in headers.items() ):
+            if name not in singleflight_ignored_headers:
+                m.update("\n{}: {}".format(name, value).encode('utf8'))
+
+    return m.hexdigest()
+
+
+class RedisFlightLock:
+    """
+        Holds a Redis lock for an in-flight fetch so that workers in other
+        processes wait for it and then read its response from the cache.
+    """
+
+    def __init__(self, connection, namespace, lock_timeout):
+        self.connection = connection
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+
+    @contextmanager
+    def hold(self, key, statistics):
+
+        lock = self.connection.lock(
+            "{}:inflight:{}".format(self.namespace, key),
+            timeout=self.lock_timeout
+        )
+
+        acquired = lock.acquire(blocking=False)
+
+        if not acquired:
+            statistics.increment('coalesced waits across workers')
+            acquired = lock.acquire(blocking=True, blocking_timeout=self.lock_timeout)
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    # the lock expired while the fetch was running
+                    module_logger.warning("in-flight lock for {} expired before release".format(key))
+
+
+class SQLiteFlightLock:
+    """
+        Holds a row in an 'inflight' table of the SQLite cache database for
+        an in-flight fetch so that workers in other processes wait for it
+        and then read its response from the cache.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, filename, lock_timeout):
+        self.filename = filename
+        self.lock_timeout = lock_timeout
+
+        with self._connection() as con:
+            con.execute("create table if not exists `inflight` (key PRIMARY KEY, expires REAL)")
+
+    @contextmanager
+    def _connection(self):
+
+        con = sqlite3.connect(self.filename, timeout=self.lock_timeout)
+
+        try:
+            yield con
+            con.commit()
+        finally:
+            con.close()
+
+    def _try_acquire(self, key):
+
+        now = time.time()
+
+        with self._connection() as con:
+            con.execute("delete from `inflight` where key=? and expires<?", (key, now))
+            cur = con.execute("insert or ignore into `inflight` (key, expires) values (?,?)",
+                (key, now + self.lock_timeout))
+
+            return cur.rowcount == 1
+
+    def _release(self, key):
+
+        with self._connection() as con:
+            con.execute("delete from `inflight` where key=?", (key,))
+
+    @contextmanager
+    def hold(self, key, statistics):
+
+        acquired = self._try_acquire(key)
+
+        if not acquired:
+            statistics.increment('coalesced waits across workers')
+            deadline = time.time() + self.lock_timeout
+
+            while not acquired and time.time() < deadline:
+                time.sleep(self.poll_interval)
+                acquired = self._try_acquire(key)
+
+        try:
+            yield
+        finally:
+            if acquired:
+                self._release(key)
+
+
+class _InFlightCall:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.exception = None
+
+
+class SingleFlight:
+    """
+        Coalesces identical outbound requests. The first caller for a key
+        performs the fetch while concurrent callers in the same process wait
+        for it and receive a copy of its response. If a distributed lock is
+        supplied, the leaders in different worker processes also wait on one
+        another, so that only one of them contacts the archive and the rest
+        are answered from the cache.
+    """
+
+    def __init__(self, statistics, distributed_lock=None, before_release=None):
+        self.statistics = statistics
+        self.distributed_lock = distributed_lock
+        self.before_release = before_release
+
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fetch):
+
+        with self._lock:
+
+            call = self._calls.get(key)
+
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            self.statistics.increment('coalesced waits')
+            call.event.wait()
+
+            if call.exception is not None:
+                raise call.exception
+
+            return copy.copy(call.response)
+
+        self.statistics.increment('single-flight fetches')
+
+        try:
+
+            if self.distributed_lock is not None:
+                with self.distributed_lock.hold(key, self.statistics):
+                    call.response = fetch()
+
+                    # other workers read the response once the lock is released
+                    if self.before_release is not None:
+                        self.before_release()
+            else:
+                call.response = fetch()
+
+        except Exception as e:
+            call.exception = e
+            raise
+
+        finally:
+
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.response
+
+
+# the 14-digit datetime in the path of a Wayback-style URI-M, e.g.,
+# /web/20180622211636id_/http://example.com/
+archived_path_datetime = re.compile(r'/\d{14}([a-z]{2}_)?/')
+
+# the relations of the Memento protocol (RFC 7089) that archives send in
+# the Link header of their TimeGates, TimeMaps, and mementos
+memento_link_relations = [ 'original', 'timegate', 'timemap', 'memento' ]
+
+class CachePolicy:
+    """
+        Assigns a time-to-live to each cached response by its class:
+
+        * 'memento' -- a response with a Memento-Datetime, or one from an
+          archive host whose path carries a memento datetime (e.g., raw id_
+          and im_ variants), which never changes and so never expires
+        * 'archive' -- any other response from an archive host, or one
+          that links to Memento resources or is a TimeMap, such as
+          collection pages, which change as the archive grows
+        * 'live' -- everything else, such as link_status checks and live
+          web favicons, which may change at any time
+
+        The class is derived from each response and the configured
+        `archive_hosts`, which also match their subdomains, so every worker
+        process classifies a response the same way. A TTL of None means the
+        class never expires.
+    """
+
+    response_classes = [ 'memento', 'archive', 'live' ]
+
+    def __init__(self, memento_expire_after=None, archive_expire_after=None,
+        live_expire_after=None, archive_hosts=None, statistics=None):
+
+        self.ttls = {
+            'memento': self._timedelta(memento_expire_after),
+            'archive': self._timedelta(archive_expire_after),
+            'live': self._timedelta(live_expire_after)
+        }
+
+        self.archive_hosts = [ host.strip().lower() for host in (archive_hosts or []) if host.strip() ]
+
+        if statistics is None:
+            statistics = PoolStatistics()
+
+        self.statistics = statistics
+
+    @staticmethod
+    def _timedelta(expire_after):
+
+        if expire_after is None or isinstance(expire_after, timedelta):
+            return expire_after
+
+        return timedelta(seconds=expire_after)
+
+    def is_archive_host(self, uri):
+
+        host = (urlparse(uri).hostname or '').lower()
+
+        for archive_host in self.archive_hosts:
+            if host == archive_host or host.endswith('.' + archive_host):
+                return True
+
+        return False
+
+    @staticmethod
+    def links_to_mementos(response):
+
+        if response.headers.get('content-type', '').startswith('application/link-format'):
+            return True
+
+        for rel in response.links:
+            if set(rel.lower().split()) & set(memento_link_relations):
+                return True
+
+        return False
+
+    def classify(self, uri, response):
+        """
+            Returns the class of `response`, which was returned for a
+            request for `uri`.
+        """
+
+        if 'memento-datetime' in response.headers:
+            return 'memento'
+
+        if self.is_archive_host(uri) or self.is_archive_host(response.url):
+
+            if archived_path_datetime.search(urlparse(uri).path):
+                return 'memento'
+
+            return 'archive'
+
+        if self.links_to_mementos(response):
+            return 'archive'
+
+        return 'live'
+
+    def expired(self, response_class, timestamp):
+
+        ttl = self.ttls[response_class]
+
+        if ttl is None:
+            return False
+
+        return datetime.utcnow() - timestamp > ttl
+
+    def record(self, response_class, event):
+
+        self.statistics.increment('uricache {} ({})'.format(event, response_class))
+
+    def stats(self):
+        """
+            Returns the hit ratio of each response class that has been
+            requested.
+        """
+
+        counters = self.statistics.as_dict()
+
+        ratios = {}
+
+        for response_class in self.response_classes:
+
+            hits = counters.get('uricache hits ({})'.format(response_class), 0)
+            misses = counters.get('uricache misses ({})'.format(response_class), 0)
+
+            if hits + misses > 0:
+                ratios['uricache hit ratio ({})'.format(response_class)] = \
+                    hits / (hits + misses)
+
+        return ratios
+
+
+class TieredCache(BaseCache):
+    """
+        A cache backend that keeps the most recently used responses of
+        `backend` in the memory of this process, so that a response read
+        several times while building one surrogate is only unpickled from
+        SQLite or Redis once.
+
+        The in-memory tier holds decoded responses and their timestamps,
+        bounded to `max_entries` and `max_bytes` of content, with the least
+        recently used removed first. Every write and deletion also goes to
+        `backend`, which remains shared by all workers. Other workers do
+        not tell this one when they replace or delete a response, so a
+        response is read from `backend` again once it has been in memory
+        for `max_age` seconds.
+    """
+
+    def __init__(self, backend, max_entries=256, max_bytes=64 * 1024 * 1024,
+        max_age=30, statistics=None):
+
+        super(TieredCache, self).__init__()
+
+        self.backend = backend
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.max_age = float(max_age)
+
+        if statistics is None:
+            statistics = PoolStatistics()
+
+        self.statistics = statistics
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _size(response):
+
+        size = len(response.content or b'')
+
+        for name, value in response.headers.items():
+            size += len(name) + len(value)
+
+        for r in response.history:
+            size += len(r.content or b'')
+
+        return size
+
+    def _remember(self, key, response, timestamp):
+
+        size = self._size(response)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+
+            self._entries[key] = (response, timestamp, size, time.monotonic())
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+                self.statistics.increment('l1 evictions')
+
+    def _forget(self, key):
+
+        with self._lock:
+
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def create_key(self, request):
+        return self.backend.create_key(request)
+
+    def get_response_and_time(self, key, default=(None, None)):
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+
+                if time.monotonic() - entry[3] > self.max_age:
+                    # another worker may have replaced or deleted it since
+                    self._bytes -= self._entries.pop(key)[2]
+                    self.statistics.increment('l1 expirations')
+                    entry = None
+
+                else:
+                    self._entries.move_to_end(key)
+
+        if entry is not None:
+            self.statistics.increment('l1 hits')
+            # callers may set attributes on the response they receive
+            return copy.copy(entry[0]), entry[1]
+
+        self.statistics.increment('l1 misses')
+
+        response, timestamp = self.backend.get_response_and_time(key, (None, None))
+
+        if response is None:
+            return default
+
+        self._remember(key, response, timestamp)
+
+        return copy.copy(response), timestamp
+
+    def save_response(self, key, response):
+
+        self.backend.save_response(key, response)
+
+        # the same decoded response that would come back from the backend
+        self._remember(key,
+            self.restore_response(self.reduce_response(response)), datetime.utcnow())
+
+    def add_key_mapping(self, new_key, key_to_response):
+        self.backend.add_key_mapping(new_key, key_to_response)
+
+    def delete(self, key):
+
+        self._forget(key)
+        self.backend.delete(key)
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+        self.backend.clear()
+
+    def remove_old_entries(self, created_before):
+
+        with self._lock:
+
+            for key in [ k for k, e in self._entries.items() if e[1] < created_before ]:
+                self._bytes -= self._entries.pop(key)[2]
+
+        self.backend.remove_old_entries(created_before)
+
+    def has_key(self, key):
+
+        with self._lock:
+            if key in self._entries:
+                return True
+
+        return self.backend.has_key(key)
+
+    def stats(self):
+
+        with self._lock:
+            return { 'l1 entries': len(self._entries), 'l1 bytes': self._bytes }
+
+
 class ManagedSession(CachedSession):
 
     def __init__(self, 
@@ -61,12 +630,16 @@ class ManagedSession(CachedSession):
         allowable_codes=(200,), allowable_methods=('GET',),
         filter_fn=lambda r: True, old_data_on_error=False,
         timeout=300, user_agent=__useragent__, 
-        starting_uri="", **backend_options
+        starting_uri="", shared_adapter=None, singleflight=None,
+        cache_policy=None, **backend_options
     ):
 
         self.timeout = float(timeout)
         self.starting_uri = starting_uri
         self.user_agent = user_agent
+        self.shared_adapter = shared_adapter
+        self.singleflight = singleflight
+        self.cache_policy = cache_policy
         # self.uricache = uricache
 
         super(ManagedSession, self).__init__(
@@ -79,6 +652,99 @@ class ManagedSession(CachedSession):
             **backend_options
         )
 
+        if self.shared_adapter is not None:
+            self.mount('http://', self.shared_adapter)
+            self.mount('https://', self.shared_adapter)
+
+    def close(self):
+
+        # the shared adapter belongs to the SessionManager, closing it here
+        # would drop the keep-alive connections of every other request
+        for prefix in list(self.adapters.keys()):
+            if self.adapters[prefix] is self.shared_adapter:
+                del self.adapters[prefix]
+
+        super(ManagedSession, self).close()
+
+    def send(self, request, **kwargs):
+        """
+            Answers from the cache unless the cached response has outlived
+            the TTL that the cache policy assigns to its class, replacing
+            the single expire_after of CachedSession.
+        """
+
+        if self.cache_policy is None or self._is_cache_disabled \
+            or request.method not in self._cache_allowable_methods:
+            return super(ManagedSession, self).send(request, **kwargs)
+
+        cache_key = self.cache.create_key(request)
+
+        def send_request_and_cache_response():
+            response = requests.Session.send(self, request, **kwargs)
+
+            response_class = self.cache_policy.classify(request.url, response)
+            self.cache_policy.record(response_class, 'misses')
+
+            if response.status_code in self._cache_allowable_codes:
+                self.cache.save_response(cache_key, response)
+
+            response.from_cache = False
+            return response
+
+        response, timestamp = self.cache.get_response_and_time(cache_key)
+
+        if response is None:
+            return send_request_and_cache_response()
+
+        response_class = self.cache_policy.classify(request.url, response)
+
+        if self.cache_policy.expired(response_class, timestamp):
+
+            self.cache_policy.record(response_class, 'expirations')
+
+            if not self._return_old_data_on_error:
+                self.cache.delete(cache_key)
+                return send_request_and_cache_response()
+
+            try:
+                new_response = send_request_and_cache_response()
+            except Exception:
+                return response
+            else:
+                if new_response.status_code not in self._cache_allowable_codes:
+                    return response
+                return new_response
+
+        self.cache_policy.record(response_class, 'hits')
+
+        # dispatch hook here, because it was removed before pickling
+        response.from_cache = True
+        response = dispatch_hook('response', request.hooks, response, **kwargs)
+        return response
+
+    def request(self, method, url, **kwargs):
+
+        if self.singleflight is None or method.upper() != 'GET' or kwargs.get('stream'):
+            return super(ManagedSession, self).request(method, url, **kwargs)
+
+        # cached responses need no coordination, which would cost the
+        # distributed lock a write to the shared database for every read
+        request = self.prepare_request(requests.Request(method, url,
+            params=kwargs.get('params'), headers=kwargs.get('headers')))
+
+        if self.cache.has_key(self.cache.create_key(request)):
+            self.singleflight.statistics.increment('single-flight cache hits')
+            return super(ManagedSession, self).request(method, url, **kwargs)
+
+        key = singleflight_key(method, url, kwargs.get('headers'))
+
+        # once the lock is held, the fetch reads the cache again and finds
+        # the response if another caller stored it while this one waited
+        return self.singleflight.do(
+            key,
+            lambda: super(ManagedSession, self).request(method, url, **kwargs)
+        )
+
     def get(self, uri, headers={}, use_referrer=True):
 
         req_headers = {}
@@ -111,3 +777,372 @@ class ManagedSession(CachedSession):
                 response = BrotliResponse(response)
 
         return response
+
+    def cached_response(self, uri):
+        """
+            Returns the cached response of a GET for `uri`, or None if it
+            is not cached or has expired.
+        """
+
+        if self._is_cache_disabled:
+            return None
+
+        request = self.prepare_request(requests.Request('GET', uri))
+
+        response, timestamp = self.cache.get_response_and_time(self.cache.create_key(request))
+
+        if response is None:
+            return None
+
+        if self.cache_policy is not None:
+            if self.cache_policy.expired(self.cache_policy.classify(uri, response), timestamp):
+                return None
+
+        elif self._cache_expire_after is not None:
+            if datetime.utcnow() - timestamp > self._cache_expire_after:
+                return None
+
+        response.from_cache = True
+
+        return response
+
+    def probe(self, uri, size=16384, use_referrer=True):
+        """
+            Fetches no more than the first `size` bytes of `uri`, asking
+            for a byte range and, for servers that ignore the range, closing
+            the streamed response once enough bytes have arrived.
+
+            A response already in the cache answers the probe without
+            contacting the server; otherwise the probe bypasses the cache,
+            which would read the whole body. Returns the final response,
+            whose body has been consumed, and the bytes read.
+        """
+
+        cached = self.cached_response(uri)
+
+        if cached is not None:
+            module_logger.debug("probing URI {} from the cache".format(uri))
+            return cached, cached.content[:size]
+
+        req_headers = {}
+
+        req_headers['Range'] = "bytes=0-{}".format(size - 1)
+
+        # we want the leading bytes of the resource, not of its compression
+        req_headers['accept-encoding'] = "identity"
+
+        if use_referrer:
+            if uri != self.starting_uri:
+                req_headers['Referer'] = self.starting_uri
+
+        req_headers['User-Agent'] = self.user_agent
+
+        module_logger.debug("probing first {} bytes of URI {}".format(size, uri))
+
+        for i in range(self.max_redirects + 1):
+
+            request = self.prepare_request(requests.Request('GET', uri, headers=req_headers))
+
+            # requests.Session.send does not consult or populate the cache
+            response = requests.Session.send(self, request,
+                stream=True, allow_redirects=False, timeout=self.timeout)
+
+            if not response.is_redirect:
+                break
+
+            uri = urljoin(response.url, response.headers['location'])
+            response.close()
+
+        else:
+            raise TooManyRedirects("exceeded {} redirects while probing {}".format(
+                self.max_redirects, uri))
+
+        data = b''
+
+        try:
+            for chunk in response.iter_content(chunk_size=4096):
+                data += chunk
+
+                if len(data) >= size:
+                    break
+        finally:
+            # closing before the end of the body drops the connection,
+            # which is cheaper than reading a large image we do not want
+            response.close()
+
+        module_logger.debug("probe of URI {} returned status {} with {} bytes".format(
+            uri, response.status_code, len(data)))
+
+        return response, data[:size]
+
+
+class SessionManager:
+    """
+        Keeps the parts of an HTTP session that are expensive to create --
+        the keep-alive connection pools to each archive, the Redis connection
+        pool, and the cache backend -- for the life of the process.
+
+        Each web request receives its own lightweight ManagedSession from
+        get_session, carrying the per-request state (starting URI for the
+        Referer, timeout) on top of these shared objects.
+    """
+
+    def __init__(self, cache_engine='SQLite', cache_name='mementoembed',
+        cache_extension='.sqlite', expire_after=None, memento_expire_after=None,
+        live_expire_after=None, archive_hosts=None, old_data_on_error=False,
+        l1_max_entries=256, l1_max_bytes=64 * 1024 * 1024, l1_max_age=30,
+        redis_host='localhost', redis_port=6379, redis_password=None,
+        redis_db=0, redis_max_connections=None,
+        pool_connections=10, pool_maxsize=10, coalesce_requests=True,
+        timeout=15, user_agent=__useragent__
+    ):
+
+        self.cache_engine = cache_engine
+        self.cache_name = cache_name
+        self.cache_extension = cache_extension
+        self.expire_after = expire_after
+        self.old_data_on_error = old_data_on_error
+        self.l1_max_entries = int(l1_max_entries)
+        self.l1_max_bytes = int(l1_max_bytes)
+        self.l1_max_age = float(l1_max_age)
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+        self.statistics = PoolStatistics()
+        self._lock = threading.Lock()
+
+        # expire_after applies to archive responses that are not mementos
+        self.cache_policy = CachePolicy(
+            memento_expire_after=memento_expire_after,
+            archive_expire_after=expire_after,
+            live_expire_after=live_expire_after,
+            archive_hosts=archive_hosts,
+            statistics=self.statistics
+        )
+
+        self.redis_pool = None
+        self._backend = None
+        self._body_store = None
+        self.compact_backend = None
+        self.wal_backend = None
+
+        if self.cache_engine == 'Redis':
+            self.redis_pool = ConnectionPool(
+                host=redis_host,
+                port=int(redis_port),
+                password=redis_password,
+                db=int(redis_db),
+                max_connections=redis_max_connections
+            )
+
+        self.adapter = PooledHTTPAdapter(
+            self.statistics,
+            pool_connections=int(pool_connections),
+            pool_maxsize=int(pool_maxsize)
+        )
+
+        module_logger.info("created HTTP connection pools for {} hosts "
+            "with up to {} connections each".format(pool_connections, pool_maxsize))
+
+        self.singleflight = None
+
+        if coalesce_requests:
+
+            # a fetch may take up to the timeout to connect and again to read
+            lock_timeout = 2 * float(self.timeout)
+
+            if self.cache_engine == 'Redis':
+                distributed_lock = RedisFlightLock(
+                    self.redis_connection, self.cache_name, lock_timeout)
+            else:
+                distributed_lock = SQLiteFlightLock(
+                    self.cache_name + self.cache_extension, lock_timeout)
+
+            self.singleflight = SingleFlight(self.statistics, distributed_lock,
+                before_release=self.flush_cache)
+
+    @property
+    def redis_connection(self):
+        """
+            Returns a Redis client drawing from the shared connection pool,
+            or None if the cache engine is not Redis.
+        """
+
+        if self.redis_pool is None:
+            return None
+
+        return StrictRedis(connection_pool=self.redis_pool)
+
+    @property
+    def body_store(self):
+        """
+            Returns the store of response bodies shared by all sessions,
+            creating it on first use: files beside the SQLite database, or
+            keys in Redis.
+        """
+
+        if self._body_store is None:
+
+            with self._lock:
+
+                if self._body_store is None:
+
+                    if self.cache_engine == 'Redis':
+                        self._body_store = RedisBodyStore(
+                            self.redis_connection,
+                            namespace=self.cache_name,
+                            statistics=self.statistics
+                        )
+                    else:
+                        self._body_store = FileBodyStore(
+                            self.cache_name + '_bodies',
+                            self.cache_name + self.cache_extension,
+                            timeout=2 * float(self.timeout),
+                            statistics=self.statistics
+                        )
+
+        return self._body_store
+
+    @property
+    def backend(self):
+        """
+            Returns the cache backend shared by all sessions, creating it on
+            first use.
+        """
+
+        if self._backend is None:
+
+            # created outside the lock, which it takes itself
+            body_store = self.body_store
+
+            with self._lock:
+
+                if self._backend is None:
+
+                    if self.cache_engine == 'Redis':
+                        backend = create_backend(
+                            'redis', self.cache_name,
+                            { 'connection': self.redis_connection }
+                        )
+                    elif self.cache_engine == 'SQLiteWAL':
+                        backend = self.wal_backend = WALCache(
+                            self.cache_name,
+                            extension=self.cache_extension,
+                            timeout=2 * float(self.timeout),
+                            statistics=self.statistics
+                        )
+                    else:
+                        backend = create_backend(
+                            'sqlite', self.cache_name,
+                            { 'extension': self.cache_extension }
+                        )
+
+                    module_logger.info("created {} cache backend {}".format(
+                        self.cache_engine, self.cache_name))
+
+                    # store compressed bodies, once each, instead of pickled responses
+                    backend = self.compact_backend = CompactCache(
+                        backend,
+                        statistics=self.statistics,
+                        body_store=body_store
+                    )
+
+                    if self.l1_max_entries > 0 and self.l1_max_bytes > 0:
+
+                        backend = TieredCache(
+                            backend,
+                            max_entries=self.l1_max_entries,
+                            max_bytes=self.l1_max_bytes,
+                            max_age=self.l1_max_age,
+                            statistics=self.statistics
+                        )
+
+                        module_logger.info("keeping up to {} responses and {} bytes "
+                            "of the cache in memory".format(self.l1_max_entries, self.l1_max_bytes))
+
+                    self._backend = backend
+
+        return self._backend
+
+    def flush_cache(self):
+        """
+            Commits the responses that the SQLiteWAL cache engine has queued
+            so that other worker processes can read them.
+        """
+
+        if self.wal_backend is not None:
+            self.wal_backend.flush()
+
+    def migrate_cache(self):
+        """
+            Rewrites every response in the cache that was pickled by an
+            earlier version in the compact form, which otherwise happens
+            to each response the next time it is read. Returns the number
+            of responses rewritten.
+        """
+
+        # creates the backends if no session has been issued yet
+        self.backend
+
+        migrated = self.compact_backend.migrate()
+
+        module_logger.info("migrated {} responses in cache {} to the compact form".format(
+            migrated, self.cache_name))
+
+        return migrated
+
+    def get_session(self, starting_uri):
+        """
+            Returns a ManagedSession for a single request, backed by the
+            shared cache backend and connection pools.
+        """
+
+        self.statistics.increment('sessions issued')
+
+        return ManagedSession(
+            cache_name=self.cache_name,
+            backend=self.backend,
+            old_data_on_error=self.old_data_on_error,
+            timeout=self.timeout,
+            user_agent=self.user_agent,
+            starting_uri=starting_uri,
+            shared_adapter=self.adapter,
+            singleflight=self.singleflight,
+            cache_policy=self.cache_policy
+        )
+
+    def get_store(self, name):
+        """
+            Returns a new Store named `name` kept in the cache engine's
+            database.
+        """
+
+        # imported here because stores depends on this module
+        from .stores import RedisStore, SQLiteStore
+
+        if self.cache_engine == 'Redis':
+            return RedisStore(name, self.redis_connection, namespace=self.cache_name)
+        else:
+            return SQLiteStore(name, self.cache_name + self.cache_extension,
+                timeout=2 * float(self.timeout))
+
+    def stats(self):
+
+        stats = self.statistics.as_dict()
+
+        stats['http pool hosts'] = len(self.adapter.poolmanager.pools)
+
+        stats.update(self.cache_policy.stats())
+
+        if isinstance(self._backend, TieredCache):
+            stats.update(self._backend.stats())
+
+        if self.redis_pool is not None:
+            stats['redis connections created'] = getattr(
+                self.redis_pool, '_created_connections', None)
+            stats['redis connections available'] = len(
+                getattr(self.redis_pool, '_available_connections', []))
+            stats['redis connections in use'] = len(
+                getattr(self.redis_pool, '_in_use_connections', []))
+
+        return stats
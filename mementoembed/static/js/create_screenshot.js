@@ -1,40 +1,84 @@
 const puppeteer = require('puppeteer');
+const readline = require('readline');
 
+// The browser is kept open and capture jobs are read as lines of JSON from
+// standard input, each answered with a line of JSON on standard output.
+// Every parameter of a capture is in its job, so captures share nothing.
+// The browser is closed once standard input is closed.
 
-(async () => {
-
-  const browser = await puppeteer.launch({
-    headless: true, 
+function launchBrowser() {
+  return puppeteer.launch({
+    headless: true,
     ignoreHTTPSErrors: true,
     args:['--no-sandbox']}
     );
+}
+
+async function capture(browser, job) {
 
   const page = await browser.newPage();
 
-  await page.setUserAgent(process.env.USER_AGENT);
+  try {
+    await page.setUserAgent(job.user_agent);
+
+    await page.setViewport({
+        width: parseInt(job.viewport_width),
+        height: parseInt(job.viewport_height)
+      });
+
+    await page.goto(
+      job.urim, {
+        waitUntil: 'domcontentloaded',
+        timeout: 5000000
+      });
+
+    //Set wait time before screenshotURI - equivalent to 'networkidle0'
+    await Promise.all([
+      waitForNetworkIdle(page, 60000, 0),
+    ]);
+
+    await page.screenshot({path: job.output_file});
+  } finally {
+    await page.close();
+  }
+}
+
+async function serve() {
+
+  const browser = await launchBrowser();
 
-  await page.setViewport({
-      width: parseInt(process.env.VIEWPORT_WIDTH), 
-      height: parseInt(process.env.VIEWPORT_HEIGHT)
-    });
+  // if the browser crashes, exit so that the pool starts a new one
+  browser.on('disconnected', () => process.exit(1));
 
-  await page.goto(
-    process.env.URIM, {
-      waitUntil: 'domcontentloaded',
-      timeout: 5000000
-    });
+  const lines = readline.createInterface({input: process.stdin});
 
-  //Set wait time before screenshotURI - equivalent to 'networkidle0'
-  await Promise.all([
-    waitForNetworkIdle(page, 60000, 0), 
-  ]);
+  // jobs are captured one at a time, the pool starts one process per browser
+  for await (const line of lines) {
 
-  await page.screenshot({path: process.env.THUMBNAIL_OUTPUTFILE});
+    let job = {};
 
+    try {
+      job = JSON.parse(line);
+      await capture(browser, job);
+      reply({id: job.id, status: 'ok'});
+    } catch (e) {
+      reply({id: job.id, status: 'error', message: String(e)});
+    }
+  }
+
+  browser.removeAllListeners('disconnected');
   await browser.close();
+}
+
+function reply(result) {
+  process.stdout.write(JSON.stringify(result) + '\n');
+}
+
+(async () => {
+  await serve();
 })();
 
-//Functions required to control the network idle time 
+//Functions required to control the network idle time
 
 function waitForNetworkIdle(page, timeout, maxInflightRequests = 0) {
   page.on('request', onRequestStarted);
@@ -59,7 +103,7 @@ function waitForNetworkIdle(page, timeout, maxInflightRequests = 0) {
     if (inflight > maxInflightRequests)
       clearTimeout(timeoutId);
   }
-  
+
   function onRequestFinished() {
     if (inflight === 0)
       return;
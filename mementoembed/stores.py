@@ -0,0 +1,264 @@
+import time
+import sqlite3
+import logging
+import threading
+
+from collections import OrderedDict
+
+from .sessions import PoolStatistics
+
+module_logger = logging.getLogger('mementoembed.stores')
+
+class Store:
+    """
+        A named key-value store of bytes, kept in the same database as the
+        HTTP cache, for results that are expensive to compute and can be
+        shared by every worker (e.g., image scores).
+
+        Keys are strings. Values are bytes and may expire after a number of
+        seconds.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.statistics = PoolStatistics()
+
+    def get(self, key):
+        """
+            Returns the value stored for `key`, or None.
+        """
+
+        value = self._get(key)
+
+        if value is None:
+            self.statistics.increment('misses')
+        else:
+            self.statistics.increment('hits')
+
+        return value
+
+    def set(self, key, value, expire_after=None):
+        """
+            Stores bytes `value` for `key`, expiring after `expire_after`
+            seconds if given.
+        """
+
+        self.statistics.increment('writes')
+        self._set(key, value, expire_after)
+
+    def delete(self, key):
+        self._delete(key)
+
+    def stats(self):
+        return self.statistics.as_dict()
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, expire_after):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryStore(Store):
+    """
+        A Store kept in the memory of this process, bounded to `max_entries`
+        with the least recently used entries removed first.
+    """
+
+    def __init__(self, name, max_entries=1024):
+        super(MemoryStore, self).__init__(name)
+
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+
+        with self._lock:
+
+            try:
+                value, expires = self._entries[key]
+            except KeyError:
+                return None
+
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def _set(self, key, value, expire_after):
+
+        expires = None if expire_after is None else time.time() + expire_after
+
+        with self._lock:
+
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore(Store):
+    """
+        A Store kept in a table of an SQLite database file. Each thread
+        keeps its own connection.
+
+        Expired entries are removed when they are read, and all at once by
+        the first write after every `purge_interval` seconds, so that
+        entries which are never read again do not accumulate.
+    """
+
+    def __init__(self, name, filename, timeout=30, purge_interval=60):
+        super(SQLiteStore, self).__init__(name)
+
+        self.filename = filename
+        self.timeout = timeout
+        self.purge_interval = purge_interval
+        self.table = "store_{}".format(name)
+
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._next_purge = time.time() + self.purge_interval
+
+        con = self._connection()
+        con.execute("create table if not exists `{}` "
+            "(key TEXT PRIMARY KEY, value BLOB, expires REAL)".format(self.table))
+        con.execute("create index if not exists `{0}_expires` on `{0}` (expires)".format(self.table))
+        con.commit()
+
+    def _connection(self):
+
+        con = getattr(self._local, 'connection', None)
+
+        if con is None:
+            con = sqlite3.connect(self.filename, timeout=self.timeout)
+            self._local.connection = con
+
+        return con
+
+    def _get(self, key):
+
+        row = self._connection().execute(
+            "select value, expires from `{}` where key=?".format(self.table), (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        value, expires = row
+
+        if expires is not None and expires < time.time():
+            self._delete(key)
+            return None
+
+        return bytes(value)
+
+    def _set(self, key, value, expire_after):
+
+        expires = None if expire_after is None else time.time() + expire_after
+
+        con = self._connection()
+
+        with con:
+            con.execute("insert or replace into `{}` (key, value, expires) values (?,?,?)".format(self.table),
+                (key, sqlite3.Binary(value), expires))
+
+            if self._purge_due():
+                purged = con.execute("delete from `{}` where expires < ?".format(self.table),
+                    (time.time(),)).rowcount
+                self.statistics.increment('expired entries purged', purged)
+
+    def _purge_due(self):
+
+        with self._purge_lock:
+
+            if time.time() < self._next_purge:
+                return False
+
+            self._next_purge = time.time() + self.purge_interval
+
+            return True
+
+    def _delete(self, key):
+
+        con = self._connection()
+
+        with con:
+            con.execute("delete from `{}` where key=?".format(self.table), (key,))
+
+
+class RedisStore(Store):
+    """
+        A Store kept in Redis under keys prefixed with `namespace` and the
+        store's name, letting Redis handle expiration.
+    """
+
+    def __init__(self, name, connection, namespace='mementoembed'):
+        super(RedisStore, self).__init__(name)
+
+        self.connection = connection
+        self.prefix = "{}:store:{}:".format(namespace, name)
+
+    def _get(self, key):
+        return self.connection.get(self.prefix + key)
+
+    def _set(self, key, value, expire_after):
+
+        if expire_after is None:
+            self.connection.set(self.prefix + key, value)
+        else:
+            self.connection.set(self.prefix + key, value, ex=max(int(expire_after), 1))
+
+    def _delete(self, key):
+        self.connection.delete(self.prefix + key)
+
+
+_store_factory = None
+_stores = {}
+_stores_lock = threading.Lock()
+
+def set_store_factory(factory):
+    """
+        Sets the function that creates a Store given its name, usually
+        SessionManager.get_store, so that stores use the configured cache
+        engine. Without a factory, get_store returns None and callers
+        compute results every time.
+    """
+
+    global _store_factory
+
+    with _stores_lock:
+        _store_factory = factory
+        _stores.clear()
+
+def get_store(name):
+    """
+        Returns the Store named `name`, or None if no store factory is set.
+    """
+
+    with _stores_lock:
+
+        if _store_factory is None:
+            return None
+
+        if name not in _stores:
+            _stores[name] = _store_factory(name)
+
+        return _stores[name]
+
+def stores_stats():
+
+    with _stores_lock:
+        return dict( (name, store.stats()) for name, store in _stores.items() )
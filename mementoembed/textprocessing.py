@@ -2,13 +2,14 @@ import re
 import logging
 import string
 
-from bs4 import BeautifulSoup
 from readability import Document
 from justext import justext, get_stoplist
-from summa.summarizer import _clean_text_by_sentences, _build_graph, \
-    _set_graph_edge_weights, _remove_unreachable_nodes, _pagerank, \
+from summa.summarizer import _clean_text_by_sentences, \
     _add_scores_to_sentences
 
+from .htmldocument import parse_html
+from .textrank import textrank_scores
+
 module_logger = logging.getLogger('mementoembed.textprocessing')
 
 p = re.compile(' +')
@@ -79,20 +80,13 @@ def get_sentence_scores_by_textrank(text):
     sentences = _clean_text_by_sentences(text, "english", None)
     # TODO: update the language so that it is automatically determined
 
-    # Creates the graph and calculates the similarity coefficient for every pair of nodes.
-    graph = _build_graph([sentence.token for sentence in sentences])
-    _set_graph_edge_weights(graph)
-
-    # Remove all nodes with all edges weights equal to zero.
-    _remove_unreachable_nodes(graph)
+    # Computes the similarity of every pair of sentences and ranks them
+    # using PageRank. Returns dict of sentence -> score
+    pagerank_scores = textrank_scores([sentence.token for sentence in sentences])
 
-    # PageRank cannot be run in an empty graph.
-    if len(graph.nodes()) == 0:
+    if len(pagerank_scores) == 0:
         return []
 
-    # Ranks the tokens using the PageRank algorithm. Returns dict of sentence -> score
-    pagerank_scores = _pagerank(graph)
-
     # Adds the summa scores to the sentence objects.
     _add_scores_to_sentences(sentences, pagerank_scores)
 
@@ -356,7 +350,7 @@ def get_best_description(htmlcontent):
 def extract_text_snippet(htmlcontent):
     
     try:
-        soup = BeautifulSoup(htmlcontent, 'html5lib')
+        document = parse_html(htmlcontent)
     except Exception as e:
         raise SnippetGenerationError(
             "failed to open document using BeautifulSoup",
@@ -367,7 +361,7 @@ def extract_text_snippet(htmlcontent):
     description_dict = {}
 
     try:
-        for metatag in soup.find_all("meta"):
+        for metatag in document.metatags:
 
             if metatag.get("property") == "og:description":
                 description_dict["og:description"] = metatag.get("content")
@@ -408,7 +402,7 @@ def extract_text_snippet(htmlcontent):
 
     # 3. use readability or justext
     if snippet is None:
-        snippet = get_best_description(htmlcontent)[0:197]
+        snippet = get_best_description(document.content)[0:197]
 
         print("SNIPPET: {}".format(snippet))
 
@@ -425,7 +419,7 @@ def extract_title(htmlcontent):
     module_logger.debug("attempting to extract title from input")
 
     try:
-        soup = BeautifulSoup(htmlcontent, 'html5lib')
+        document = parse_html(htmlcontent)
     except Exception as e:
         raise TitleExtractionError(
             "failed to open document using BeautifulSoup",
@@ -436,7 +430,7 @@ def extract_title(htmlcontent):
     titledict = {}
     
     try:
-        for metatag in soup.find_all("meta"):
+        for metatag in document.metatags:
 
             module_logger.debug("evaluating metatag {}".format(metatag))
 
@@ -480,9 +474,9 @@ def extract_title(htmlcontent):
     if title is None:
         # 3. extract the title from the title tag
 
-        try:
-            title = soup.title.text
-        except AttributeError:
+        title = document.title
+
+        if title is None:
             module_logger.warning("Could not extract title from input")
             title = ""
 
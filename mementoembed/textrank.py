@@ -0,0 +1,114 @@
+import logging
+
+import numpy as np
+
+from scipy.sparse import csr_matrix, diags
+
+module_logger = logging.getLogger('mementoembed.textrank')
+
+damping = 0.85
+convergence_threshold = 1e-10
+max_iterations = 1000
+
+def similarity_matrix(tokens):
+    """
+        Returns the sparse matrix of TextRank similarities between the
+        sentence tokens in `tokens`: the number of distinct words two
+        sentences share divided by the sum of the log10 of their lengths.
+
+        This is the similarity used by summa, computed for all pairs at once
+        from a sparse sentence-by-word incidence matrix.
+    """
+
+    vocabulary = {}
+    rows = []
+    cols = []
+    lengths = np.empty(len(tokens))
+
+    for i, token in enumerate(tokens):
+
+        words = token.split()
+        lengths[i] = len(words)
+
+        for word in set(words):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    incidence = csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(tokens), len(vocabulary))
+    )
+
+    common = (incidence @ incidence.T).tocoo()
+
+    with np.errstate(divide='ignore'):
+        loglengths = np.log10(lengths)
+
+    denominator = loglengths[common.row] + loglengths[common.col]
+
+    keep = (common.row != common.col) & (denominator != 0)
+
+    return csr_matrix(
+        (common.data[keep] / denominator[keep], (common.row[keep], common.col[keep])),
+        shape=(len(tokens), len(tokens))
+    )
+
+def pagerank(weights):
+    """
+        Returns the weighted PageRank of each node of the undirected graph
+        with the sparse adjacency matrix `weights`, computed by power
+        iteration and scaled to unit length like the eigenvector summa uses.
+    """
+
+    n = weights.shape[0]
+
+    outgoing = np.asarray(weights.sum(axis=1)).ravel()
+    transition = diags(1.0 / outgoing) @ weights
+
+    transition_t = transition.T.tocsr()
+
+    scores = np.full(n, 1.0 / n)
+
+    for iteration in range(max_iterations):
+
+        updated = damping * (transition_t @ scores) + (1 - damping) * scores.sum() / n
+
+        if np.abs(updated - scores).sum() < convergence_threshold:
+            scores = updated
+            break
+
+        scores = updated
+
+    module_logger.debug("PageRank finished after {} iterations".format(iteration + 1))
+
+    return scores / np.linalg.norm(scores)
+
+def textrank_scores(tokens):
+    """
+        Returns a dict mapping each distinct sentence token in `tokens` to
+        its TextRank score. Tokens similar to no other token are omitted,
+        as summa removes them from its graph.
+    """
+
+    # like summa, each distinct token is a single node
+    nodes = list(dict.fromkeys(tokens))
+
+    if len(nodes) == 0:
+        return {}
+
+    weights = similarity_matrix(nodes)
+
+    # if no sentences are similar, every sentence is linked to every other
+    if weights.nnz == 0:
+        weights = csr_matrix(np.ones((len(nodes), len(nodes))) - np.eye(len(nodes)))
+
+    reachable = np.flatnonzero(np.asarray(weights.sum(axis=1)).ravel())
+
+    if len(reachable) == 0:
+        return {}
+
+    weights = weights[reachable][:, reachable]
+
+    scores = pagerank(weights)
+
+    return dict( (nodes[node], float(score)) for node, score in zip(reachable, scores) )
@@ -0,0 +1,304 @@
+import os
+import atexit
+import pickle
+import sqlite3
+import logging
+import threading
+
+from collections.abc import MutableMapping
+
+from requests_cache.backends.base import BaseCache
+
+module_logger = logging.getLogger('mementoembed.walcache')
+
+# marks a pending deletion
+_deleted = object()
+
+class WALDict(MutableMapping):
+    """
+        A dictionary kept in table `table` of the SQLite database
+        `filename` in write-ahead logging (WAL) mode, so that readers in
+        every worker process do not wait for writers or each other.
+
+        Each thread keeps its own connection. Writes are queued and
+        committed together by a writer thread every `flush_interval`
+        seconds, or as soon as `batch_size` are queued, so that workers
+        take the write lock once per batch rather than once per response.
+        Queued writes are visible to readers in this process until they
+        are committed. Callbacks given to after_commit run once the writes
+        queued before them are committed.
+
+        The table has the same layout as the SQLite backend of
+        requests_cache, so an existing cache database can be opened as it
+        is. If `pickled` is True, values are pickled like those of its
+        responses table.
+    """
+
+    def __init__(self, filename, table, pickled=False, timeout=30,
+        batch_size=64, flush_interval=0.05, statistics=None):
+
+        self.filename = filename
+        self.table = table
+        self.pickled = pickled
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.statistics = statistics
+
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        self._callbacks = []
+
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._writer_pid = None
+
+        con = self._connection()
+        con.execute("pragma journal_mode=WAL")
+        con.execute("create table if not exists `{}` (key PRIMARY KEY, value)".format(self.table))
+
+        atexit.register(self.flush)
+
+    def _increment(self, name, amount=1):
+
+        if self.statistics is not None:
+            self.statistics.increment(name, amount)
+
+    def _connection(self):
+
+        con = getattr(self._local, 'connection', None)
+
+        # connections must not be shared with a forked worker
+        if con is None or self._local.pid != os.getpid():
+
+            con = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None)
+
+            # WAL is safe against corruption without syncing every commit
+            con.execute("pragma synchronous=NORMAL")
+
+            self._local.connection = con
+            self._local.pid = os.getpid()
+
+        return con
+
+    def _start_writer(self):
+
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+
+        with self._pending_lock:
+
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+
+            self._writer = threading.Thread(target=self._write_batches,
+                name="WALDict-{}".format(self.table), daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+
+    def _write_batches(self):
+
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                module_logger.exception("failed to write batch to {}".format(self.table))
+
+    def flush(self):
+        """
+            Commits the queued writes in one transaction.
+        """
+
+        with self._flush_lock:
+
+            with self._pending_lock:
+
+                if not self._pending and not self._callbacks:
+                    return
+
+                self._flushing = self._pending
+                self._pending = {}
+
+                callbacks = self._callbacks
+                self._callbacks = []
+
+            batch = self._flushing
+
+            writes = [ (k, v) for k, v in batch.items() if v is not _deleted ]
+            deletions = [ (k,) for k, v in batch.items() if v is _deleted ]
+
+            con = self._connection()
+
+            try:
+                con.execute("begin immediate")
+
+                con.executemany("insert or replace into `{}` (key, value) values (?,?)".format(
+                    self.table), writes)
+                con.executemany("delete from `{}` where key=?".format(self.table), deletions)
+
+                con.execute("commit")
+
+            except Exception:
+
+                if con.in_transaction:
+                    con.execute("rollback")
+
+                self._increment('sqlite batch failures')
+
+                # queued again behind any newer writes of the same keys
+                with self._pending_lock:
+                    batch.update(self._pending)
+                    self._pending = batch
+                    self._flushing = {}
+                    self._callbacks = callbacks + self._callbacks
+
+                raise
+
+            with self._pending_lock:
+                self._flushing = {}
+
+            self._increment('sqlite batches')
+            self._increment('sqlite batched writes', len(batch))
+
+        for callback in callbacks:
+
+            try:
+                callback()
+            except Exception:
+                module_logger.exception("failed to run callback after committing {}".format(self.table))
+
+    def after_commit(self, callback):
+        """
+            Calls `callback` once the writes queued so far are committed.
+        """
+
+        with self._pending_lock:
+            self._callbacks.append(callback)
+
+        self._start_writer()
+
+    def _queue(self, key, value):
+
+        with self._pending_lock:
+            self._pending[key] = value
+            full = len(self._pending) >= self.batch_size
+
+        self._start_writer()
+
+        if full:
+            self._wakeup.set()
+
+    def _queued(self, key):
+
+        with self._pending_lock:
+
+            if key in self._pending:
+                return self._pending[key]
+
+            return self._flushing.get(key)
+
+    def _load(self, value):
+
+        if self.pickled:
+            return pickle.loads(bytes(value))
+
+        return value
+
+    def __getitem__(self, key):
+
+        value = self._queued(key)
+
+        if value is None:
+
+            row = self._connection().execute(
+                "select value from `{}` where key=?".format(self.table), (key,)).fetchone()
+
+            if row is None:
+                raise KeyError(key)
+
+            value = row[0]
+
+        if value is _deleted:
+            raise KeyError(key)
+
+        return self._load(value)
+
+    def __setitem__(self, key, item):
+
+        if self.pickled:
+            item = sqlite3.Binary(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+
+        self._queue(key, item)
+
+    def __delitem__(self, key):
+
+        if key not in self:
+            raise KeyError(key)
+
+        self._queue(key, _deleted)
+
+    def __contains__(self, key):
+
+        value = self._queued(key)
+
+        if value is not None:
+            return value is not _deleted
+
+        return self._connection().execute(
+            "select 1 from `{}` where key=?".format(self.table), (key,)).fetchone() is not None
+
+    def __iter__(self):
+
+        self.flush()
+
+        for row in self._connection().execute("select key from `{}`".format(self.table)).fetchall():
+            yield row[0]
+
+    def __len__(self):
+
+        self.flush()
+
+        return self._connection().execute(
+            "select count(key) from `{}`".format(self.table)).fetchone()[0]
+
+    def clear(self):
+
+        self.flush()
+
+        con = self._connection()
+        con.execute("delete from `{}`".format(self.table))
+
+
+class WALCache(BaseCache):
+    """
+        A requests_cache backend kept in the SQLite database
+        `location` + `extension` in WAL mode, using WALDict for its
+        responses and the keys of redirected requests.
+    """
+
+    def __init__(self, location='cache', extension='.sqlite', timeout=30,
+        statistics=None, **options):
+
+        super(WALCache, self).__init__(**options)
+
+        filename = location + extension
+
+        self.responses = WALDict(filename, 'responses', pickled=True,
+            timeout=timeout, statistics=statistics)
+        self.keys_map = WALDict(filename, 'urls',
+            timeout=timeout, statistics=statistics)
+
+    def flush(self):
+        """
+            Commits the queued writes so that other worker processes can
+            read them.
+        """
+
+        self.responses.flush()
+        self.keys_map.flush()
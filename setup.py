@@ -49,6 +49,7 @@ setup(
         'requests',
         'requests_cache',
         'requests-futures',
+        'scipy',
         'sphinx',
         'summa',
         'tldextract',
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mementoembed.bodystore import MemoryBodyStore, FileBodyStore, body_digest
+from mementoembed.sessions import PoolStatistics
+
+class TestBodyStore(unittest.TestCase):
+
+    def check_references(self, store):
+
+        body = b'an archive banner image' * 20
+        digest = body_digest(body)
+
+        store.add(digest, body)
+        store.add(digest, body)
+
+        self.assertEqual(store.get(digest), body)
+        self.assertEqual(store.statistics.as_dict()['bodies stored'], 1)
+        self.assertEqual(store.statistics.as_dict()['bodies deduplicated'], 1)
+
+        # kept while any entry refers to it
+        store.release(digest)
+        self.assertEqual(store.get(digest), body)
+
+        store.release(digest)
+        self.assertIsNone(store.get(digest))
+        self.assertEqual(store.statistics.as_dict()['bodies deleted'], 1)
+
+        # releasing a missing body does nothing
+        store.release(digest)
+        self.assertIsNone(store.get(body_digest(b'other')))
+
+    def test_memory_body_store(self):
+
+        self.check_references(MemoryBodyStore(statistics=PoolStatistics()))
+
+    def test_file_body_store(self):
+
+        folder = tempfile.mkdtemp()
+
+        try:
+            store = FileBodyStore(os.path.join(folder, "bodies"),
+                os.path.join(folder, "cache.sqlite"), statistics=PoolStatistics())
+
+            self.check_references(store)
+
+            first = b'first body' * 10
+            second = b'second body' * 10
+
+            store.add(body_digest(first), first)
+            store.add(body_digest(second), second)
+            store.add(body_digest(second), second)
+
+            self.assertEqual(store.get(body_digest(first)), first)
+            self.assertEqual(store.get(body_digest(second)), second)
+
+            # no temporary files are left behind, written or not
+            for dirpath, dirnames, filenames in os.walk(store.folder):
+                self.assertEqual([ f for f in filenames if f.endswith('.partial') ], [])
+
+            store.release(body_digest(second))
+            store.release(body_digest(second))
+            self.assertFalse(os.path.exists(store._path(body_digest(second))))
+
+            # another process sees the same bodies and counts
+            other = FileBodyStore(os.path.join(folder, "bodies"),
+                os.path.join(folder, "cache.sqlite"))
+
+            other.add(body_digest(first), first)
+            store.release(body_digest(first))
+            self.assertEqual(store.get(body_digest(first)), first)
+
+            store.clear()
+            self.assertIsNone(other.get(body_digest(first)))
+            self.assertEqual(os.listdir(store.folder), [])
+
+            # and bodies can be stored again afterwards
+            store.add(body_digest(first), first)
+            self.assertEqual(other.get(body_digest(first)), first)
+
+        finally:
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+from mementoembed.browserpool import BrowserPool, BrowserPoolError, \
+    BrowserPoolTimeout, BrowserCrashed
+
+# stands in for create_screenshot.js --serve, writing the process ID
+# instead of a screenshot
+fake_browser_script = """
+import os, sys, json, time
+
+for line in sys.stdin:
+    job = json.loads(line)
+
+    if job['urim'] == 'crash':
+        sys.exit(1)
+    elif job['urim'] == 'hang':
+        time.sleep(60)
+    elif job['urim'] == 'garble':
+        print("{not json", flush=True)
+    elif job['urim'] == 'fail':
+        print(json.dumps({'id': job['id'], 'status': 'error', 'message': 'failed'}), flush=True)
+    else:
+        with open(job['output_file'], 'w') as f:
+            f.write(str(os.getpid()))
+        print(json.dumps({'id': job['id'], 'status': 'ok'}), flush=True)
+"""
+
+class TestBrowserPool(unittest.TestCase):
+
+    def setUp(self):
+
+        self.working_directory = tempfile.mkdtemp()
+
+        script = "{}/fake_browser.py".format(self.working_directory)
+
+        with open(script, 'w') as f:
+            f.write(fake_browser_script)
+
+        self.command = [ sys.executable, script ]
+
+    def tearDown(self):
+        shutil.rmtree(self.working_directory)
+
+    def capture(self, pool, urim, timeout=30):
+
+        output_file = "{}/output.txt".format(self.working_directory)
+
+        pool.capture(urim, output_file, 1024, 768, "test agent", timeout)
+
+        with open(output_file) as f:
+            return f.read()
+
+    def test_browsers_are_reused_and_recycled(self):
+
+        pool = BrowserPool(self.command, size=1, recycle_after=3)
+
+        try:
+            pids = [ self.capture(pool, "http://example.com/{}".format(i)) for i in range(4) ]
+
+            # the same browser captures 3 pages, then a new one is started
+            self.assertEqual(len(set(pids[0:3])), 1)
+            self.assertNotEqual(pids[2], pids[3])
+
+            stats = pool.stats()
+            self.assertEqual(stats['captures'], 4)
+            self.assertEqual(stats['browser starts'], 2)
+            self.assertEqual(stats['recycled browsers'], 1)
+
+        finally:
+            pool.shutdown()
+
+    def test_browser_failures(self):
+
+        pool = BrowserPool(self.command, size=1, recycle_after=50)
+
+        try:
+            first = self.capture(pool, "http://example.com/")
+
+            # a failed capture keeps the browser
+            with self.assertRaises(BrowserPoolError):
+                self.capture(pool, "fail")
+
+            self.assertEqual(self.capture(pool, "http://example.com/"), first)
+
+            # a crashed or hung browser is replaced
+            with self.assertRaises(BrowserCrashed):
+                self.capture(pool, "crash")
+
+            second = self.capture(pool, "http://example.com/")
+            self.assertNotEqual(second, first)
+
+            with self.assertRaises(BrowserPoolTimeout):
+                self.capture(pool, "hang", timeout=1)
+
+            third = self.capture(pool, "http://example.com/")
+            self.assertNotEqual(third, second)
+
+            # so is one whose reply cannot be read
+            with self.assertRaises(BrowserCrashed):
+                self.capture(pool, "garble")
+
+            self.assertNotEqual(self.capture(pool, "http://example.com/"), third)
+
+            stats = pool.stats()
+            self.assertEqual(stats['crashed browsers'], 2)
+            self.assertEqual(stats['timed out captures'], 1)
+            self.assertEqual(stats['browser starts'], 4)
+
+        finally:
+            pool.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+
+from datetime import datetime
+
+import requests
+
+from requests_cache.backends.base import BaseCache
+
+from mementoembed.bodystore import MemoryBodyStore
+from mementoembed.cacheserialization import CompactCache, CacheSerializationError, \
+    dumps_response, loads_response, body_raw, body_brotli, body_reference, serialization_magic
+from mementoembed.sessions import PoolStatistics
+
+html = b"<html><head><title>A Memento</title></head><body>" + \
+    b"<p>The web archive preserves mementos of web pages.</p>" * 200 + b"</body></html>"
+
+def make_response(url, content, content_type="text/html; charset=utf-8", history=[]):
+
+    request = requests.Request('GET', url, headers={'User-Agent': 'test agent'}).prepare()
+
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.reason = 'OK'
+    response.encoding = 'utf-8'
+    response.request = request
+    response.headers['Content-Type'] = content_type
+    response.headers['Memento-Datetime'] = "Fri, 22 Jun 2018 21:16:36 GMT"
+    response.headers['Connection'] = 'keep-alive'
+    response._content = content
+    response.history = history
+
+    return response
+
+def codec(value):
+    return value[len(serialization_magic)]
+
+class TestCacheSerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        redirect = make_response("http://myarchive.org/memento/2018/http://example.com/", b'')
+        redirect.status_code = 302
+
+        timestamp = datetime(2018, 6, 22, 21, 16, 36, 500)
+
+        value = dumps_response(make_response(urim, html, history=[ redirect ]), timestamp)
+
+        self.assertEqual(codec(value), body_brotli)
+        self.assertLess(len(value), len(html) / 10)
+
+        response, restored_timestamp = loads_response(value)
+
+        self.assertEqual(restored_timestamp, timestamp)
+        self.assertEqual(response.content, html)
+        self.assertEqual(response.text, html.decode('utf-8'))
+        self.assertEqual(list(response.iter_content(4096))[0], html[:4096])
+        self.assertEqual(response.url, urim)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['memento-datetime'], "Fri, 22 Jun 2018 21:16:36 GMT")
+        self.assertNotIn('connection', response.headers)
+        self.assertEqual(response.request.headers['user-agent'], 'test agent')
+        self.assertEqual(response.history[0].status_code, 302)
+        self.assertEqual(response.history[0].request.url, redirect.url)
+
+        # already compressed bodies are stored as they are
+        image = make_response(urim + "image.png", b'\x89PNG' + bytes(range(256)) * 4, "image/png")
+        self.assertEqual(codec(dumps_response(image, timestamp)), body_raw)
+        self.assertEqual(loads_response(dumps_response(image, timestamp))[0].content, image.content)
+
+        self.assertRaises(CacheSerializationError, loads_response, b'not a response')
+
+    def test_migration(self):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        backend = BaseCache()
+        request = make_response(urim, html).request
+        key = backend.create_key(request)
+
+        # as written by earlier versions
+        backend.save_response(key, make_response(urim, html))
+        backend.save_response("other", make_response(urim + "other", html))
+        self.assertIsInstance(backend.responses[key], tuple)
+
+        cache = CompactCache(backend)
+
+        response, timestamp = cache.get_response_and_time(key)
+        self.assertEqual(response.content, html)
+        self.assertIsInstance(backend.responses[key], bytes)
+
+        self.assertEqual(cache.migrate(), 1)
+        self.assertIsInstance(backend.responses["other"], bytes)
+        self.assertEqual(cache.migrate(), 0)
+
+        cache.save_response(key, make_response(urim, b'changed'))
+        self.assertEqual(cache.get_response_and_time(key)[0].content, b'changed')
+
+        cache.delete_url(urim)
+        self.assertFalse(cache.has_key(key))
+        self.assertEqual(cache.get_response_and_time(key), (None, None))
+
+    def test_shared_bodies(self):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+        raw_urim = "http://myarchive.org/memento/20180622211636id_/http://example.com/"
+
+        backend = BaseCache()
+        body_store = MemoryBodyStore(statistics=PoolStatistics())
+
+        # an entry written before bodies were shared
+        backend.responses["inline"] = dumps_response(make_response(urim + "inline", html), datetime.utcnow())
+
+        cache = CompactCache(backend, body_store=body_store)
+
+        cache.save_response("plain", make_response(urim, html))
+        cache.save_response("raw", make_response(raw_urim, html))
+
+        self.assertEqual(codec(backend.responses["plain"]), body_reference)
+        self.assertEqual(len(body_store._bodies), 1)
+        self.assertEqual(body_store.statistics.as_dict()['bodies deduplicated'], 1)
+
+        self.assertEqual(cache.get_response_and_time("raw")[0].content, html)
+        self.assertEqual(cache.get_response_and_time("inline")[0].content, html)
+
+        self.assertEqual(cache.migrate(), 1)
+        self.assertEqual(codec(backend.responses["inline"]), body_reference)
+        self.assertEqual(list(body_store._bodies.values())[0][1], 3)
+
+        # replacing or deleting an entry releases its body
+        cache.save_response("inline", make_response(urim + "inline", b'changed' * 100))
+        cache.delete("plain")
+        self.assertEqual(list(body_store._bodies.values())[0][1], 1)
+        self.assertEqual(len(body_store._bodies), 2)
+
+        cache.delete("raw")
+        self.assertEqual(len(body_store._bodies), 1)
+
+        # an entry whose body is gone is fetched again, but is left for
+        # the new response to replace rather than released twice
+        body_store._bodies.clear()
+        body_store.release = None
+        self.assertEqual(cache.get_response_and_time("inline"), (None, None))
+        self.assertTrue(cache.has_key("inline"))
+        del body_store.release
+
+        # clearing the cache leaves no bodies behind
+        cache.save_response("plain", make_response(urim, html))
+        cache.clear()
+        self.assertEqual(len(backend.responses), 0)
+        self.assertEqual(len(body_store._bodies), 0)
+
+    def test_bodies_released_after_commit(self):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        class batched_responses(dict):
+
+            def __init__(self):
+                self.callbacks = []
+
+            def after_commit(self, callback):
+                self.callbacks.append(callback)
+
+        backend = BaseCache()
+        backend.responses = batched_responses()
+        body_store = MemoryBodyStore()
+
+        cache = CompactCache(backend, body_store=body_store)
+
+        cache.save_response("key", make_response(urim, html))
+        cache.save_response("key", make_response(urim, b'changed' * 100))
+
+        # the old body outlives the entry until the new one is committed
+        self.assertEqual(len(body_store._bodies), 2)
+
+        for callback in backend.responses.callbacks:
+            callback()
+
+        self.assertEqual(len(body_store._bodies), 1)
+        self.assertEqual(cache.get_response_and_time("key")[0].content, b'changed' * 100)
+
+if __name__ == '__main__':
+    unittest.main()
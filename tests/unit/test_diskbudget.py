@@ -0,0 +1,99 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from mementoembed.diskbudget import DiskBudget, set_disk_budget, artifact_written, \
+    artifact_accessed
+
+class TestDiskBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.working_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working_directory)
+
+    def write(self, name, size, mtime):
+
+        path = "{}/{}".format(self.working_directory, name)
+
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+
+        os.utime(path, (mtime, mtime))
+
+        return path
+
+    def remaining(self):
+        return sorted(os.listdir(self.working_directory))
+
+    def test_enforce_max_files(self):
+
+        for i in range(5):
+            self.write("{}.png".format(i), 10, 1000 + i)
+
+        # files being written are neither counted nor evicted
+        self.write("capture-abc.png", 10, time.time())
+        self.write("thumbnail-abc.png.partial", 10, time.time())
+
+        # but those left by a worker that stopped are removed
+        self.write("capture-old.png", 10, 0)
+        self.write("thumbnail-old.png.partial", 10, 0)
+
+        budget = DiskBudget(self.working_directory, max_files=3)
+        self.assertEqual(budget.stats()['files'], 5)
+
+        budget.enforce()
+
+        self.assertEqual(self.remaining(),
+            ["2.png", "3.png", "4.png", "capture-abc.png", "thumbnail-abc.png.partial"])
+        self.assertEqual(budget.stats()['evicted files'], 2)
+        self.assertEqual(budget.stats()['stale files removed'], 2)
+        self.assertEqual(budget.stats()['files'], 3)
+
+    def test_counts_follow_the_folder(self):
+
+        budget = DiskBudget(self.working_directory, max_files=2)
+
+        # writes within the budget add to the totals without a scan
+        path = self.write("first.png", 10, 1000)
+        budget.written(path)
+        budget.written(self.write("first.png", 20, 1001))
+
+        self.assertEqual(budget.stats()['scans'], 1)
+        self.assertEqual(budget.stats()['files'], 2)
+
+        # measuring the folder corrects a replaced artifact counted twice
+        budget.enforce()
+
+        self.assertEqual(budget.stats()['files'], 1)
+        self.assertEqual(budget.stats()['bytes'], 20)
+
+        # and an artifact another worker removed
+        os.unlink(path)
+        budget.written(self.write("second.png", 10, 1002))
+        budget.written(self.write("third.png", 10, 1003))
+
+        self.assertEqual(budget.stats()['scans'], 3)
+        self.assertEqual(budget.stats()['files'], 2)
+        self.assertEqual(self.remaining(), ["second.png", "third.png"])
+        self.assertNotIn('evictions on write', budget.stats())
+
+    def test_evict_least_recently_used_on_write(self):
+
+        first = self.write("first.gif", 40, 1000)
+        self.write("second.gif", 40, 1001)
+
+        set_disk_budget(self.working_directory, 100, 0)
+
+        # reading the first artifact makes the second the least recently used
+        artifact_accessed(first)
+
+        artifact_written(self.write("third.gif", 40, 2000))
+
+        self.assertEqual(self.remaining(), ["first.gif", "third.gif"])
+
+if __name__ == '__main__':
+    unittest.main()
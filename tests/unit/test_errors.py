@@ -0,0 +1,123 @@
+import json
+import unittest
+
+from unittest.mock import patch
+
+from flask import Flask
+
+from mementoembed.mementoresource import MementoTimeoutError, MementoURINotAtArchiveFailure, \
+    MementoContentError, MementoDeadlineError
+from mementoembed.services.errors import handle_errors
+from mementoembed.stores import MemoryStore, set_store_factory
+
+class mock_response:
+    headers = { 'content-type': 'text/html' }
+    status_code = 503
+    url = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+class TestNegativeCache(unittest.TestCase):
+
+    def setUp(self):
+        set_store_factory(MemoryStore)
+
+        self.app = Flask(__name__)
+        self.app.config['NEGATIVE_CACHE_EXPIRATION'] = 300
+
+    def tearDown(self):
+        set_store_factory(None)
+
+    @patch('mementoembed.services.errors.attempt_cache_deletion')
+    def test_failures_are_remembered(self, deletion):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        calls = []
+
+        def unavailable(urim, prefs):
+            calls.append(urim)
+            raise MementoURINotAtArchiveFailure("archive failed", mock_response())
+
+        with self.app.test_request_context():
+
+            response, status = handle_errors(unavailable, urim, {})
+            self.assertEqual(status, 502)
+
+            repeated, repeated_status = handle_errors(unavailable, urim, {})
+            self.assertEqual(repeated_status, 502)
+            self.assertEqual(repeated.get_data(), response.get_data())
+            self.assertEqual(repeated.headers['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(repeated.get_data(as_text=True))['response status'], 503)
+
+            # the archive is only asked once
+            self.assertEqual(len(calls), 1)
+
+            # timeouts are remembered per URI-M
+            def timeout(urim, prefs):
+                calls.append(urim)
+                raise MementoTimeoutError("timed out")
+
+            other = urim + "other"
+
+            self.assertEqual(handle_errors(timeout, other, {})[1], 504)
+            self.assertEqual(handle_errors(timeout, other, {})[1], 504)
+            self.assertEqual(len(calls), 2)
+
+    @patch('mementoembed.services.errors.attempt_cache_deletion')
+    def test_other_failures_are_retried(self, deletion):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        calls = []
+
+        def broken(urim, prefs):
+            calls.append(urim)
+            raise MementoContentError("could not process")
+
+        with self.app.test_request_context():
+
+            self.assertEqual(handle_errors(broken, urim, {})[1], 500)
+            self.assertEqual(handle_errors(broken, urim, {})[1], 500)
+            self.assertEqual(len(calls), 2)
+
+    @patch('mementoembed.services.errors.attempt_cache_deletion')
+    def test_missed_deadlines_are_retried(self, deletion):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        calls = []
+
+        def late(urim, prefs):
+            calls.append(urim)
+            raise MementoDeadlineError("not ready")
+
+        with self.app.test_request_context():
+
+            self.assertEqual(handle_errors(late, urim, {})[1], 504)
+            self.assertEqual(handle_errors(late, urim, {})[1], 504)
+
+        # neither remembered nor removed from the cache
+        self.assertEqual(len(calls), 2)
+        deletion.assert_not_called()
+
+    @patch('mementoembed.services.errors.attempt_cache_deletion')
+    def test_disabled(self, deletion):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        self.app.config['NEGATIVE_CACHE_EXPIRATION'] = 0
+
+        calls = []
+
+        def timeout(urim, prefs):
+            calls.append(urim)
+            raise MementoTimeoutError("timed out")
+
+        with self.app.test_request_context():
+
+            handle_errors(timeout, urim, {})
+            handle_errors(timeout, urim, {})
+
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import unittest
+import multiprocessing
+
+from mementoembed.executors import ScoringExecutor, run_in_thread
+
+def exit_if_in_pool():
+
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+
+    return "scored in thread"
+
+class TestExecutors(unittest.TestCase):
+
+    def test_run_in_thread(self):
+
+        self.assertEqual(run_in_thread(pow, 2, 10).result(), 1024)
+        self.assertIsInstance(run_in_thread(int, "cheese").exception(), ValueError)
+
+    def test_scoring_executor_without_pool(self):
+
+        executor = ScoringExecutor(0)
+
+        self.assertEqual(executor.submit(pow, 2, 10).result(), 1024)
+        self.assertEqual(executor.stats(), {'run in thread': 1, 'processes': 0})
+
+    def test_scoring_executor_pool(self):
+
+        executor = ScoringExecutor(1)
+
+        try:
+            self.assertEqual(executor.submit(pow, 2, 10).result(timeout=60), 1024)
+            self.assertIsInstance(executor.submit(int, "cheese").exception(timeout=60), ValueError)
+
+            # the pool breaks, so the work is done in this thread instead
+            self.assertEqual(executor.submit(exit_if_in_pool).result(timeout=60), "scored in thread")
+            self.assertEqual(executor.stats()['broken pools'], 1)
+
+            # and a new pool is started for later work
+            self.assertEqual(executor.submit(pow, 3, 2).result(timeout=60), 9)
+        finally:
+            executor.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
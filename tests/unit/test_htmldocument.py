@@ -0,0 +1,90 @@
+import os
+import unittest
+
+from unittest.mock import patch
+
+from mementoembed import htmldocument
+from mementoembed.htmldocument import HTMLDocument, parse_html, html_content
+from mementoembed.textprocessing import extract_title, extract_text_snippet
+from mementoembed.pagedata import parse_page_metadata
+from mementoembed.favicon import get_favicon_from_html
+
+class TestHTMLDocument(unittest.TestCase):
+
+    def test_document_elements(self):
+
+        htmlcontent = """<html>
+        <head>
+            <title>Is this a good title?</title>
+            <meta property="og:title" content="A better title">
+            <link rel="icon" href="/favicon.ico">
+        </head>
+        <body>
+            <p>some text</p>
+            <img src="image1.png">
+            <img src="image2.png">
+        </body>
+        </html>"""
+
+        document = parse_html(htmlcontent)
+
+        self.assertEqual(document.title, "Is this a good title?")
+        self.assertEqual(len(document.images), 2)
+        self.assertEqual(len(document.links), 1)
+        self.assertEqual(document.frames, [])
+        self.assertEqual(document.metadata, [{'property': 'og:title', 'content': 'A better title'}])
+
+        # elements are discovered once
+        self.assertIs(document.images, document.images)
+
+        self.assertEqual(html_content(document), htmlcontent)
+        self.assertEqual(html_content(htmlcontent), htmlcontent)
+
+    def test_document_without_title(self):
+
+        document = HTMLDocument("<html><body><p>no title here</p></body></html>")
+
+        self.assertIsNone(document.title)
+        self.assertEqual(extract_title(document), "")
+
+    def test_parse_html_shares_documents(self):
+
+        sample_file = "{}/samples/htmltext.html".format(
+            os.path.dirname(os.path.realpath(__file__))
+        )
+
+        with open(sample_file) as f:
+            htmltext = f.read()
+
+        document = parse_html(htmltext)
+
+        self.assertIs(parse_html(htmltext), document)
+        self.assertIs(parse_html(document), document)
+        self.assertIsNot(parse_html(htmltext + " "), document)
+
+        # extractors give the same results for the text and the document
+        self.assertEqual(extract_title(htmltext), extract_title(document))
+        self.assertEqual(extract_text_snippet(htmltext), extract_text_snippet(document))
+        self.assertEqual(parse_page_metadata(htmltext), parse_page_metadata(document))
+        self.assertEqual(get_favicon_from_html(htmltext), get_favicon_from_html(document))
+
+    @patch.object(htmldocument, 'document_cache_max_bytes', 80)
+    def test_parse_html_bounded_by_size(self):
+
+        small = "<html><head><title>{}</title></head></html>"
+
+        first = parse_html(small.format("first"))
+        second = parse_html(small.format("second"))
+
+        # the oldest document is dropped to stay within the bytes
+        self.assertIs(parse_html(small.format("second")), second)
+        self.assertIsNot(parse_html(small.format("first")), first)
+
+        # a document larger than the bound is never kept
+        large = small.format("x" * 200)
+
+        self.assertIsNot(parse_html(large), parse_html(large))
+        self.assertLessEqual(htmldocument._document_cache_bytes, 80)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import zipfile
+import unittest
+
+from mementoembed.htmldocument import HTMLDocument, create_soup, \
+    set_html_parser, supported_html_parsers, HTMLParserConfigurationError
+from mementoembed.textprocessing import extract_title, extract_text_snippet
+from mementoembed.pagedata import parse_page_metadata
+from mementoembed.favicon import get_favicon_from_html
+
+sampledir = "{}/samples".format(
+    os.path.dirname(os.path.realpath(__file__))
+)
+
+def load_corpus():
+
+    corpus = {}
+
+    for filename in [ "htmltext.html", "archive.is-1.html" ]:
+        with open("{}/{}".format(sampledir, filename), encoding='utf8') as f:
+            corpus[filename] = f.read()
+
+    with zipfile.ZipFile("{}/archive.is-1.raw.zip".format(sampledir)) as z:
+        corpus["archive.is-1.raw.zip:index.html"] = z.read("index.html").decode('utf8', 'replace')
+
+    with zipfile.ZipFile("{}/ac5728.zip".format(sampledir)) as z:
+        for name in [ "5728/pages/1.html", "5728/pages/2.html" ]:
+            corpus["ac5728.zip:{}".format(name)] = z.read(name).decode('utf8', 'replace')
+
+    return corpus
+
+def available_parsers():
+
+    parsers = []
+
+    for parser in supported_html_parsers:
+        try:
+            create_soup("<html></html>", parser)
+            parsers.append(parser)
+        except Exception:
+            pass
+
+    return parsers
+
+def extract_all(content, parser):
+
+    document = HTMLDocument(content, parser)
+
+    return {
+        'title': extract_title(document),
+        'snippet': extract_text_snippet(document),
+        'page-metadata': parse_page_metadata(document),
+        'favicon': get_favicon_from_html(document),
+        'images': [ (img.get('src'), img.get('srcset')) for img in document.images ],
+        'frames': [ frame.get('src') for frame in document.frames ],
+        'iframes': [ iframe.get('src') for iframe in document.find_all('iframe') ]
+    }
+
+class TestHTMLParsers(unittest.TestCase):
+
+    def test_parsers_agree_with_html5lib(self):
+
+        corpus = load_corpus()
+
+        for name, content in corpus.items():
+
+            expected = extract_all(content, 'html5lib')
+
+            for parser in available_parsers():
+
+                if parser == 'html5lib':
+                    continue
+
+                with self.subTest(sample=name, parser=parser):
+                    self.assertEqual(extract_all(content, parser), expected)
+
+    def test_set_html_parser(self):
+
+        self.assertRaises(HTMLParserConfigurationError, set_html_parser, 'selectolax')
+
+        try:
+            set_html_parser('lxml')
+            self.assertEqual(
+                HTMLDocument("<html><head><title>test</title></head></html>").soup.builder.NAME,
+                'lxml')
+        finally:
+            set_html_parser('html5lib')
+
+if __name__ == '__main__':
+    unittest.main()
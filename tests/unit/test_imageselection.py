@@ -1,7 +1,17 @@
 import os
+import time
 import unittest
+import threading
 
-from mementoembed.imageselection import get_image_list, score_image, get_best_image
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from mementoembed.imageselection import get_image_list, score_image, get_best_image, \
+    generate_images_and_scores, probe_image, probe_prune_reason, scores_for_image, \
+    score_image_features, cached_image_features, download_images, \
+    image_features_store, image_features_key, image_features_expiration, \
+    image_probes_store, image_probe_key, image_probes_expiration
+from mementoembed.executors import ScoringExecutor
+from mementoembed.stores import MemoryStore, set_store_factory, get_store
 
 class TestImageSelection(unittest.TestCase):
 
@@ -95,6 +105,40 @@ class TestImageSelection(unittest.TestCase):
 
         self.assertEqual(max_score_image, "serbia.184.1.jpg")
 
+    def test_cached_image_features(self):
+
+        imagefile = "{}/samples/images/serbia.184.1.jpg".format(
+            os.path.dirname(os.path.realpath(__file__)))
+
+        with open(imagefile, 'rb') as f:
+            imagedata = f.read()
+
+        executor = ScoringExecutor(0)
+
+        try:
+            set_store_factory(MemoryStore)
+
+            first = cached_image_features(imagedata, executor).result()
+            second = cached_image_features(imagedata, executor).result()
+
+            # the second request is answered from the store
+            self.assertEqual(executor.stats()['run in thread'], 1)
+            self.assertEqual(first, second)
+
+            # features expire from the store rather than being kept for ever
+            value, expires = get_store(image_features_store)._entries[image_features_key(imagedata)]
+            self.assertAlmostEqual(expires, time.time() + image_features_expiration, delta=60)
+
+            # only the position-dependent term differs between pages
+            self.assertEqual(score_image_features(second, 3, 10), scores_for_image(imagedata, 3, 10))
+            self.assertNotEqual(
+                score_image_features(second, 3, 10)['calculated score'],
+                score_image_features(second, 0, 10)['calculated score']
+            )
+
+        finally:
+            set_store_factory(None)
+
     def test_best_image(self):
         expected_imagelist = [
             "http://example.com/images/image1.test", # absolute uri, same domain
@@ -174,28 +218,16 @@ class TestImageSelection(unittest.TestCase):
                     self.uri_to_headers[uri]
                     )
 
-        class mock_future:
-
-            def __init__(self, uri, httpcache):
-                self.uri = uri
-                self.httpcache = httpcache
-
-            def done(self):
-                return True
-
-            def result(self):
-                return self.httpcache.get(self.uri)
-
-            def cancel(self):
-                pass
-
         class mock_futuressession:
 
             def __init__(self, httpcache):
                 self.httpcache = httpcache
+                self.executor = ThreadPoolExecutor(max_workers=2)
 
             def get(self, uri):
-                return mock_future(uri, self.httpcache)
+                future = Future()
+                future.set_result(self.httpcache.get(uri))
+                return future
 
         mh = mock_httpcache()
         uri = "http://example.com/example.html"
@@ -205,3 +237,212 @@ class TestImageSelection(unittest.TestCase):
             "http://example.com/images/image2.test"
             )
 
+    def test_generate_images_and_scores_timeout(self):
+
+        htmlcontent = """<html>
+        <head>
+            <title>Is this a good title?</title>
+        </head>
+        <body>
+            <img src="/images/slow.test">
+            <img src="/images/image2.test">
+        </body>
+        </html>"""
+
+        imagedir = "{}/samples/images".format(
+            os.path.dirname(os.path.realpath(__file__))
+        )
+
+        with open("{}/serbia.184.1.jpg".format(imagedir), 'rb') as f:
+            imagedata = f.read()
+
+        class mock_Response:
+
+            def __init__(self, content, headers):
+                self.content = content
+                self.text = content
+                self.headers = headers
+                self.status_code = 200
+
+        class mock_httpcache:
+
+            timeout = 0
+
+            def get(self, uri):
+                return mock_Response(htmlcontent, {'content-type': 'text/html'})
+
+        class mock_futuressession:
+
+            executor = ThreadPoolExecutor(max_workers=2)
+
+            def get(self, uri):
+                future = Future()
+
+                # the slow image never arrives
+                if uri == "http://example.com/images/image2.test":
+                    future.set_result(mock_Response(imagedata,
+                        {'content-type': 'image/jpeg', 'memento-datetime': 'cheese'}))
+
+                return future
+
+        contents = {}
+
+        images_and_scores = generate_images_and_scores(
+            "http://example.com/example.html", mock_httpcache(),
+            futuressession=mock_futuressession(), probe=False, contents=contents)
+
+        slow = images_and_scores["http://example.com/images/slow.test"]
+        fast = images_and_scores["http://example.com/images/image2.test"]
+
+        self.assertEqual(slow['source'], 'body')
+        self.assertIn("within 0 seconds", slow['error'])
+
+        self.assertNotIn('error', fast)
+        self.assertTrue(fast['is-a-memento'])
+        self.assertEqual(fast['content-type'], 'image/jpeg')
+        self.assertEqual(fast['N'], 2)
+        self.assertEqual(fast['n'], 1)
+
+        self.assertEqual(contents, { "http://example.com/images/image2.test": imagedata })
+
+    def test_download_images(self):
+
+        release = threading.Event()
+
+        class mock_Response:
+
+            def __init__(self, content, status_code=200):
+                self.content = content
+                self.status_code = status_code
+
+        class mock_httpcache:
+
+            timeout = 0.5
+
+            def __init__(self):
+                self.requested = []
+
+            def get(self, uri, use_referrer=True):
+
+                self.requested.append(uri)
+
+                if uri.endswith('slow'):
+                    release.wait(10)
+                elif uri.endswith('missing'):
+                    return mock_Response(b'', 404)
+                elif uri.endswith('broken'):
+                    raise Exception("connection reset")
+
+                return mock_Response(uri.encode('utf8'))
+
+        uris = [ "http://example.com/{}".format(name) for name in
+            [ "scored", "slow", "missing", "first", "broken", "second", "third" ] ]
+
+        httpcache = mock_httpcache()
+        executor = ThreadPoolExecutor(max_workers=4)
+
+        try:
+            images = download_images(uris, httpcache, limit=3,
+                contents={ uris[0]: b'already downloaded' },
+                executor=executor, timeout=httpcache.timeout)
+        finally:
+            release.set()
+            executor.shutdown()
+
+        # failed images are replaced by the next ones, in order
+        self.assertEqual(images, [
+            (uris[0], b'already downloaded'),
+            (uris[3], uris[3].encode('utf8')),
+            (uris[5], uris[5].encode('utf8'))
+        ])
+
+        self.assertNotIn(uris[0], httpcache.requested)
+        self.assertNotIn(uris[6], httpcache.requested)
+
+        # without an executor, images download in the calling thread
+        images = download_images(uris[2:4], mock_httpcache())
+        self.assertEqual(images, [ (uris[3], uris[3].encode('utf8')) ])
+
+    def test_probe_image(self):
+
+        imagedir = "{}/samples/images".format(
+            os.path.dirname(os.path.realpath(__file__))
+        )
+
+        class mock_Response:
+
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        class mock_httpcache:
+
+            def probe(self, uri, size):
+                with open("{}/{}".format(imagedir, uri), 'rb') as f:
+                    return mock_Response(206), f.read(size)
+
+        expected = {
+            "serbia.184.1.jpg": None,
+            "spacer.gif": "tiny",
+            "line2gray5x468.gif": "extreme ratio",
+            "go_button.gif": "tiny"
+        }
+
+        for imagefile, reason in expected.items():
+
+            probe = probe_image(imagefile, mock_httpcache(), size=1024)
+
+            self.assertEqual(probe['method'], 'range')
+            self.assertLessEqual(probe['bytes read'], 1024)
+            self.assertEqual(probe['pruned'], reason, imagefile)
+
+        self.assertEqual(probe_prune_reason(1, 1), "tracking pixel")
+        self.assertEqual(probe_prune_reason(0, 10), "tracking pixel")
+
+        probe = probe_image("serbia.184.1.jpg", mock_httpcache(), size=1024)
+        self.assertEqual(probe['format'], 'JPEG')
+        self.assertEqual((probe['width'], probe['height']), (184, 237))
+
+    def test_probe_image_remembered(self):
+
+        imagedir = "{}/samples/images".format(
+            os.path.dirname(os.path.realpath(__file__))
+        )
+
+        class mock_Response:
+            status_code = 206
+
+        class mock_httpcache:
+
+            probes = 0
+
+            def probe(self, uri, size):
+                self.probes += 1
+
+                if uri == "missing.gif":
+                    raise IOError("connection reset")
+
+                with open("{}/{}".format(imagedir, uri), 'rb') as f:
+                    return mock_Response(), f.read(size)
+
+        set_store_factory(MemoryStore)
+
+        try:
+            http_cache = mock_httpcache()
+
+            first = probe_image("spacer.gif", http_cache, size=1024)
+            second = probe_image("spacer.gif", http_cache, size=1024)
+
+            self.assertEqual(first, second)
+            self.assertEqual(http_cache.probes, 1)
+
+            # probes expire from the store rather than being kept for ever
+            value, expires = get_store(image_probes_store)._entries[image_probe_key("spacer.gif", 1024)]
+            self.assertAlmostEqual(expires, time.time() + image_probes_expiration, delta=60)
+
+            # failures are probed again
+            probe_image("missing.gif", http_cache, size=1024)
+            probe_image("missing.gif", http_cache, size=1024)
+            self.assertEqual(http_cache.probes, 3)
+
+        finally:
+            set_store_factory(None)
@@ -0,0 +1,165 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mementoembed.jobqueue import JobQueue, JobQueueFull, job_key
+from mementoembed.stores import MemoryStore
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.working_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working_directory)
+
+    def test_job_key(self):
+
+        self.assertEqual(
+            job_key('imagereel', 'http://example.com', {'width': 320, 'height': 240}),
+            job_key('imagereel', 'http://example.com', {'height': 240, 'width': 320})
+        )
+
+        self.assertNotEqual(
+            job_key('imagereel', 'http://example.com', {'width': 320}),
+            job_key('docreel', 'http://example.com', {'width': 320})
+        )
+
+    def test_jobs(self):
+
+        queue = JobQueue(MemoryStore('jobs'), max_workers=1, max_queued=1)
+        release = threading.Event()
+        runs = []
+
+        def create(name):
+            release.wait(10)
+            runs.append(name)
+
+            if name == 'fail':
+                raise ValueError("cannot create this product")
+
+            artifact_file = "{}/{}.txt".format(self.working_directory, name)
+
+            with open(artifact_file, 'wb') as f:
+                f.write(name.encode('utf8'))
+
+            return artifact_file, {'Content-Type': 'text/plain'}
+
+        def submit(name):
+            return queue.submit(name, 'test', 'http://example.com/' + name, create, name)
+
+        try:
+            self.assertEqual(submit('first')['status'], 'queued')
+            self.assertEqual(submit('fail')['status'], 'queued')
+
+            # identical jobs are not queued twice
+            submit('first')
+            self.assertEqual(queue.stats()['deduplicated jobs'], 1)
+
+            with self.assertRaises(JobQueueFull):
+                submit('third')
+
+            release.set()
+            queue.shutdown(wait=True)
+
+            record = queue.status('first')
+            self.assertEqual(record['status'], 'complete')
+            self.assertEqual(record['headers'], {'Content-Type': 'text/plain'})
+
+            # the file the product was saved to is served, not a copy
+            self.assertEqual(record['artifact'], "{}/first.txt".format(self.working_directory))
+            self.assertEqual(os.listdir(self.working_directory), [ 'first.txt' ])
+
+            record = queue.status('fail')
+            self.assertEqual(record['status'], 'failed')
+            self.assertEqual(record['error'], "cannot create this product")
+
+            self.assertIsNone(queue.status('third'))
+            self.assertEqual(runs, ['first', 'fail'])
+
+            # a completed job is reused while its artifact exists
+            self.assertEqual(submit('first')['status'], 'complete')
+
+        finally:
+            release.set()
+            queue.shutdown()
+
+    def test_job_timeout(self):
+
+        queue = JobQueue(MemoryStore('jobs'), max_workers=1, max_queued=1, job_timeout=0.2)
+        release = threading.Event()
+        running = []
+
+        def hang():
+            running.append('hung')
+            release.wait(10)
+            running.remove('hung')
+            return "{}/late.txt".format(self.working_directory), {}
+
+        def create():
+            # never alongside the job that timed out
+            self.assertEqual(running, [])
+            return "{}/next.txt".format(self.working_directory), {}
+
+        try:
+            queue.submit('hung', 'test', 'http://example.com/hung', hang)
+            queue.submit('next', 'test', 'http://example.com/next', create)
+
+            time.sleep(0.6)
+
+            record = queue.status('hung')
+            self.assertEqual(record['status'], 'failed')
+            self.assertEqual(record['error'], "the test job did not finish within 0.2 seconds")
+
+            # the hung job keeps its place until it ends
+            self.assertEqual(queue.stats()['timed out jobs still running'], 1)
+            self.assertEqual(queue.status('next')['status'], 'queued')
+
+            release.set()
+            queue.shutdown(wait=True)
+
+            self.assertEqual(queue.status('next')['status'], 'complete')
+            self.assertEqual(queue.status('hung')['status'], 'failed')
+            self.assertEqual(queue.stats()['timed out jobs'], 1)
+            self.assertEqual(queue.stats()['timed out jobs still running'], 0)
+            self.assertEqual(queue.stats()['inflight jobs'], 0)
+
+        finally:
+            release.set()
+            queue.shutdown()
+
+    def test_records_outlast_the_queue(self):
+
+        queue = JobQueue(MemoryStore('jobs'), max_workers=1, max_queued=2,
+            job_timeout=1, lease=0.3)
+
+        def create(name):
+            time.sleep(0.8)
+            return "{}/{}.txt".format(self.working_directory, name), {}
+
+        def submit(name):
+            return queue.submit(name, 'test', 'http://example.com/' + name, create, name)
+
+        try:
+            for name in [ 'first', 'second', 'third' ]:
+                submit(name)
+
+            # waiting longer than the lease and the job timeout
+            time.sleep(1.2)
+
+            self.assertEqual(queue.status('third')['status'], 'queued')
+            self.assertEqual(submit('third')['status'], 'queued')
+            self.assertEqual(queue.stats()['deduplicated jobs'], 1)
+
+            queue.shutdown(wait=True)
+
+            self.assertEqual(queue.status('third')['status'], 'complete')
+
+        finally:
+            queue.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from mementoembed.mementoimagereel import MementoImageReel, MementoImageReelGenerationError
+
+class mock_httpcache:
+    timeout = 15
+
+class mock_memento:
+    im_urim = "http://myarchive.org/memento/20180622211636id_/http://example.com/"
+
+class TestMementoImageReel(unittest.TestCase):
+
+    def setUp(self):
+        self.working_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working_directory)
+
+    @patch('mementoembed.mementoimagereel.generate_images_and_scores', return_value={})
+    @patch('mementoembed.mementoimagereel.memento_resource_factory', return_value=mock_memento())
+    def test_reuse_imagereel(self, factory, images_and_scores):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        mir = MementoImageReel("test agent", self.working_directory, mock_httpcache())
+
+        data = mir.generate_imagereel(urim, 100, 5, 320, 240)
+        self.assertEqual(data[0:3], b'GIF')
+        self.assertEqual(factory.call_count, 1)
+
+        # an identical request does not visit the archive
+        self.assertEqual(mir.generate_imagereel(urim, 100, 5, 320, 240), data)
+        self.assertEqual(factory.call_count, 1)
+
+        # every rendering parameter is part of the key
+        mir.generate_imagereel(urim, 100, 5, 640, 480)
+        self.assertEqual(factory.call_count, 2)
+
+        mir.generate_imagereel(urim, 100, 5, 320, 240, regenerate=True)
+        self.assertEqual(factory.call_count, 3)
+
+        data = mir.generate_imagereel(urim, 100, 5, 320, 240, reelformat='webp')
+        self.assertEqual(data[0:4], b'RIFF')
+        self.assertEqual(data[8:12], b'WEBP')
+        self.assertEqual(factory.call_count, 4)
+
+        self.assertRaises(MementoImageReelGenerationError,
+            mir.generate_imagereel, urim, 100, 5, 320, 240, reelformat='mp4')
+
+if __name__ == '__main__':
+    unittest.main()
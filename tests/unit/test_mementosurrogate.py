@@ -0,0 +1,88 @@
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from mementoembed.htmldocument import HTMLDocument
+from mementoembed.mementoresource import MementoDeadlineError
+from mementoembed.mementosurrogate import MementoSurrogate, assembled_parts
+
+delay = 0.2
+
+def slowly(value):
+
+    def function(*args, **kwargs):
+        time.sleep(delay)
+        return value
+
+    return function
+
+class mock_slow_resource:
+    """
+        stands in for the memento, original resource, and archive resource,
+        each part taking `delay` seconds as if it were downloaded
+    """
+
+    raw_document = HTMLDocument("<html><head><title>Is this a good title?</title></head></html>")
+    im_urim = "http://myarchive.org/memento/id_/http://example.com/something"
+
+    link_status = property(slowly("Live"))
+    favicon = property(slowly("http://example.com/favicon.ico"))
+    collection_name = property(slowly("My Collection"))
+
+def create_surrogate():
+
+    with patch('mementoembed.mementosurrogate.memento_resource_factory'), \
+        patch('mementoembed.mementosurrogate.OriginalResource'), \
+        patch('mementoembed.mementosurrogate.ArchiveResource'):
+
+        s = MementoSurrogate("http://myarchive.org/memento/http://example.com/something", None)
+
+    s.memento = s.originalresource = s.archive = mock_slow_resource()
+
+    return s
+
+@patch('mementoembed.mementosurrogate.extract_title', slowly("Is this a good title?"))
+@patch('mementoembed.mementosurrogate.extract_text_snippet', slowly("Is this good text?"))
+@patch('mementoembed.mementosurrogate.get_best_image', slowly("http://example.com/image.png"))
+class TestMementoSurrogate(unittest.TestCase):
+
+    def read_parts(self, s):
+
+        return dict( (name, getattr(s, name)) for name in assembled_parts )
+
+    def test_assemble(self):
+
+        expected_parts = self.read_parts(create_surrogate())
+
+        s = create_surrogate()
+
+        with ThreadPoolExecutor(len(assembled_parts)) as executor:
+
+            start = time.monotonic()
+            s.assemble(executor, deadline=60)
+            parts = self.read_parts(s)
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(parts, expected_parts)
+
+        # the parts wait on each other rather than adding up
+        self.assertLess(elapsed, delay * len(assembled_parts) / 2)
+
+    def test_assemble_deadline(self):
+
+        s = create_surrogate()
+
+        with ThreadPoolExecutor(len(assembled_parts)) as executor:
+
+            s.assemble(executor, deadline=delay / 4)
+
+            with self.assertRaises(MementoDeadlineError):
+                s.title
+
+            # late parts are not cancelled, but finish for the next request
+            self.assertEqual(s.parts['title'].result(timeout=delay * 4), "Is this a good title?")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from mementoembed.browserpool import BrowserPool
+from mementoembed.mementothumbnail import MementoThumbnail
+
+# stands in for create_screenshot.js, filling the viewport with the color
+# named at the end of the URI-M
+fake_browser_script = """
+import sys, json
+from PIL import Image
+
+for line in sys.stdin:
+    job = json.loads(line)
+    im = Image.new('RGB', (job['viewport_width'], job['viewport_height']), job['urim'].split('/')[-1])
+    im.save(job['output_file'])
+    print(json.dumps({'id': job['id'], 'status': 'ok'}), flush=True)
+"""
+
+class TestMementoThumbnail(unittest.TestCase):
+
+    def setUp(self):
+
+        self.working_directory = tempfile.mkdtemp()
+
+        script = "{}/fake_browser.py".format(self.working_directory)
+
+        with open(script, 'w') as f:
+            f.write(fake_browser_script)
+
+        self.pool = BrowserPool([ sys.executable, script ], size=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        shutil.rmtree(self.working_directory)
+
+    def test_concurrent_thumbnails(self):
+
+        colors = [ "red", "green", "blue", "yellow" ] * 3
+
+        environment = dict(os.environ)
+
+        def generate(color):
+
+            mt = MementoThumbnail("test agent", self.working_directory, None, None,
+                browser_pool=self.pool)
+            mt.width = 100
+
+            data = mt.generate_thumbnail(
+                "http://myarchive.org/memento/20180622211636/http://example.com/{}".format(color),
+                remove_banner=False)
+
+            return mt, Image.open(io.BytesIO(data)).convert('RGB')
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(generate, colors))
+
+        for color, (mt, im) in zip(colors, results):
+            self.assertEqual(im.getpixel((0, 0)), Image.new('RGB', (1, 1), color).getpixel((0, 0)))
+            self.assertEqual(im.size, (100, 75))
+            self.assertEqual((mt.width, mt.height), (100, 75))
+
+        # one thumbnail per memento and no temporary files are left behind
+        self.assertEqual(
+            len([ f for f in os.listdir(self.working_directory) if f.endswith('.png') ]), 4)
+        self.assertEqual(
+            len([ f for f in os.listdir(self.working_directory) if 'capture-' in f or 'partial' in f ]), 0)
+
+        self.assertEqual(dict(os.environ), environment)
+
+if __name__ == '__main__':
+    unittest.main()
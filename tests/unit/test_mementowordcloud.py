@@ -0,0 +1,73 @@
+import io
+import time
+import unittest
+
+import numpy as np
+
+from unittest.mock import patch
+
+from PIL import Image
+
+from mementoembed.mementowordcloud import MementoWordCloud, wordcloud_layout_store, \
+    wordcloud_layout_key, wordcloud_layout_expiration
+from mementoembed.stores import MemoryStore, set_store_factory, get_store
+
+text = """
+    The web archive preserves mementos of web pages so that researchers can
+    study how the web changes. Each memento of a page is an observation of the
+    page at a point in time, and collections of mementos tell stories about
+    events. Archivists select pages, crawlers capture them, and researchers
+    summarize the collections with surrogates such as social cards, thumbnails,
+    imagereels, and word clouds of the archived text.
+"""
+
+class mock_memento:
+    raw_content = "<html><body><p>web archive</p></body></html>"
+
+class TestMementoWordCloud(unittest.TestCase):
+
+    def setUp(self):
+        set_store_factory(MemoryStore)
+
+    def tearDown(self):
+        set_store_factory(None)
+
+    @patch('mementoembed.mementowordcloud.get_text_without_boilerplate', return_value=text)
+    @patch('mementoembed.mementowordcloud.memento_resource_factory', return_value=mock_memento())
+    def test_layout_reused(self, factory, get_text):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+
+        mwc = MementoWordCloud("test agent", None)
+
+        words = mwc.generate_words_and_scores(urim)
+        self.assertIn('web', words)
+        self.assertEqual(max(words.values()), 1.0)
+
+        white = Image.open(io.BytesIO(mwc.generate_wordcloud(urim)))
+        black = Image.open(io.BytesIO(mwc.generate_wordcloud(urim,
+            colormap="viridis", background_color="black")))
+
+        # the memento is fetched and laid out once for all three
+        self.assertEqual(factory.call_count, 1)
+
+        # the layout expires from the store rather than being kept for ever
+        value, expires = get_store(wordcloud_layout_store)._entries[wordcloud_layout_key(urim)]
+        self.assertAlmostEqual(expires, time.time() + wordcloud_layout_expiration, delta=60)
+
+        self.assertEqual(white.size, black.size)
+        self.assertEqual(white.convert("RGB").getpixel((0, 0)), (255, 255, 255))
+        self.assertEqual(black.convert("RGB").getpixel((0, 0)), (0, 0, 0))
+
+        # the words are in the same places, whatever their colors
+        white_words = np.any(np.asarray(white.convert("RGB")) != 255, axis=2)
+        black_words = np.any(np.asarray(black.convert("RGB")) != 0, axis=2)
+
+        self.assertGreater(white_words.sum(), 0)
+        self.assertLess((white_words != black_words).mean(), 0.01)
+
+        mwc.generate_wordcloud("http://myarchive.org/memento/20180622211636/http://example.com/other")
+        self.assertEqual(factory.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
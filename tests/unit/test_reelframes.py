@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from PIL import Image
+
+from mementoembed.reelframes import crossfade, reel_frames, fade_alphas, hold_frames
+
+def random_image(seed, width=40, height=30):
+
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+    return Image.fromarray(pixels, "RGBA")
+
+class TestReelFrames(unittest.TestCase):
+
+    def test_crossfade_matches_blend(self):
+
+        start = random_image(1)
+        end = random_image(2)
+
+        frames = crossfade(start, end)
+
+        self.assertEqual(len(frames), len(fade_alphas))
+
+        for alpha, frame in zip(fade_alphas, frames):
+            self.assertEqual(frame.mode, "RGBA")
+            self.assertEqual(frame.tobytes(), Image.blend(start, end, alpha).tobytes())
+
+    def test_held_image_is_one_frame(self):
+
+        background = Image.new("RGBA", (40, 30), "black")
+        ims = [ random_image(1, 20, 30), random_image(2, 40, 10) ]
+
+        frames = list(reel_frames(background, ims, 100))
+
+        # shown, faded in, held, and faded out
+        self.assertEqual(len(frames), len(ims) * (2 + 2 * len(fade_alphas)))
+
+        for n, im in enumerate(ims):
+
+            first = n * (2 + 2 * len(fade_alphas))
+
+            self.assertEqual(frames[first], (background, 100))
+
+            held, duration = frames[first + 1 + len(fade_alphas)]
+            self.assertEqual(duration, 100 * hold_frames)
+
+            expected = background.copy()
+            expected.paste(im, ((40 - im.size[0]) // 2, (30 - im.size[1]) // 2))
+            self.assertEqual(held.tobytes(), expected.tobytes())
+
+            self.assertEqual(
+                [ d for f, d in frames[first:first + 2 + 2 * len(fade_alphas)] ].count(100),
+                1 + 2 * len(fade_alphas))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import io
+import unittest
+
+import numpy as np
+
+from PIL import Image, ImageSequence
+
+from mementoembed.reelwriters import GIFReelWriter, WebPReelWriter, \
+    ReelWriterError, reel_palette, reel_writer, changed_box
+
+colors = [ (255, 0, 0, 255), (0, 128, 255, 255), (255, 255, 255, 255) ]
+
+def frames_and_durations():
+
+    background = Image.new("RGBA", (64, 48), "black")
+
+    frames = [ (background, 100) ]
+
+    for color in colors:
+        im = background.copy()
+        im.paste(Image.new("RGBA", (20, 10), color), (22, 19))
+        frames.append( (im, 100) )
+        frames.append( (im, 100) )
+        frames.append( (background, 100) )
+
+    return background, frames
+
+def decoded(data):
+
+    return [ (np.asarray(frame.convert("RGB")), frame.info['duration'])
+        for frame in ImageSequence.Iterator(Image.open(io.BytesIO(data))) ]
+
+class TestReelWriters(unittest.TestCase):
+
+    def test_changed_box(self):
+
+        previous = np.zeros((10, 10), dtype=np.uint8)
+        pixels = previous.copy()
+        pixels[3:5, 5:8] = 1
+
+        self.assertEqual(changed_box(previous, pixels), (5, 3, 8, 5))
+        self.assertEqual(changed_box(previous, pixels, 2), (4, 2, 8, 5))
+
+    def test_gif(self):
+
+        background, frames = frames_and_durations()
+
+        fp = io.BytesIO()
+
+        writer = reel_writer('gif', fp, background, [ Image.new("RGBA", (20, 10), c) for c in colors ])
+        self.assertIsInstance(writer, GIFReelWriter)
+
+        for frame, duration in frames:
+            writer.add(frame, duration)
+
+        writer.close()
+
+        # identical frames are joined
+        self.assertEqual(writer.frames, 7)
+
+        output = decoded(fp.getvalue())
+
+        self.assertEqual([ d for f, d in output ], [ 100, 200, 100, 200, 100, 200, 100 ])
+
+        expected = [ frames[0], frames[1], frames[3], frames[4], frames[6], frames[7], frames[9] ]
+
+        for (pixels, duration), (frame, d) in zip(output, expected):
+            self.assertTrue(np.array_equal(pixels, np.asarray(frame.convert("RGB"))))
+
+    def test_webp(self):
+
+        background, frames = frames_and_durations()
+
+        # the reel need not start the file
+        fp = io.BytesIO()
+        fp.write(b'ignored')
+
+        writer = WebPReelWriter(fp, background.size)
+
+        for frame, duration in frames:
+            writer.add(frame, duration)
+
+        writer.close()
+
+        data = fp.getvalue()[len(b'ignored'):]
+
+        output = decoded(data)
+
+        self.assertEqual(Image.open(io.BytesIO(data)).size, background.size)
+        self.assertEqual([ d for f, d in output ], [ 100, 200, 100, 200, 100, 200, 100 ])
+
+        # the held frames show their colors, allowing for lossy encoding
+        for (pixels, duration), color in zip(output[1::2], colors):
+            self.assertTrue(np.allclose(pixels[24, 32], color[0:3], atol=8))
+
+    def test_palette_leaves_transparency(self):
+
+        background, frames = frames_and_durations()
+
+        palette = reel_palette(background, [ Image.new("RGBA", (20, 10), c) for c in colors ])
+
+        self.assertLessEqual(len(palette.getpalette()) // 3, GIFReelWriter.transparency)
+
+    def test_wrong_frame_size(self):
+
+        writer = reel_writer('webp', io.BytesIO(), Image.new("RGBA", (64, 48)), [])
+
+        self.assertRaises(ReelWriterError, writer.add, Image.new("RGBA", (32, 24)), 100)
+        self.assertRaises(ReelWriterError, reel_writer, 'mp4', io.BytesIO(), Image.new("RGBA", (64, 48)), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,376 @@
+import io
+import os
+import time
+import tempfile
+import unittest
+import threading
+
+from datetime import timedelta
+
+import requests
+
+from requests.adapters import BaseAdapter
+from requests_cache.backends.base import BaseCache
+
+from mementoembed.sessions import ManagedSession, PooledHTTPAdapter, \
+    PoolStatistics, SingleFlight, SQLiteFlightLock, CachePolicy, TieredCache, \
+    singleflight_key
+
+class mock_adapter(BaseAdapter):
+
+    def __init__(self, mementos):
+        self.mementos = mementos
+        self.requested = []
+        self.ranges = []
+        super(mock_adapter, self).__init__()
+
+    def send(self, request, **kwargs):
+
+        self.requested.append(request.url)
+        self.ranges.append(request.headers.get('Range'))
+
+        content = b'content'
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+
+        if 'Range' in request.headers:
+            last = int(request.headers['Range'].split('-')[1])
+            content = content[:last + 1]
+            response.status_code = 206
+
+        # read as the body of a real connection
+        response.raw = io.BytesIO(content)
+
+        if request.url in self.mementos:
+            response.headers['Memento-Datetime'] = "Fri, 22 Jun 2018 21:16:36 GMT"
+
+        return response
+
+    def close(self):
+        pass
+
+class TestSessions(unittest.TestCase):
+
+    def test_pooled_adapter_host_pools(self):
+
+        adapter = PooledHTTPAdapter(PoolStatistics(), pool_connections=2, pool_maxsize=2)
+
+        self.assertFalse(adapter._has_host_pool("http://example.com/something"))
+
+        # creates the pool without opening a connection
+        adapter.poolmanager.connection_from_url("http://example.com/")
+
+        self.assertTrue(adapter._has_host_pool("http://example.com/something"))
+        self.assertTrue(adapter._has_host_pool("http://EXAMPLE.com:80/other"))
+        self.assertFalse(adapter._has_host_pool("https://example.com/something"))
+        self.assertFalse(adapter._has_host_pool("http://example.org/something"))
+
+    def test_shared_adapter_survives_session_close(self):
+
+        adapter = PooledHTTPAdapter(PoolStatistics())
+        adapter.poolmanager.connection_from_url("http://example.com/")
+
+        s1 = ManagedSession(backend='memory', shared_adapter=adapter,
+            starting_uri="http://example.com/1")
+        s2 = ManagedSession(backend='memory', shared_adapter=adapter,
+            starting_uri="http://example.com/2")
+
+        self.assertIs(s1.get_adapter("http://example.com/"), adapter)
+        self.assertIs(s2.get_adapter("https://example.com/"), adapter)
+
+        s1.close()
+
+        self.assertTrue(adapter._has_host_pool("http://example.com/"))
+        self.assertIs(s2.get_adapter("http://example.com/"), adapter)
+
+    def test_pool_statistics(self):
+
+        stats = PoolStatistics()
+        stats.increment('http pool hits')
+        stats.increment('http pool hits')
+        stats.increment('http pool misses', 3)
+
+        self.assertEqual(stats.as_dict(), {'http pool hits': 2, 'http pool misses': 3})
+
+    def test_singleflight_key(self):
+
+        self.assertEqual(
+            singleflight_key('GET', "HTTP://Example.com/a#frag", {'Referer': 'http://x'}),
+            singleflight_key('get', "http://example.com/a", {'User-Agent': 'y'})
+        )
+
+        self.assertNotEqual(
+            singleflight_key('GET', "http://example.com/a"),
+            singleflight_key('GET', "http://example.com/A")
+        )
+
+        self.assertNotEqual(
+            singleflight_key('GET', "http://example.com/a", {'Accept-Datetime': 'Thu, 01 Jan 2015 00:00:00 GMT'}),
+            singleflight_key('GET', "http://example.com/a")
+        )
+
+    def test_singleflight_coalesces_concurrent_calls(self):
+
+        stats = PoolStatistics()
+        flight = SingleFlight(stats)
+
+        fetches = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch():
+            fetches.append(1)
+            started.set()
+            release.wait()
+            return ['response']
+
+        results = []
+
+        def worker():
+            results.append(flight.do('key', fetch))
+
+        leader = threading.Thread(target=worker)
+        leader.start()
+        started.wait()
+
+        waiters = [ threading.Thread(target=worker) for i in range(4) ]
+
+        for t in waiters:
+            t.start()
+
+        while stats.as_dict().get('coalesced waits', 0) < 4:
+            time.sleep(0.01)
+
+        release.set()
+
+        for t in [leader] + waiters:
+            t.join()
+
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(results, [['response']] * 5)
+        self.assertEqual(stats.as_dict()['coalesced waits'], 4)
+
+        # the flight is over, so the next call fetches again
+        flight.do('key', fetch)
+        self.assertEqual(len(fetches), 2)
+
+    def test_singleflight_shares_exceptions(self):
+
+        flight = SingleFlight(PoolStatistics())
+
+        def fetch():
+            raise ValueError("archive unavailable")
+
+        self.assertRaises(ValueError, flight.do, 'key', fetch)
+
+    def test_sqlite_flight_lock(self):
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+
+            stats = PoolStatistics()
+            filename = os.path.join(tmpdir, "cache.sqlite")
+
+            lock1 = SQLiteFlightLock(filename, lock_timeout=5)
+            lock2 = SQLiteFlightLock(filename, lock_timeout=0.2)
+
+            with lock1.hold('key', stats):
+                self.assertFalse(lock2._try_acquire('key'))
+                self.assertTrue(lock2._try_acquire('otherkey'))
+
+            self.assertTrue(lock2._try_acquire('key'))
+
+            # a holder that died leaves a row that expires
+            start = time.time()
+            with lock2.hold('otherkey', stats):
+                pass
+
+            self.assertLess(time.time() - start, 1)
+            self.assertEqual(stats.as_dict()['coalesced waits across workers'], 1)
+
+    def test_cache_policy(self):
+
+        urim = "http://myarchive.org/memento/20180622211636/http://example.com/"
+        raw_urim = "http://myarchive.org/memento/20180622211636id_/http://example.com/"
+        urit = "http://myarchive.org/timemap/link/http://example.com/"
+        urir = "http://example.com/"
+
+        adapter = mock_adapter([ urim ])
+        policy = CachePolicy(memento_expire_after=None,
+            archive_expire_after=600, live_expire_after=60,
+            archive_hosts=[ "myarchive.org" ])
+
+        session = ManagedSession(backend='memory', cache_policy=policy)
+        session.mount('http://', adapter)
+
+        for uri in [ urim, raw_urim, urit, urir ]:
+            session.get(uri)
+
+        self.assertEqual(policy.classify(urim, session.get(urim)), 'memento')
+        self.assertEqual(policy.classify(raw_urim, session.get(raw_urim)), 'memento')
+        self.assertEqual(policy.classify(urit, session.get(urit)), 'archive')
+        self.assertEqual(policy.classify(urir, session.get(urir)), 'live')
+        self.assertEqual(len(adapter.requested), 4)
+
+        # age every cached response by a day
+        for key, (response, timestamp) in list(session.cache.responses.items()):
+            session.cache.responses[key] = (response, timestamp - timedelta(days=1))
+
+        for uri in [ urim, raw_urim, urit, urir ]:
+            self.assertEqual(session.get(uri).content, b'content')
+
+        # only the responses that are not mementos are fetched again
+        self.assertEqual(adapter.requested[4:], [ urit, urir ])
+
+        stats = policy.stats()
+        self.assertEqual(stats['uricache hit ratio (memento)'], 2 / 3)
+        self.assertEqual(stats['uricache hit ratio (archive)'], 1 / 3)
+        self.assertEqual(stats['uricache hit ratio (live)'], 1 / 3)
+        self.assertEqual(policy.statistics.as_dict()['uricache expirations (live)'], 1)
+
+    def test_cache_policy_classes(self):
+
+        policy = CachePolicy(archive_hosts=[ "archive.org", " " ])
+
+        def response(uri, headers):
+            r = requests.Response()
+            r.url = uri
+            r.headers.update(headers)
+            return r
+
+        # derived from the response alone, whatever was seen before
+        self.assertEqual(policy.classify("http://unknown.example/memento/2018/http://example.com/",
+            response("http://unknown.example/memento/2018/http://example.com/",
+                {'Memento-Datetime': "Fri, 22 Jun 2018 21:16:36 GMT"})), 'memento')
+
+        self.assertEqual(policy.classify("http://unknown.example/timemap/http://example.com/",
+            response("http://unknown.example/timemap/http://example.com/",
+                {'Content-Type': "application/link-format"})), 'archive')
+
+        self.assertEqual(policy.classify("http://unknown.example/timegate/http://example.com/",
+            response("http://unknown.example/timegate/http://example.com/",
+                {'Link': '<http://example.com/>; rel="original", '
+                    '<http://unknown.example/timemap/http://example.com/>; rel="timemap"'})), 'archive')
+
+        self.assertEqual(policy.classify("http://unknown.example/other",
+            response("http://unknown.example/other", {})), 'live')
+
+        # configured archives match their subdomains
+        self.assertEqual(policy.classify("https://web.archive.org/web/20180622211636id_/http://example.com/",
+            response("https://web.archive.org/web/20180622211636id_/http://example.com/", {})), 'memento')
+
+        self.assertEqual(policy.classify("https://web.archive.org/web/*/http://example.com/",
+            response("https://web.archive.org/web/*/http://example.com/", {})), 'archive')
+
+        self.assertEqual(policy.classify("http://notarchive.org/", response("http://notarchive.org/", {})), 'live')
+
+    def test_tiered_cache(self):
+
+        backend = BaseCache()
+        statistics = PoolStatistics()
+        cache = TieredCache(backend, max_entries=2, max_bytes=10000, statistics=statistics)
+
+        adapter = mock_adapter([])
+        session = ManagedSession(backend=cache)
+        session.mount('http://', adapter)
+
+        uris = [ "http://example.com/{}".format(i) for i in range(3) ]
+
+        session.get(uris[0])
+        session.get(uris[1])
+
+        # answered from memory, without reading the backend
+        backend.get_response_and_time = None
+        response = session.get(uris[0])
+        self.assertEqual(response.content, b'content')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(statistics.as_dict()['l1 hits'], 1)
+        del backend.get_response_and_time
+
+        # the least recently used is evicted but stays in the backend
+        session.get(uris[2])
+        self.assertEqual(statistics.as_dict()['l1 evictions'], 1)
+        self.assertEqual(cache.stats()['l1 entries'], 2)
+
+        self.assertTrue(session.get(uris[1]).from_cache)
+        self.assertEqual(statistics.as_dict()['l1 misses'], 4)
+        self.assertEqual(len(adapter.requested), 3)
+
+        # deletions reach both tiers
+        cache.delete_url(uris[1])
+        self.assertFalse(cache.has_url(uris[1]))
+        self.assertFalse(session.get(uris[1]).from_cache)
+
+        # a response replaced by another worker is read again once stale
+        session.get(uris[0])
+        backend.delete_url(uris[0])
+
+        self.assertTrue(session.get(uris[0]).from_cache)
+
+        cache.max_age = 0
+        self.assertFalse(session.get(uris[0]).from_cache)
+        self.assertEqual(statistics.as_dict()['l1 expirations'], 1)
+        cache.max_age = 30
+
+        # responses larger than the byte limit are left to the backend
+        cache.max_bytes = 5
+        cache.clear()
+        session.get(uris[0])
+        self.assertEqual(cache.stats(), {'l1 entries': 0, 'l1 bytes': 0})
+        self.assertTrue(session.get(uris[0]).from_cache)
+
+    def test_cached_reads_skip_singleflight(self):
+
+        holds = []
+
+        class recording_lock:
+
+            from contextlib import contextmanager
+
+            @contextmanager
+            def hold(self, key, statistics):
+                holds.append(key)
+                yield
+
+        statistics = PoolStatistics()
+        adapter = mock_adapter([])
+
+        session = ManagedSession(backend='memory',
+            singleflight=SingleFlight(statistics, recording_lock()))
+        session.mount('http://', adapter)
+
+        session.get("http://example.com/")
+        session.get("http://example.com/")
+
+        # only the miss takes the lock
+        self.assertEqual(len(holds), 1)
+        self.assertEqual(len(adapter.requested), 1)
+        self.assertEqual(statistics.as_dict()['single-flight cache hits'], 1)
+
+    def test_probe_answered_from_cache(self):
+
+        adapter = mock_adapter([])
+        session = ManagedSession(backend='memory')
+        session.mount('http://', adapter)
+
+        session.get("http://example.com/image.png")
+
+        response, data = session.probe("http://example.com/image.png", size=4)
+
+        self.assertTrue(response.from_cache)
+        self.assertEqual(data, b'cont')
+        self.assertEqual(len(adapter.requested), 1)
+
+        # uncached images are still probed over the network, in a range
+        response, data = session.probe("http://example.com/other.png", size=4)
+
+        self.assertFalse(getattr(response, 'from_cache', False))
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(data, b'cont')
+        self.assertEqual(adapter.requested[1:], [ "http://example.com/other.png" ])
+        self.assertEqual(adapter.ranges[1:], [ "bytes=0-3" ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import unittest
+
+from mementoembed.stores import MemoryStore, SQLiteStore, set_store_factory, get_store
+
+class TestStores(unittest.TestCase):
+
+    def check_store(self, store):
+
+        self.assertIsNone(store.get("missing"))
+
+        store.set("key", b"value")
+        self.assertEqual(store.get("key"), b"value")
+
+        store.set("key", b"replaced")
+        self.assertEqual(store.get("key"), b"replaced")
+
+        store.delete("key")
+        self.assertIsNone(store.get("key"))
+
+        store.set("expired", b"value", expire_after=-1)
+        self.assertIsNone(store.get("expired"))
+
+        self.assertEqual(store.stats(), {'hits': 2, 'misses': 3, 'writes': 3})
+
+    def test_memory_store(self):
+
+        store = MemoryStore("test")
+        self.check_store(store)
+
+        store = MemoryStore("test", max_entries=2)
+
+        store.set("a", b"1")
+        store.set("b", b"2")
+        store.get("a")
+        store.set("c", b"3")
+
+        # b was the least recently used
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a"), b"1")
+        self.assertEqual(store.get("c"), b"3")
+
+    def test_sqlite_store(self):
+
+        filename = "{}/test_stores.sqlite".format(
+            os.path.dirname(os.path.realpath(__file__)))
+
+        try:
+            self.check_store(SQLiteStore("test", filename))
+
+            # values persist for other connections to the same file
+            SQLiteStore("test", filename).set("persistent", b"value")
+            self.assertEqual(SQLiteStore("test", filename).get("persistent"), b"value")
+
+        finally:
+            os.unlink(filename)
+
+    def test_sqlite_store_purges_expired(self):
+
+        filename = "{}/test_stores.sqlite".format(
+            os.path.dirname(os.path.realpath(__file__)))
+
+        try:
+            store = SQLiteStore("test", filename, purge_interval=0)
+
+            store.set("expired", b"value", expire_after=-1)
+            store.set("kept", b"value")
+
+            # removed by the write without ever being read
+            count = store._connection().execute(
+                "select count(*) from `store_test`").fetchone()[0]
+
+            self.assertEqual(count, 1)
+            self.assertEqual(store.stats()['expired entries purged'], 1)
+            self.assertEqual(store.get("kept"), b"value")
+
+        finally:
+            os.unlink(filename)
+
+    def test_store_factory(self):
+
+        try:
+            set_store_factory(None)
+            self.assertIsNone(get_store("test"))
+
+            set_store_factory(MemoryStore)
+            self.assertIsInstance(get_store("test"), MemoryStore)
+            self.assertIs(get_store("test"), get_store("test"))
+
+        finally:
+            set_store_factory(None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import zipfile
+import unittest
+
+from summa.summarizer import _clean_text_by_sentences, _build_graph, \
+    _set_graph_edge_weights, _remove_unreachable_nodes, _pagerank
+
+from mementoembed.textrank import textrank_scores
+from mementoembed.textprocessing import get_text_without_boilerplate, \
+    get_sentence_scores_by_textrank
+
+sampledir = "{}/samples".format(
+    os.path.dirname(os.path.realpath(__file__))
+)
+
+def summa_scores(tokens):
+
+    graph = _build_graph(tokens)
+    _set_graph_edge_weights(graph)
+    _remove_unreachable_nodes(graph)
+
+    if len(graph.nodes()) == 0:
+        return {}
+
+    return _pagerank(graph)
+
+class TestTextRank(unittest.TestCase):
+
+    def test_scores_match_summa(self):
+
+        texts = []
+
+        for filename in [ "htmltext.html", "archive.is-1.html" ]:
+            with open("{}/{}".format(sampledir, filename)) as f:
+                texts.append(get_text_without_boilerplate(f.read()))
+
+        with zipfile.ZipFile("{}/archive.is-1.raw.zip".format(sampledir)) as z:
+            texts.append(get_text_without_boilerplate(z.read("index.html").decode('utf8')))
+
+        for text in texts:
+
+            tokens = [ sentence.token for sentence in _clean_text_by_sentences(text, "english", None) ]
+
+            expected = summa_scores(tokens)
+            scores = textrank_scores(tokens)
+
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(set(scores.keys()), set(expected.keys()))
+
+            for token in expected:
+                self.assertAlmostEqual(scores[token], expected[token], places=6)
+
+    def test_no_similar_sentences(self):
+
+        # every sentence is linked to every other, so all rank equally
+        scores = textrank_scores([ "cat sat", "dog ran", "bird flew" ])
+
+        self.assertEqual(len(scores), 3)
+
+        for score in scores.values():
+            self.assertAlmostEqual(score, 3 ** -0.5)
+
+    def test_degenerate_input(self):
+
+        self.assertEqual(textrank_scores([]), {})
+        self.assertEqual(textrank_scores([ "only sentence" ]), {})
+        self.assertEqual(get_sentence_scores_by_textrank("One sentence only here."), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import threading
+
+from mementoembed.walcache import WALDict, WALCache
+from mementoembed.sessions import PoolStatistics
+
+class TestWALCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batched_writes(self):
+
+        statistics = PoolStatistics()
+
+        # a long interval so that only flush commits
+        d = WALDict(self.filename, 'responses', pickled=True, flush_interval=60,
+            statistics=statistics)
+
+        # as another worker process sees the table
+        other = WALDict(self.filename, 'responses', pickled=True, flush_interval=60)
+
+        d['a'] = { 'value': 1 }
+        d['b'] = ( b'bytes', 2 )
+
+        # visible here at once, elsewhere once committed
+        self.assertEqual(d['a'], { 'value': 1 })
+        self.assertIn('b', d)
+        self.assertNotIn('a', other)
+
+        d.flush()
+
+        self.assertEqual(other['b'], ( b'bytes', 2 ))
+        self.assertEqual(statistics.as_dict()['sqlite batches'], 1)
+        self.assertEqual(statistics.as_dict()['sqlite batched writes'], 2)
+
+        del d['a']
+        self.assertNotIn('a', d)
+        self.assertRaises(KeyError, d.__getitem__, 'a')
+        self.assertRaises(KeyError, d.__delitem__, 'missing')
+
+        self.assertEqual(len(d), 1)
+        self.assertEqual(list(other), [ 'b' ])
+
+        con = sqlite3.connect(self.filename)
+        self.assertEqual(con.execute("pragma journal_mode").fetchone()[0], 'wal')
+        con.close()
+
+    def test_writer_thread(self):
+
+        d = WALDict(self.filename, 'urls', batch_size=10, flush_interval=60)
+        other = WALDict(self.filename, 'urls')
+
+        def write(start):
+            for i in range(start, start + 50):
+                d[str(i)] = str(i)
+
+        threads = [ threading.Thread(target=write, args=(i * 50,)) for i in range(4) ]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        # full batches are committed without waiting for the interval
+        d._wakeup.set()
+        d.flush()
+
+        self.assertEqual(len(other), 200)
+        self.assertEqual(other['199'], '199')
+
+    def test_after_commit(self):
+
+        d = WALDict(self.filename, 'responses', flush_interval=60)
+        other = WALDict(self.filename, 'responses')
+
+        seen = []
+
+        d['a'] = 'value'
+        d.after_commit(lambda: seen.append('a' in other))
+
+        # not before the write is visible to other workers
+        self.assertEqual(seen, [])
+
+        d.flush()
+        self.assertEqual(seen, [ True ])
+
+        # nor is it lost when nothing else is queued
+        d.after_commit(lambda: seen.append('again'))
+        d.flush()
+        self.assertEqual(seen, [ True, 'again' ])
+
+    def test_cache_backend(self):
+
+        cache = WALCache(os.path.join(self.folder, "cache"))
+
+        cache.responses['key'] = b'record'
+        cache.add_key_mapping('redirect', 'key')
+        cache.flush()
+
+        reopened = WALCache(os.path.join(self.folder, "cache"))
+
+        self.assertEqual(reopened.responses['key'], b'record')
+        self.assertEqual(reopened.keys_map['redirect'], 'key')
+
+if __name__ == '__main__':
+    unittest.main()